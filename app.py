@@ -6,12 +6,33 @@ Uso:
   python app.py --host 127.0.0.1 --port 3306 --user root --password admin --database libreria
 """
 
+import time
+
+INICIO = time.perf_counter()
+
 import argparse
-import mysql.connector
+import os
 import sys
 import logging
-from tabulate import tabulate
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Union
+from arbol_categorias import ARBOL
+from db_manager import FilasCrudas, FlujoFilas
+from utils.arranque import ModuloPerezoso, PerfilArranque, importar, precalentar
+from utils.tabla_paginada import TablaPaginada
+
+# Dependencias pesadas: se importan en el primer uso (o en el precalentado)
+mysql = ModuloPerezoso("mysql")
+tabulate = ModuloPerezoso("tabulate")
+DEPENDENCIAS_DIFERIDAS = ("mysql.connector", "tabulate", "catalogo")
+
+# Matriz de compras conjuntas guardada con recomendaciones.py --salida; si no
+# existe la construye el hilo de recomendaciones (nunca la caja)
+RUTA_RECOMENDACIONES = "recomendaciones.bin"
+
+FIN_IMPORTACIONES = time.perf_counter()
 
 # Configuración de logging
 logging.basicConfig(
@@ -31,65 +52,167 @@ class SistemaLibreria:
         self.database = database
         self.port = port
         self.conn = None
-        self.conectar()
+        self._catalogo = None
+        self._similitud = None
+        self._feed_libros = None
+        self._ventas_autores = None
+        self._reservas = None
+        self._recomendador = None
+        self._hilo_recomendaciones = None
+        self._detener_recomendaciones = threading.Event()
+        # La conexión se abre en la primera consulta (o en el precalentado)
+        self._bloqueo_conexion = threading.Lock()
+        self._en_transaccion = False
 
-    def conectar(self):
-        """Establece conexión con la base de datos."""
-        try:
-            self.conn = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                autocommit=True
-            )
-            logging.info("Conexión a MySQL establecida correctamente")
-        except mysql.connector.Error as err:
-            logging.error(f"Error al conectar a MySQL: {err}")
-            sys.exit(1)
+    def conectar(self, salir_si_falla: bool = True):
+        """Establece conexión con la base de datos (una sola vez aunque se llame desde dos hilos)."""
+        with self._bloqueo_conexion:
+            if self.conn is not None:
+                return
+            try:
+                self.conn = mysql.connector.connect(
+                    host=self.host,
+                    port=self.port,
+                    user=self.user,
+                    password=self.password,
+                    database=self.database,
+                    autocommit=True
+                )
+                logging.info("Conexión a MySQL establecida correctamente")
+            except mysql.connector.Error as err:
+                logging.error(f"Error al conectar a MySQL: {err}")
+                if salir_si_falla:
+                    sys.exit(1)
+
+    def precalentar(self) -> threading.Thread:
+        """Importa las dependencias diferidas y abre la conexión en segundo plano."""
+        return precalentar(DEPENDENCIAS_DIFERIDAS,
+                           al_terminar=lambda: self.conectar(salir_si_falla=False))
 
     def cerrar(self):
         """Cierra la conexión con la base de datos."""
+        if self._reservas is not None:
+            self._reservas.detener_barrido()
+        self._detener_recomendaciones.set()
+        if self._feed_libros is not None:
+            self._feed_libros.cerrar()
         if self.conn:
             self.conn.close()
             logging.info("Conexión a MySQL cerrada")
 
-    def ejecutar_consulta(self, query: str, params: tuple = None) -> List[Dict]:
-        """Ejecuta una consulta SQL y devuelve los resultados como una lista de diccionarios."""
+    def ejecutar_consulta(self, query: str, params: tuple = None,
+                          crudo: bool = False) -> Union[List[Dict], FilasCrudas]:
+        """
+        Ejecuta una consulta SQL y devuelve los resultados como una lista de diccionarios.
+
+        Con crudo=True devuelve FilasCrudas: tuplas con un único descriptor de
+        columnas compartido, sin crear un diccionario por fila.
+        """
         if not self.conn:
             self.conectar()
             
-        cursor = self.conn.cursor(dictionary=True)
+        cursor = self.conn.cursor(dictionary=not crudo)
         try:
             cursor.execute(query, params)
             resultados = cursor.fetchall()
+            if crudo:
+                return FilasCrudas(resultados, cursor.column_names)
             return resultados
         except mysql.connector.Error as err:
             logging.error(f"Error al ejecutar consulta: {err}")
-            return []
+            return FilasCrudas([], ()) if crudo else []
         finally:
             cursor.close()
 
+    def ejecutar_consulta_flujo(self, query: str, params: tuple = (), columna: str = None, clave: str = None,
+                                descendente: bool = False, lote: int = 1000) -> Union[FlujoFilas, FilasCrudas]:
+        """
+        Ejecuta una consulta por páginas (paginación por clave) y devuelve las filas en flujo.
+
+        `query` termina su WHERE con un marcador {condicion}, ordena por
+        `columna` (descendente si se indica) y acaba en LIMIT %s; `clave` es
+        el nombre de esa columna en el resultado. Cada página continúa tras
+        la última clave leída, así que dejar de leer no tiene coste. Si la
+        consulta falla devuelve unas FilasCrudas vacías.
+        """
+        operador = '<' if descendente else '>'
+
+        def consultar(marca, limite):
+            if marca is None:
+                return self.ejecutar_consulta(query.format(condicion="1 = 1"), tuple(params) + (limite,), crudo=True)
+            return self.ejecutar_consulta(query.format(condicion=f"{columna} {operador} %s"),
+                                          tuple(params) + (marca, limite), crudo=True)
+
+        flujo = FlujoFilas(consultar, clave, lote)
+        if not flujo.columnas:
+            return FilasCrudas([], ())
+        return flujo
+
     def ejecutar_accion(self, query: str, params: tuple = None) -> int:
-        """Ejecuta una acción SQL (INSERT, UPDATE, DELETE) y devuelve el número de filas afectadas."""
+        """
+        Ejecuta una acción SQL (INSERT, UPDATE, DELETE) y devuelve el número de filas afectadas.
+
+        Dentro de `transaccion()` no hace commit y los errores se propagan para
+        que quien abrió la transacción decida qué deshacer.
+        """
         if not self.conn:
             self.conectar()
             
         cursor = self.conn.cursor()
         try:
             cursor.execute(query, params)
-            self.conn.commit()
+            if not self._en_transaccion:
+                self.conn.commit()
             return cursor.rowcount
         except mysql.connector.Error as err:
+            if self._en_transaccion:
+                raise
             logging.error(f"Error al ejecutar acción: {err}")
             self.conn.rollback()
             return 0
         finally:
             cursor.close()
 
-    def obtener_libros(self, filtro: str = None) -> List[Dict]:
-        """Obtiene la lista de libros, opcionalmente filtrada por título, autor o categoría."""
+    @contextmanager
+    def transaccion(self):
+        """Agrupa las acciones del bloque en una sola transacción (commit al salir, rollback si falla)."""
+        if not self.conn:
+            self.conectar()
+        self.conn.start_transaction()
+        self._en_transaccion = True
+        try:
+            yield
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._en_transaccion = False
+
+    def punto_guardado(self, nombre: str = "comando"):
+        """Marca un SAVEPOINT dentro de la transacción actual (reemplaza al del mismo nombre)."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {nombre}")
+        finally:
+            cursor.close()
+
+    def volver_a_punto_guardado(self, nombre: str = "comando"):
+        """Deshace lo hecho desde el SAVEPOINT indicado sin abandonar la transacción."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {nombre}")
+        finally:
+            cursor.close()
+
+    def obtener_libros(self, filtro: str = None, crudo: bool = False, flujo: bool = False) -> List[Dict]:
+        """
+        Obtiene la lista de libros, opcionalmente filtrada por título, autor o categoría.
+
+        Con flujo=True devuelve un FlujoFilas ordenado por libro_id (paginado
+        por la clave primaria) en lugar de cargar todo el resultado ordenado
+        por título.
+        """
         query = """
         SELECT l.libro_id, l.titulo, l.subtitulo, l.isbn, l.fecha_publicacion, 
                l.editorial, l.precio, l.stock, l.calificacion, l.formato,
@@ -105,18 +228,199 @@ class SistemaLibreria:
         params = ()
         if filtro:
             query += """
-            WHERE l.titulo LIKE %s 
+            WHERE (l.titulo LIKE %s 
             OR CONCAT(a.nombre, ' ', a.apellido) LIKE %s
-            OR c.nombre LIKE %s
+            OR c.nombre LIKE %s)
+            AND {condicion}
             """
             params = (f"%{filtro}%", f"%{filtro}%", f"%{filtro}%")
-            
+        else:
+            query += """
+            WHERE {condicion}
+            """
         query += """
         GROUP BY l.libro_id
-        ORDER BY l.titulo
         """
         
-        return self.ejecutar_consulta(query, params)
+        if flujo:
+            return self.ejecutar_consulta_flujo(query + "ORDER BY l.libro_id LIMIT %s", params,
+                                                columna="l.libro_id", clave="libro_id")
+        return self.ejecutar_consulta(query.format(condicion="1 = 1") + "ORDER BY l.titulo", params, crudo)
+
+    def catalogo(self):
+        """Devuelve la instantánea columnar del catálogo, al día con los libros nuevos, modificados y borrados."""
+        from catalogo import CatalogoColumnar
+        
+        if self._catalogo is None:
+            # La marca del feed se toma antes de leer la instantánea
+            self._feed_cambios_libros()
+            self._catalogo = CatalogoColumnar(
+                lambda query, params: self.ejecutar_consulta(query, params, crudo=True)
+            )
+        nuevos = self._catalogo.refrescar()
+        if nuevos:
+            logging.info(f"Catálogo en memoria: {nuevos} libros añadidos ({len(self._catalogo)} en total)")
+        self._aplicar_cambios_libros()
+        return self._catalogo
+
+    def similitud(self):
+        """Devuelve el índice de libros parecidos por contenido, al día con los cambios de log_cambios."""
+        from similitud import IndiceSimilitud
+        
+        if self._similitud is None:
+            # La marca del feed se toma antes de construir el índice
+            self._feed_cambios_libros()
+            self._similitud = IndiceSimilitud(
+                lambda query, params: self.ejecutar_consulta(query, params, crudo=True)
+            ).reconstruir()
+        else:
+            self._similitud.refrescar()
+        self._aplicar_cambios_libros()
+        return self._similitud
+
+    def _feed_cambios_libros(self):
+        """
+        Feed de log_cambios de las cachés de libros en memoria.
+
+        Se crea en la primera llamada con la marca en el último cambio_id;
+        devuelve None si log_cambios no está disponible (las cachés solo
+        reciben entonces los libros nuevos).
+        """
+        from feed_cambios import ConsumidorCambios
+
+        if self._feed_libros is None:
+            ultimo = self.ejecutar_consulta("SELECT COALESCE(MAX(cambio_id), 0) FROM log_cambios", crudo=True)
+            if not ultimo:
+                return None
+            self._feed_libros = ConsumidorCambios(marca=ultimo[0][0])
+            self._feed_libros.suscribir(self._recargar_libros, tabla=('libros', 'autores', 'categorias',
+                                                                      'libro_autor', 'libro_categoria'),
+                                        en_lote=True)
+        return self._feed_libros
+
+    def _aplicar_cambios_libros(self):
+        """Lleva a las cachés de libros los cambios pendientes de log_cambios"""
+        feed = self._feed_cambios_libros()
+        if feed is not None:
+            feed.ponerse_al_dia()
+
+    def _recargar_libros(self, cambios):
+        """Vuelve a leer en el catálogo y el índice de similitud los libros afectados por `cambios`"""
+        # Las relaciones registran el libro_id como clave
+        ids = {c.clave for c in cambios if c.tabla in ('libros', 'libro_autor', 'libro_categoria')}
+        # Un autor o una categoría renombrados cambian las filas de sus libros
+        for tabla, relacion, columna in (('autores', 'libro_autor', 'autor_id'),
+                                         ('categorias', 'libro_categoria', 'categoria_id')):
+            claves = sorted({c.clave for c in cambios if c.tabla == tabla and c.operacion == 'UPDATE'})
+            if claves:
+                filas = self.ejecutar_consulta(
+                    f"SELECT DISTINCT libro_id FROM {relacion} WHERE {columna} IN ({','.join(['%s'] * len(claves))})",
+                    tuple(claves), crudo=True
+                )
+                ids.update(fila[0] for fila in filas)
+        if not ids:
+            return
+        for cache in (self._catalogo, self._similitud):
+            if cache is not None:
+                cache.recargar_ids(sorted(ids))
+        logging.info(f"Cachés de libros: {len(ids)} libros recargados desde log_cambios")
+
+    def ventas_autores(self):
+        """Devuelve el informe de ventas por autor, sumando las ventas nuevas."""
+        from ventas_autores import InformeVentasAutores
+        
+        if self._ventas_autores is None:
+            self._ventas_autores = InformeVentasAutores().reconstruir()
+        else:
+            self._ventas_autores.actualizar()
+        return self._ventas_autores
+
+    def recomendador(self):
+        """
+        Recomendaciones por compras conjuntas, o None mientras no haya matriz.
+
+        Nunca carga ni cuenta ventas en el hilo que pregunta: el primer uso
+        arranca el hilo de fondo, que lee RUTA_RECOMENDACIONES (o la
+        reconstruye y la guarda si no existe) y después suma las ventas nuevas
+        cada `intervalo` segundos.
+        """
+        if self._hilo_recomendaciones is None:
+            self.iniciar_recomendaciones()
+        return self._recomendador
+
+    def iniciar_recomendaciones(self, intervalo: float = 30.0):
+        """Carga o construye la matriz y la mantiene al día en un hilo de fondo"""
+        if self._hilo_recomendaciones is not None:
+            return
+        from recomendaciones import Recomendador
+
+        self._detener_recomendaciones.clear()
+        recomendador = Recomendador({
+            'host': self.host, 'port': self.port, 'user': self.user,
+            'password': self.password, 'database': self.database,
+        })
+
+        def mantener():
+            espera = 0
+            while not self._detener_recomendaciones.wait(espera):
+                espera = intervalo
+                try:
+                    if self._recomendador is None:
+                        self._cargar_recomendador(recomendador)
+                        self._recomendador = recomendador
+                    while self._recomendador.actualizar() and not self._detener_recomendaciones.is_set():
+                        pass
+                except Exception as err:
+                    # Se reintenta en el siguiente ciclo; mientras tanto no hay sugerencias
+                    logging.error(f"Error al actualizar recomendaciones: {err}")
+
+        # Hilo demonio: una reconstrucción en curso no retrasa la salida
+        self._hilo_recomendaciones = threading.Thread(target=mantener, name="recomendaciones", daemon=True)
+        self._hilo_recomendaciones.start()
+
+    @staticmethod
+    def _cargar_recomendador(recomendador):
+        if os.path.exists(RUTA_RECOMENDACIONES):
+            try:
+                recomendador.cargar(RUTA_RECOMENDACIONES)
+                return
+            except Exception as err:
+                # Fichero dañado o de una versión incompatible: se reconstruye
+                logging.error(f"No se pudo cargar {RUTA_RECOMENDACIONES}: {err}")
+        recomendador.reconstruir()
+        try:
+            recomendador.guardar(RUTA_RECOMENDACIONES)
+        except OSError as err:
+            logging.error(f"No se pudo guardar {RUTA_RECOMENDACIONES}: {err}")
+
+    def comprados_juntos(self, libro_id: int, n: int = 3, excluir: Tuple[int, ...] = ()) -> List[Dict]:
+        """Libros que más se compran junto a `libro_id` (lista vacía si no se pueden calcular)."""
+        recomendador = self.recomendador()
+        if recomendador is None:
+            return []
+        vecinos = recomendador.vecinos(libro_id, n + len(excluir))
+        vecinos = [(vecino, comunes) for vecino, _, comunes in vecinos if vecino not in excluir][:n]
+        if not vecinos:
+            return []
+        marcadores = ','.join(['%s'] * len(vecinos))
+        titulos = {fila['libro_id']: fila['titulo'] for fila in self.ejecutar_consulta(
+            f"SELECT libro_id, titulo FROM libros WHERE libro_id IN ({marcadores})",
+            tuple(vecino for vecino, _ in vecinos)
+        )}
+        return [{'libro_id': vecino, 'titulo': titulos[vecino], 'cestas': comunes}
+                for vecino, comunes in vecinos if vecino in titulos]
+
+    def reservas(self):
+        """Motor de reservas de stock (pool de conexiones propio, barrido de vencidas en segundo plano)."""
+        from reservas_stock import MotorReservas
+
+        if self._reservas is None:
+            self._reservas = MotorReservas({
+                'host': self.host, 'port': self.port, 'user': self.user,
+                'password': self.password, 'database': self.database,
+            })
+            self._reservas.iniciar_barrido()
+        return self._reservas
 
     def obtener_libro_por_id(self, libro_id: int) -> Optional[Dict]:
         """Obtiene los detalles completos de un libro por su ID."""
@@ -136,7 +440,7 @@ class SistemaLibreria:
         resultados = self.ejecutar_consulta(query, (libro_id,))
         return resultados[0] if resultados else None
 
-    def obtener_autores(self) -> List[Dict]:
+    def obtener_autores(self, crudo: bool = False) -> List[Dict]:
         """Obtiene la lista de autores con el número de libros que han escrito."""
         query = """
         SELECT a.autor_id, a.nombre, a.apellido, 
@@ -147,7 +451,7 @@ class SistemaLibreria:
         ORDER BY a.apellido, a.nombre
         """
         
-        return self.ejecutar_consulta(query)
+        return self.ejecutar_consulta(query, crudo=crudo)
     
     def importar_libros_desde_google(self) -> bool:
         """Ejecuta el script de importar libros desde Google API."""
@@ -176,7 +480,7 @@ class SistemaLibreria:
             logging.error(f"Error al importar libros desde Google API: {e}")
             return False
 
-    def obtener_categorias(self) -> List[Dict]:
+    def obtener_categorias(self, crudo: bool = False) -> List[Dict]:
         """Obtiene la lista de categorías con el número de libros en cada una."""
         query = """
         SELECT c.categoria_id, c.nombre, 
@@ -187,7 +491,7 @@ class SistemaLibreria:
         ORDER BY c.nombre
         """
         
-        return self.ejecutar_consulta(query)
+        return self.ejecutar_consulta(query, crudo=crudo)
 
     def agregar_libro(self, datos_libro: Dict) -> int:
         """Agrega un nuevo libro a la base de datos."""
@@ -244,6 +548,8 @@ class SistemaLibreria:
                     "INSERT INTO libro_categoria (libro_id, categoria_id) VALUES (%s, %s)",
                     (libro_id, categoria_id)
                 )
+            # Cambian los libros por subárbol (y quizá las categorías)
+            ARBOL.invalidar()
         
         return libro_id
 
@@ -317,13 +623,14 @@ class SistemaLibreria:
         """Elimina un libro y sus relaciones."""
         # Eliminar relaciones
         self.ejecutar_accion("DELETE FROM libro_autor WHERE libro_id = %s", (libro_id,))
-        self.ejecutar_accion("DELETE FROM libro_categoria WHERE libro_id = %s", (libro_id,))
+        if self.ejecutar_accion("DELETE FROM libro_categoria WHERE libro_id = %s", (libro_id,)) > 0:
+            ARBOL.invalidar()
         
         # Eliminar libro
         filas_afectadas = self.ejecutar_accion("DELETE FROM libros WHERE libro_id = %s", (libro_id,))
         return filas_afectadas > 0
 
-    def buscar_libros(self, termino: str) -> List[Dict]:
+    def buscar_libros(self, termino: str, crudo: bool = False) -> List[Dict]:
         """Busca libros por título, autor, editorial o categoría."""
         query = """
         SELECT l.libro_id, l.titulo, l.subtitulo, l.isbn, 
@@ -346,7 +653,7 @@ class SistemaLibreria:
         termino_busqueda = f"%{termino}%"
         params = (termino_busqueda, termino_busqueda, termino_busqueda, termino_busqueda, termino_busqueda)
         
-        return self.ejecutar_consulta(query, params)
+        return self.ejecutar_consulta(query, params, crudo)
 
     def obtener_estadisticas(self) -> Dict:
         """Obtiene estadísticas generales de la librería."""
@@ -387,14 +694,14 @@ class SistemaLibreria:
         return estadisticas
         
     # Métodos para gestión de clientes
-    def obtener_clientes(self) -> List[Dict]:
+    def obtener_clientes(self, crudo: bool = False) -> List[Dict]:
         """Obtiene la lista de todos los clientes."""
         query = """
         SELECT cliente_id, nombre, apellido, email, telefono, ciudad, pais
         FROM clientes
         ORDER BY apellido, nombre
         """
-        return self.ejecutar_consulta(query)
+        return self.ejecutar_consulta(query, crudo=crudo)
     
     def obtener_cliente_por_id(self, cliente_id: int) -> Optional[Dict]:
         """Obtiene los detalles de un cliente por su ID."""
@@ -402,7 +709,7 @@ class SistemaLibreria:
         resultados = self.ejecutar_consulta(query, (cliente_id,))
         return resultados[0] if resultados else None
     
-    def buscar_clientes(self, termino: str) -> List[Dict]:
+    def buscar_clientes(self, termino: str, crudo: bool = False) -> List[Dict]:
         """Busca clientes por nombre, apellido o email."""
         query = """
         SELECT cliente_id, nombre, apellido, email, telefono, ciudad
@@ -412,7 +719,7 @@ class SistemaLibreria:
         """
         termino_busqueda = f"%{termino}%"
         params = (termino_busqueda, termino_busqueda, termino_busqueda)
-        return self.ejecutar_consulta(query, params)
+        return self.ejecutar_consulta(query, params, crudo)
     
     def agregar_cliente(self, datos_cliente: Dict) -> int:
         """Agrega un nuevo cliente a la base de datos."""
@@ -458,16 +765,21 @@ class SistemaLibreria:
         return filas_afectadas > 0
     
     # Métodos para gestión de ventas
-    def obtener_ventas(self) -> List[Dict]:
-        """Obtiene la lista de todas las ventas."""
+    def obtener_ventas(self, crudo: bool = False, flujo: bool = False) -> List[Dict]:
+        """Obtiene la lista de todas las ventas, de la más reciente a la más antigua (en flujo si flujo=True)."""
         query = """
         SELECT v.venta_id, v.fecha_venta, v.total, v.metodo_pago, v.estado,
                CONCAT(c.nombre, ' ', c.apellido) AS cliente
         FROM ventas v
         JOIN clientes c ON v.cliente_id = c.cliente_id
-        ORDER BY v.fecha_venta DESC
+        WHERE {condicion}
+        ORDER BY v.venta_id DESC
         """
-        return self.ejecutar_consulta(query)
+        if flujo:
+            # Paginado por la clave primaria, descendente: venta_id sigue el orden de fecha_venta
+            return self.ejecutar_consulta_flujo(query + "LIMIT %s", columna="v.venta_id", clave="venta_id",
+                                                descendente=True)
+        return self.ejecutar_consulta(query.format(condicion="1 = 1"), crudo=crudo)
     
     def obtener_venta_por_id(self, venta_id: int) -> Optional[Dict]:
         """Obtiene los detalles de una venta por su ID."""
@@ -498,7 +810,19 @@ class SistemaLibreria:
         return resultado
     
     def crear_venta(self, datos_venta: Dict) -> int:
-        """Crea una nueva venta con sus detalles."""
+        """
+        Crea una nueva venta con sus detalles en una sola transacción.
+
+        Si falla una inserción (p. ej. after_venta_insert sin stock) se deshace
+        la venta completa y se propaga el error; dentro de `transaccion()`
+        decide quien la abrió.
+        """
+        if self._en_transaccion:
+            return self._insertar_venta(datos_venta)
+        with self.transaccion():
+            return self._insertar_venta(datos_venta)
+
+    def _insertar_venta(self, datos_venta: Dict) -> int:
         # Insertar venta
         query_venta = """
         INSERT INTO ventas (cliente_id, total, metodo_pago, estado)
@@ -533,8 +857,18 @@ class SistemaLibreria:
         
         return venta_id
 
-    def mostrar_tabla(self, datos: List[Dict], titulo: str = None):
-        """Muestra una tabla formateada con los datos proporcionados."""
+    def mostrar_tabla(self, datos: Union[List[Dict], FilasCrudas, FlujoFilas], titulo: str = None):
+        """
+        Muestra una tabla formateada con los datos proporcionados.
+
+        Un FlujoFilas se imprime por páginas a medida que llegan las filas
+        (TablaPaginada) y se cierra al terminar.
+        """
+        if isinstance(datos, FlujoFilas):
+            with datos:
+                TablaPaginada(datos.columnas.nombres).mostrar(datos, titulo)
+            return
+        
         if not datos:
             print("No hay datos para mostrar.")
             return
@@ -542,17 +876,22 @@ class SistemaLibreria:
         if titulo:
             print(f"\n=== {titulo} ===")
             
-        # Obtener encabezados de las columnas
-        headers = list(datos[0].keys())
-        
-        # Crear tabla
-        tabla = [[fila[col] for col in headers] for fila in datos]
+        if isinstance(datos, FilasCrudas):
+            # Las tuplas ya están en el orden de las columnas
+            headers = list(datos.columnas.nombres)
+            tabla = datos
+        else:
+            # Obtener encabezados de las columnas
+            headers = list(datos[0].keys())
+            
+            # Crear tabla
+            tabla = [[fila[col] for col in headers] for fila in datos]
         
         # Mostrar tabla
-        print(tabulate(tabla, headers=headers, tablefmt="grid"))
+        print(tabulate.tabulate(tabla, headers=headers, tablefmt="grid"))
 
-def menu_principal():
-    """Muestra el menú principal del sistema."""
+def imprimir_menu_principal():
+    """Imprime el menú principal del sistema."""
     print("\n=== SISTEMA DE GESTIÓN DE LIBRERÍA ===")
     print("1. Gestionar Libros")
     print("2. Gestionar Autores")
@@ -562,8 +901,23 @@ def menu_principal():
     print("6. Buscar")
     print("7. Estadísticas")
     print("0. Salir")
+
+def menu_principal():
+    """Muestra el menú principal del sistema."""
+    imprimir_menu_principal()
     return input("Seleccione una opción: ")
 
+def perfilar_arranque(sistema: SistemaLibreria):
+    """Informa de los tiempos de importación y de primer menú, y del trabajo que se difirió."""
+    perfil = PerfilArranque(INICIO)
+    perfil.marcar("importaciones de app.py", FIN_IMPORTACIONES)
+    imprimir_menu_principal()
+    perfil.marcar("primer menú en pantalla")
+    importar(DEPENDENCIAS_DIFERIDAS, perfil)
+    with perfil.medir("conexión MySQL"):
+        sistema.conectar(salir_si_falla=False)
+    perfil.informe()
+
 def menu_libros():
     """Muestra el menú de gestión de libros."""
     print("\n=== GESTIÓN DE LIBROS ===")
@@ -572,6 +926,8 @@ def menu_libros():
     print("3. Agregar nuevo libro")
     print("4. Actualizar libro")
     print("5. Eliminar libro")
+    print("6. Filtrar y ordenar catálogo")
+    print("7. Ver libros similares")
     print("0. Volver al menú principal")
     return input("Seleccione una opción: ")
 
@@ -580,6 +936,7 @@ def menu_autores():
     print("\n=== GESTIÓN DE AUTORES ===")
     print("1. Ver todos los autores")
     print("2. Ver libros de un autor")
+    print("3. Ranking de ventas por autor")
     print("0. Volver al menú principal")
     return input("Seleccione una opción: ")
 
@@ -619,6 +976,19 @@ def main():
     parser.add_argument("--user", help="Usuario de la base de datos")
     parser.add_argument("--password", help="Contraseña de la base de datos")
     parser.add_argument("--database", help="Nombre de la base de datos")
+    parser.add_argument("--precalentar", action="store_true",
+                        help="Importa dependencias y conecta en segundo plano mientras se muestra el menú")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Muestra los tiempos de importación y de primer menú, y termina")
+    parser.add_argument("--lote", metavar="RUTA",
+                        help="Ejecuta los comandos de RUTA (JSONL o CSV; '-' para stdin) sin menús")
+    parser.add_argument("--formato", choices=("jsonl", "csv"),
+                        help="Formato de --lote (por defecto según la extensión)")
+    parser.add_argument("--tam-lote", type=int, default=500, help="Comandos por transacción en --lote")
+    parser.add_argument("--resultados", metavar="RUTA",
+                        help="Fichero JSONL de resultados de --lote (por defecto stdout)")
+    parser.add_argument("--detener-en-error", action="store_true",
+                        help="En --lote, se detiene en el primer comando fallido")
     args = parser.parse_args()
     
     # Importar configuración desde config.py
@@ -646,6 +1016,24 @@ def main():
     
     sistema = SistemaLibreria(host, user, password, database, port)
     
+    if args.startup_profile:
+        perfilar_arranque(sistema)
+        sistema.cerrar()
+        return
+    if args.lote:
+        from lote_comandos import ejecutar_lote
+        
+        try:
+            resumen = ejecutar_lote(sistema, args.lote, args.formato, args.tam_lote,
+                                    args.resultados, args.detener_en_error)
+        finally:
+            sistema.cerrar()
+        print(f"{resumen['comandos']} comandos ({resumen['errores']} con error) en "
+              f"{resumen['segundos']} s: {resumen['comandos_por_segundo']} comandos/s", file=sys.stderr)
+        sys.exit(1 if resumen['errores'] else 0)
+    if args.precalentar:
+        sistema.precalentar()
+    
     try:
         while True:
             opcion = menu_principal()
@@ -662,7 +1050,7 @@ def main():
                 gestionar_ventas(sistema)
             elif opcion == "6":  # Buscar
                 termino = input("\nIntroduzca término de búsqueda: ")
-                resultados = sistema.buscar_libros(termino)
+                resultados = sistema.buscar_libros(termino, crudo=True)
                 sistema.mostrar_tabla(resultados, f"Resultados para '{termino}'")
             elif opcion == "7":  # Estadísticas
                 mostrar_estadisticas(sistema)
@@ -680,7 +1068,7 @@ def gestionar_libros(sistema: SistemaLibreria):
         opcion = menu_libros()
         
         if opcion == "1":  # Ver todos los libros
-            libros = sistema.obtener_libros()
+            libros = sistema.obtener_libros(flujo=True)
             sistema.mostrar_tabla(libros, "Catálogo de Libros")
         
         elif opcion == "2":  # Ver detalles de un libro
@@ -794,19 +1182,102 @@ def gestionar_libros(sistema: SistemaLibreria):
             except ValueError:
                 print("ID de libro no válido")
         
+        elif opcion == "6":  # Filtrar y ordenar catálogo
+            filtrar_catalogo(sistema)
+        
+        elif opcion == "7":  # Libros similares
+            libros_similares(sistema)
+        
         elif opcion == "0":  # Volver al menú principal
             break
         
         else:
             print("Opción no válida. Intente de nuevo.")
 
+def filtrar_catalogo(sistema: SistemaLibreria):
+    """Filtra y ordena el catálogo en memoria sin consultar MySQL en cada cambio."""
+    catalogo = sistema.catalogo()
+    print("\nDeje en blanco los filtros que no desea aplicar:")
+    filtros = {}
+    try:
+        for campo, etiqueta, tipo in (('precio_min', "Precio mínimo", float),
+                                      ('precio_max', "Precio máximo", float),
+                                      ('stock_min', "Stock mínimo", int),
+                                      ('calificacion_min', "Calificación mínima", float),
+                                      ('idioma', "Idioma (es, en...)", str),
+                                      ('formato', "Formato", str),
+                                      ('editorial', "Editorial", str)):
+            valor = input(f"{etiqueta}: ")
+            if valor:
+                filtros[campo] = tipo(valor)
+    except ValueError:
+        print("Valor de filtro no válido")
+        return
+    
+    orden = input("Ordenar por (titulo, precio, stock, calificacion, editorial) [titulo]: ") or "titulo"
+    if orden not in ('titulo', 'precio', 'stock', 'calificacion', 'editorial'):
+        print("Columna de orden no válida")
+        return
+    descendente = input("¿Orden descendente? (s/n): ").lower() == 's'
+    
+    libros = catalogo.consultar_vista(orden=orden, descendente=descendente, **filtros)
+    sistema.mostrar_tabla(libros, f"Catálogo filtrado ({len(libros)} libros)")
+
+def libros_similares(sistema: SistemaLibreria):
+    """Muestra los libros más parecidos por contenido a uno dado."""
+    try:
+        libro_id = int(input("Introduzca ID del libro: "))
+    except ValueError:
+        print("ID de libro no válido")
+        return
+    try:
+        similares = sistema.similitud().similares(libro_id, 10)
+    except RuntimeError as e:
+        print(e)
+        return
+    if not similares:
+        print("No se encontraron libros similares")
+        return
+    
+    puntuaciones = dict(similares)
+    marcadores = ','.join(['%s'] * len(puntuaciones))
+    libros = sistema.ejecutar_consulta(
+        f"SELECT libro_id, titulo, precio, stock FROM libros WHERE libro_id IN ({marcadores})",
+        tuple(puntuaciones)
+    )
+    for libro in libros:
+        libro['similitud'] = puntuaciones[libro['libro_id']]
+    libros.sort(key=lambda libro: libro['similitud'], reverse=True)
+    sistema.mostrar_tabla(libros, f"Libros similares al libro {libro_id}")
+
+def ranking_autores(sistema: SistemaLibreria, por_pagina: int = 20):
+    """Muestra la clasificación de autores por ventas, página a página."""
+    informe = sistema.ventas_autores()
+    por = input("Ordenar por (importe, importe_neto, unidades) [importe]: ") or "importe"
+    if por not in ('importe', 'importe_neto', 'unidades'):
+        print("Criterio no válido")
+        return
+    periodo = input(f"Mes (AAAA-MM, en blanco para el total) [{', '.join(informe.periodos()[-3:])}]: ") or None
+    
+    total = informe.contar(periodo)
+    desplazamiento = 0
+    while desplazamiento < total:
+        filas = informe.ranking(por, por_pagina, desplazamiento, periodo)
+        pagina = desplazamiento // por_pagina + 1
+        sistema.mostrar_tabla(filas, f"Ventas por autor ({pagina}/{(total + por_pagina - 1) // por_pagina})")
+        desplazamiento += por_pagina
+        if desplazamiento < total and input("¿Página siguiente? (s/n): ").lower() != 's':
+            break
+    if not total:
+        print("No hay ventas registradas")
+
 def gestionar_autores(sistema: SistemaLibreria):
     """Gestiona las operaciones relacionadas con autores."""
     while True:
         opcion = menu_autores()
         
         if opcion == "1":  # Ver todos los autores
-            autores = sistema.obtener_autores()
+            autores = sistema.obtener_autores(crudo=True)
             sistema.mostrar_tabla(autores, "Lista de Autores")
         
         elif opcion == "2":  # Ver libros de un autor
@@ -832,12 +1303,15 @@ def gestionar_autores(sistema: SistemaLibreria):
                 ORDER BY l.titulo
                 """
                 
-                libros = sistema.ejecutar_consulta(query, (autor_id,))
+                libros = sistema.ejecutar_consulta(query, (autor_id,), crudo=True)
                 sistema.mostrar_tabla(libros, f"Libros de {nombre_autor}")
                 
             except ValueError:
                 print("ID de autor no válido")
         
+        elif opcion == "3":  # Ranking de ventas por autor
+            ranking_autores(sistema)
+        
         elif opcion == "0":  # Volver al menú principal
             break
         
@@ -850,7 +1324,7 @@ def gestionar_categorias(sistema: SistemaLibreria):
         opcion = menu_categorias()
         
         if opcion == "1":  # Ver todas las categorías
-            categorias = sistema.obtener_categorias()
+            categorias = sistema.obtener_categorias(crudo=True)
             sistema.mostrar_tabla(categorias, "Lista de Categorías")
         
         elif opcion == "2":  # Ver libros de una categoría
@@ -881,7 +1355,7 @@ def gestionar_categorias(sistema: SistemaLibreria):
                 ORDER BY l.titulo
                 """
                 
-                libros = sistema.ejecutar_consulta(query, (categoria_id,))
+                libros = sistema.ejecutar_consulta(query, (categoria_id,), crudo=True)
                 sistema.mostrar_tabla(libros, f"Libros de categoría: {nombre_categoria}")
                 
             except ValueError:
@@ -913,7 +1387,7 @@ def gestionar_clientes(sistema: SistemaLibreria):
         opcion = menu_clientes()
         
         if opcion == "1":  # Ver todos los clientes
-            clientes = sistema.obtener_clientes()
+            clientes = sistema.obtener_clientes(crudo=True)
             sistema.mostrar_tabla(clientes, "Lista de Clientes")
         
         elif opcion == "2":  # Ver detalles de un cliente
@@ -1005,7 +1479,7 @@ def gestionar_clientes(sistema: SistemaLibreria):
         
         elif opcion == "6":  # Buscar clientes
             termino = input("Introduzca término de búsqueda: ")
-            resultados = sistema.buscar_clientes(termino)
+            resultados = sistema.buscar_clientes(termino, crudo=True)
             sistema.mostrar_tabla(resultados, f"Resultados para '{termino}'")
         
         elif opcion == "0":  # Volver al menú principal
@@ -1020,7 +1494,7 @@ def gestionar_ventas(sistema: SistemaLibreria):
         opcion = menu_ventas()
         
         if opcion == "1":  # Ver todas las ventas
-            ventas = sistema.obtener_ventas()
+            ventas = sistema.obtener_ventas(flujo=True)
             sistema.mostrar_tabla(ventas, "Lista de Ventas")
         
         elif opcion == "2":  # Ver detalles de una venta
@@ -1044,6 +1518,11 @@ def gestionar_ventas(sistema: SistemaLibreria):
                 print("ID de venta no válido")
         
         elif opcion == "3":  # Crear nueva venta
+            from reservas_stock import StockInsuficiente
+
+            # Las líneas se reservan al añadirlas; si la venta no se confirma, la
+            # reserva se libera (o vence sola si se abandona la consola)
+            carrito = f"consola-{uuid.uuid4().hex}"
             # Seleccionar cliente
             cliente_id = input("Introduzca ID del cliente: ")
             try:
@@ -1073,9 +1552,10 @@ def gestionar_ventas(sistema: SistemaLibreria):
                             
                         print(f"Libro: {libro['titulo']}")
                         print(f"Precio: ${libro['precio']:.2f}")
-                        print(f"Stock disponible: {libro['stock']}")
+                        disponible = libro['stock'] - libro.get('stock_reservado', 0)
+                        print(f"Stock disponible: {disponible}")
                         
-                        if libro['stock'] <= 0:
+                        if disponible <= 0:
                             print("Este libro no tiene stock disponible")
                             continue
                             
@@ -1086,8 +1566,8 @@ def gestionar_ventas(sistema: SistemaLibreria):
                                 print("La cantidad debe ser mayor a 0")
                                 continue
                                 
-                            if cantidad > libro['stock']:
-                                print(f"No hay suficiente stock. Disponible: {libro['stock']}")
+                            if cantidad > disponible:
+                                print(f"No hay suficiente stock. Disponible: {disponible}")
                                 continue
                                 
                             precio = libro['precio']
@@ -1106,6 +1586,12 @@ def gestionar_ventas(sistema: SistemaLibreria):
                                 precio_con_descuento = precio * Decimal(1 - descuento_decimal)
                                 subtotal = precio_con_descuento * cantidad
                                 
+                                try:
+                                    sistema.reservas().reservar(carrito, [(libro_id, cantidad)])
+                                except StockInsuficiente:
+                                    print("Otra caja acaba de reservar ese stock. Pruebe con menos unidades")
+                                    continue
+                                
                                 detalles.append({
                                     'libro_id': libro_id,
                                     'cantidad': cantidad,
@@ -1118,6 +1604,15 @@ def gestionar_ventas(sistema: SistemaLibreria):
                                 total_venta += subtotal
                                 print(f"Producto agregado. Subtotal: ${subtotal:.2f}")
                                 
+                                sugerencias = sistema.comprados_juntos(
+                                    libro_id, excluir=tuple(d['libro_id'] for d in detalles)
+                                )
+                                if sugerencias:
+                                    print("Quien compró este libro también compró:")
+                                    for sugerencia in sugerencias:
+                                        print(f"  [{sugerencia['libro_id']}] {sugerencia['titulo']} "
+                                              f"({sugerencia['cestas']} compras en común)")
+                                
                             except ValueError:
                                 print("Descuento no válido")
                                 
@@ -1151,6 +1646,7 @@ def gestionar_ventas(sistema: SistemaLibreria):
                 # Confirmar venta
                 confirmacion = input("\n¿Confirmar venta? (s/n): ")
                 if confirmacion.lower() != 's':
+                    sistema.reservas().liberar(carrito)
                     print("Venta cancelada")
                     continue
                     
@@ -1165,7 +1661,12 @@ def gestionar_ventas(sistema: SistemaLibreria):
                     'detalles': detalles
                 }
                 
-                venta_id = sistema.crear_venta(datos_venta)
+                try:
+                    venta_id = sistema.reservas().confirmar(carrito, datos_venta)
+                except Exception as e:
+                    sistema.reservas().liberar(carrito)
+                    print(f"No se pudo registrar la venta: {e}")
+                    continue
                 print(f"\nVenta creada con éxito. ID: {venta_id}")
                 
             except ValueError:
@@ -0,0 +1,278 @@
+"""
+arbol_categorias.py – Jerarquía de categorías: tabla de cierre y árbol en memoria.
+
+categorias_cierre guarda un par (ancestro, descendiente, profundidad) por
+cada relación a cualquier nivel, sin la fila de la propia categoría. Con
+ella "los libros de Ficción y sus subcategorías", la ruta de ancestros o
+el número de libros de un subárbol son una sola consulta indexada (ver las
+constantes SQL_*), en lugar de recorrer categoria_padre_id nivel a nivel.
+CategoriaController la mantiene con enlazar/desenlazar dentro de la misma
+transacción que modifica categorias; reconstruir() la regenera entera
+(bases de datos anteriores o cargas masivas con padres).
+
+ARBOL es la caché en memoria para la interfaz: una Jerarquia inmutable con
+los nodos en preorden (el subárbol de un nodo es un tramo contiguo) y el
+número de libros distintos de cada subárbol. Las escrituras del controlador
+la invalidan y la siguiente llamada a ARBOL.obtener() la vuelve a cargar;
+las de otros procesos (import_books.py) se ven al caducar, a los MAX_EDAD
+segundos.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db_manager import DatabaseManager
+
+# (padre, padre, categoria, categoria): une el subárbol de `categoria` (ella
+# incluida) con `padre` y todos sus ancestros
+SQL_ENLAZAR = """
+INSERT INTO categorias_cierre (ancestro_id, descendiente_id, profundidad)
+SELECT sup.ancestro_id, sub.descendiente_id, sup.profundidad + sub.profundidad + 1
+FROM (SELECT ancestro_id, profundidad FROM categorias_cierre WHERE descendiente_id = %s
+      UNION ALL SELECT %s, 0) AS sup
+CROSS JOIN (SELECT descendiente_id, profundidad FROM categorias_cierre WHERE ancestro_id = %s
+            UNION ALL SELECT %s, 0) AS sub
+"""
+
+# (categoria, categoria, categoria): separa el subárbol de `categoria` (ella
+# incluida) de todos sus ancestros, conservando las relaciones internas
+SQL_DESENLAZAR = """
+DELETE c FROM categorias_cierre c
+JOIN categorias_cierre sup ON sup.descendiente_id = %s AND sup.ancestro_id = c.ancestro_id
+LEFT JOIN categorias_cierre sub ON sub.ancestro_id = %s AND sub.descendiente_id = c.descendiente_id
+WHERE c.descendiente_id = %s OR sub.descendiente_id IS NOT NULL
+"""
+
+# (categoria, categoria): la categoría y sus descendientes, por nivel
+SQL_SUBARBOL = """
+SELECT c.categoria_id, c.nombre, c.categoria_padre_id, s.profundidad
+FROM (SELECT descendiente_id AS categoria_id, profundidad FROM categorias_cierre WHERE ancestro_id = %s
+      UNION ALL SELECT %s, 0) AS s
+JOIN categorias c ON c.categoria_id = s.categoria_id
+ORDER BY s.profundidad, c.nombre
+"""
+
+# (categoria, categoria): de la raíz a la categoría
+SQL_RUTA = """
+SELECT c.categoria_id, c.nombre, c.categoria_padre_id, r.profundidad
+FROM (SELECT ancestro_id AS categoria_id, profundidad FROM categorias_cierre WHERE descendiente_id = %s
+      UNION ALL SELECT %s, 0) AS r
+JOIN categorias c ON c.categoria_id = r.categoria_id
+ORDER BY r.profundidad DESC
+"""
+
+# (categoria, categoria): libros de la categoría o de cualquier subcategoría
+SQL_LIBROS_SUBARBOL = """
+SELECT l.libro_id, l.titulo, l.precio, l.stock
+FROM libros l
+WHERE l.libro_id IN (
+    SELECT lc.libro_id FROM libro_categoria lc
+    WHERE lc.categoria_id IN (SELECT descendiente_id FROM categorias_cierre WHERE ancestro_id = %s
+                              UNION ALL SELECT %s)
+)
+ORDER BY l.titulo
+"""
+
+SQL_CONTAR_SUBARBOL = """
+SELECT COUNT(DISTINCT lc.libro_id)
+FROM libro_categoria lc
+WHERE lc.categoria_id IN (SELECT descendiente_id FROM categorias_cierre WHERE ancestro_id = %s
+                          UNION ALL SELECT %s)
+"""
+
+# Libros distintos por subárbol de todas las categorías a la vez
+SQL_CONTAR_TODOS = """
+SELECT x.ancestro_id, COUNT(DISTINCT lc.libro_id)
+FROM (SELECT ancestro_id, descendiente_id FROM categorias_cierre
+      UNION ALL SELECT categoria_id, categoria_id FROM categorias) AS x
+JOIN libro_categoria lc ON lc.categoria_id = x.descendiente_id
+GROUP BY x.ancestro_id
+"""
+
+
+# ---------------------------------------------------------------------------- tabla de cierre
+
+def enlazar(cursor, categoria_id: int, padre_id: Optional[int]):
+    """Cuelga el subárbol de `categoria_id` de `padre_id` en la tabla de cierre"""
+    if padre_id is not None:
+        cursor.execute(SQL_ENLAZAR, (padre_id, padre_id, categoria_id, categoria_id))
+
+
+def desenlazar(cursor, categoria_id: int):
+    """Quita las relaciones del subárbol de `categoria_id` con sus ancestros"""
+    cursor.execute(SQL_DESENLAZAR, (categoria_id, categoria_id, categoria_id))
+
+
+def es_descendiente(cursor, ancestro_id: int, categoria_id: int) -> bool:
+    cursor.execute("SELECT 1 FROM categorias_cierre WHERE ancestro_id = %s AND descendiente_id = %s",
+                   (ancestro_id, categoria_id))
+    return cursor.fetchone() is not None
+
+
+def cierre(padres: Dict[int, Optional[int]]) -> List[Tuple[int, int, int]]:
+    """Filas (ancestro, descendiente, profundidad) a partir de {categoria: padre}"""
+    filas = []
+    for categoria_id in padres:
+        visitados = {categoria_id}
+        padre, profundidad = padres.get(categoria_id), 1
+        # Un padre inexistente o un ciclo cortan la cadena
+        while padre is not None and padre in padres and padre not in visitados:
+            filas.append((padre, categoria_id, profundidad))
+            visitados.add(padre)
+            padre, profundidad = padres[padre], profundidad + 1
+    return filas
+
+
+def reconstruir(cursor, lote: int = 5000) -> int:
+    """Regenera categorias_cierre desde categoria_padre_id; devuelve las filas escritas"""
+    cursor.execute("SELECT categoria_id, categoria_padre_id FROM categorias")
+    filas = cierre(dict(cursor.fetchall()))
+    cursor.execute("DELETE FROM categorias_cierre")
+    for inicio in range(0, len(filas), lote):
+        cursor.executemany("INSERT INTO categorias_cierre (ancestro_id, descendiente_id, profundidad) "
+                           "VALUES (%s, %s, %s)", filas[inicio:inicio + lote])
+    return len(filas)
+
+
+# ---------------------------------------------------------------------------- árbol en memoria
+
+class Jerarquia:
+    """
+    Instantánea inmutable del árbol de categorías.
+
+    Los nodos se numeran en preorden: el subárbol de un nodo ocupa
+    orden[entrada[id]:salida[id]], así que listar un subárbol o saber si una
+    categoría cuelga de otra no recorre el árbol.
+    """
+
+    def __init__(self, categorias: Iterable[Tuple[int, str, Optional[int]]], libros: Dict[int, int]):
+        self.nombres: Dict[int, str] = {}
+        self.padres: Dict[int, Optional[int]] = {}
+        for categoria_id, nombre, padre_id in categorias:
+            self.nombres[categoria_id] = nombre
+            self.padres[categoria_id] = padre_id
+        self.libros = libros
+
+        self._hijos: Dict[Optional[int], List[int]] = {}
+        for categoria_id, padre_id in self.padres.items():
+            if padre_id not in self.padres:
+                padre_id = None  # padre desaparecido: se muestra como raíz
+            self._hijos.setdefault(padre_id, []).append(categoria_id)
+        for hijos in self._hijos.values():
+            hijos.sort(key=lambda c: (self.nombres[c] or "").lower())
+
+        self.orden: List[int] = []
+        self.entrada: Dict[int, int] = {}
+        self.salida: Dict[int, int] = {}
+        self.profundidad: Dict[int, int] = {}
+        self._numerar()
+
+    def _numerar(self):
+        pila = [(categoria_id, 0, False) for categoria_id in reversed(self._hijos.get(None, []))]
+        while pila:
+            categoria_id, nivel, cerrar = pila.pop()
+            if cerrar:
+                self.salida[categoria_id] = len(self.orden)
+                continue
+            self.entrada[categoria_id] = len(self.orden)
+            self.profundidad[categoria_id] = nivel
+            self.orden.append(categoria_id)
+            pila.append((categoria_id, nivel, True))
+            pila.extend((hijo, nivel + 1, False) for hijo in reversed(self._hijos.get(categoria_id, []))
+                        if hijo not in self.entrada)
+        # Nodos en un ciclo (inalcanzables desde las raíces): quedan fuera del árbol
+        for categoria_id in self.nombres:
+            if categoria_id not in self.entrada:
+                self.profundidad[categoria_id] = 0
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def __contains__(self, categoria_id):
+        return categoria_id in self.nombres
+
+    def raices(self) -> List[int]:
+        return list(self._hijos.get(None, []))
+
+    def hijos(self, categoria_id: int) -> List[int]:
+        return list(self._hijos.get(categoria_id, []))
+
+    def subarbol(self, categoria_id: int) -> List[int]:
+        """La categoría y todos sus descendientes, en preorden"""
+        if categoria_id not in self.entrada:
+            return [categoria_id] if categoria_id in self.nombres else []
+        return self.orden[self.entrada[categoria_id]:self.salida[categoria_id]]
+
+    def cuelga_de(self, categoria_id: int, ancestro_id: int) -> bool:
+        """True si `categoria_id` está en el subárbol de `ancestro_id` (o es él)"""
+        if categoria_id not in self.entrada or ancestro_id not in self.entrada:
+            return categoria_id == ancestro_id
+        return self.entrada[ancestro_id] <= self.entrada[categoria_id] < self.salida[ancestro_id]
+
+    def ruta(self, categoria_id: int) -> List[int]:
+        """De la raíz a la categoría"""
+        ruta = []
+        actual = categoria_id
+        while actual in self.nombres and actual not in ruta:
+            ruta.append(actual)
+            actual = self.padres.get(actual)
+        ruta.reverse()
+        return ruta
+
+    def libros_en_subarbol(self, categoria_id: int) -> int:
+        """Libros distintos de la categoría y sus subcategorías"""
+        return self.libros.get(categoria_id, 0)
+
+
+class ArbolCategorias:
+    """Caché compartida de la Jerarquia; se recarga tras invalidar() o al caducar"""
+
+    MAX_EDAD = 300.0
+
+    def __init__(self, max_edad: Optional[float] = None):
+        self._bloqueo = threading.Lock()
+        self._jerarquia: Optional[Jerarquia] = None
+        self._cargada = 0.0
+        self._version = 0
+        self.max_edad = self.MAX_EDAD if max_edad is None else max_edad
+
+    def _vigente(self) -> Optional[Jerarquia]:
+        jerarquia = self._jerarquia
+        if jerarquia is not None and time.monotonic() - self._cargada < self.max_edad:
+            return jerarquia
+        return None
+
+    def obtener(self) -> Jerarquia:
+        jerarquia = self._vigente()
+        if jerarquia is not None:
+            return jerarquia
+        with self._bloqueo:
+            jerarquia = self._vigente()
+            if jerarquia is not None:
+                return jerarquia
+            version = self._version
+            jerarquia = self._cargar()
+            # Si se invalidó durante la carga, esta ya puede estar desfasada: no se guarda
+            if version == self._version:
+                self._jerarquia = jerarquia
+                self._cargada = time.monotonic()
+            return jerarquia
+
+    def invalidar(self):
+        self._version += 1
+        self._jerarquia = None
+
+    @staticmethod
+    def _cargar() -> Jerarquia:
+        db = DatabaseManager()
+        db.connect()
+        try:
+            categorias = db.fetch_all("SELECT categoria_id, nombre, categoria_padre_id FROM categorias", crudo=True)
+            libros = db.fetch_all(SQL_CONTAR_TODOS, crudo=True)
+        finally:
+            db.disconnect()
+        return Jerarquia(categorias, {categoria_id: total for categoria_id, total in libros})
+
+
+ARBOL = ArbolCategorias()
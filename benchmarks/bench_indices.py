@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+bench_indices.py – Planes y tiempos de las consultas de los controladores antes y después de la migración 1.
+
+Para cada consulta captura el EXPLAIN (tipo de acceso, índice, filas
+estimadas y Extra) y la mediana de `--repeticiones` ejecuciones con el
+esquema sin los índices de relaciones, aplica la migración con Migrador y
+repite la medida. Imprime ambos planes y la aceleración de cada consulta;
+con --salida los guarda también en JSON.
+
+Si la migración ya está aplicada hay que pasar --revertir para medir el
+estado anterior (los índices se vuelven a crear al final). Necesita una base
+de datos creada con libreria.sql y con datos: con tablas casi vacías el
+optimizador puede preferir recorridos completos y las diferencias no son
+representativas.
+
+Uso:
+  python benchmarks/bench_indices.py --repeticiones 50 --revertir --salida indices.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import mysql.connector
+
+from config import DB_CONFIG
+from migraciones import MIGRACIONES, Migrador
+
+VERSION = 1
+
+# nombre -> (origen, consulta, consulta que elige el parámetro: el valor con más filas)
+CONSULTAS = {
+    'libros_de_autor': (
+        "app.gestionar_autores",
+        """
+        SELECT l.libro_id, l.titulo, l.subtitulo, l.editorial, l.precio
+        FROM libros l
+        JOIN libro_autor la ON l.libro_id = la.libro_id
+        WHERE la.autor_id = %s
+        ORDER BY l.titulo
+        """,
+        "SELECT autor_id FROM libro_autor GROUP BY autor_id ORDER BY COUNT(*) DESC LIMIT 1",
+    ),
+    'libros_de_categoria': (
+        "app.gestionar_categorias",
+        """
+        SELECT l.libro_id, l.titulo, l.subtitulo,
+               GROUP_CONCAT(DISTINCT CONCAT(a.nombre, ' ', a.apellido) SEPARATOR ', ') AS autores,
+               l.editorial, l.precio
+        FROM libros l
+        JOIN libro_categoria lc ON l.libro_id = lc.libro_id
+        LEFT JOIN libro_autor la ON l.libro_id = la.libro_id
+        LEFT JOIN autores a ON la.autor_id = a.autor_id
+        WHERE lc.categoria_id = %s
+        GROUP BY l.libro_id
+        ORDER BY l.titulo
+        """,
+        "SELECT categoria_id FROM libro_categoria GROUP BY categoria_id ORDER BY COUNT(*) DESC LIMIT 1",
+    ),
+    'detalles_de_venta': (
+        "VentaController.obtener_detalles_venta",
+        """
+        SELECT dv.*, l.titulo
+        FROM detalles_venta dv
+        JOIN libros l ON dv.libro_id = l.libro_id
+        WHERE dv.venta_id = %s
+        """,
+        "SELECT venta_id FROM detalles_venta GROUP BY venta_id ORDER BY COUNT(*) DESC LIMIT 1",
+    ),
+    'total_ventas_autor': (
+        "procedimiento total_ventas_autor",
+        """
+        SELECT a.autor_id, CONCAT(a.nombre, ' ', a.apellido) AS autor,
+               SUM(dv.cantidad * dv.precio_unitario) AS total_ventas
+        FROM autores a
+        JOIN libro_autor la ON a.autor_id = la.autor_id
+        JOIN detalles_venta dv ON la.libro_id = dv.libro_id
+        WHERE a.autor_id = %s
+        GROUP BY a.autor_id
+        """,
+        "SELECT autor_id FROM libro_autor GROUP BY autor_id ORDER BY COUNT(*) DESC LIMIT 1",
+    ),
+    'resenas_de_libro': (
+        "ResenaController.obtener_por_libro",
+        """
+        SELECT r.*, CONCAT(c.nombre, ' ', c.apellido) as cliente_nombre
+        FROM resenas r
+        JOIN clientes c ON r.cliente_id = c.cliente_id
+        WHERE r.libro_id = %s
+        ORDER BY r.fecha_resena DESC
+        """,
+        "SELECT libro_id FROM resenas GROUP BY libro_id ORDER BY COUNT(*) DESC LIMIT 1",
+    ),
+    'ventas_de_cliente': (
+        "historial de compras (vista_ventas_detallada por cliente)",
+        """
+        SELECT v.venta_id, v.fecha_venta, v.total, v.estado
+        FROM ventas v
+        WHERE v.cliente_id = %s
+        ORDER BY v.fecha_venta DESC
+        LIMIT 20
+        """,
+        "SELECT cliente_id FROM ventas GROUP BY cliente_id ORDER BY COUNT(*) DESC LIMIT 1",
+    ),
+}
+
+
+def elegir_parametros(cursor):
+    parametros = {}
+    for nombre, (_, _, sql_parametro) in CONSULTAS.items():
+        cursor.execute(sql_parametro)
+        fila = cursor.fetchone()
+        if fila is not None:
+            parametros[nombre] = fila[0]
+    return parametros
+
+
+def explicar(cursor, sql, parametro):
+    cursor.execute("EXPLAIN " + sql, (parametro,))
+    columnas = cursor.column_names
+    return [{c: fila[columnas.index(c)] for c in ('table', 'type', 'key', 'rows', 'Extra')}
+            for fila in cursor.fetchall()]
+
+
+def cronometrar(cursor, sql, parametro, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql, (parametro,))
+        cursor.fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def medir(cursor, parametros, repeticiones):
+    resultados = {}
+    for nombre, parametro in parametros.items():
+        _, sql, _ = CONSULTAS[nombre]
+        cronometrar(cursor, sql, parametro, 1)  # calienta el buffer pool
+        resultados[nombre] = {'plan': explicar(cursor, sql, parametro),
+                              'ms': cronometrar(cursor, sql, parametro, repeticiones)}
+    return resultados
+
+
+def resumen_plan(plan):
+    return "; ".join(f"{p['table']}:{p['type']}/{p['key'] or '-'}/{p['rows']}" for p in plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN y tiempos antes/después de los índices de relaciones')
+    parser.add_argument("--repeticiones", type=int, default=30, help="Ejecuciones por consulta (se toma la mediana)")
+    parser.add_argument("--revertir", action='store_true', help="Revierte la migración si ya está aplicada")
+    parser.add_argument("--salida", help="Fichero JSON con planes y tiempos")
+    parser.add_argument("--host", default=DB_CONFIG.get('host', 'localhost'))
+    parser.add_argument("--port", type=int, default=DB_CONFIG.get('port', 3306))
+    parser.add_argument("--user", default=DB_CONFIG.get('user'))
+    parser.add_argument("--password", default=DB_CONFIG.get('password'))
+    parser.add_argument("--database", default=DB_CONFIG.get('database', 'libreria'))
+    args = parser.parse_args()
+
+    conexion = {'host': args.host, 'port': args.port, 'user': args.user,
+                'password': args.password, 'database': args.database}
+    # Solo la migración de índices: revertir(VERSION - 1) no debe tocar las posteriores
+    migrador = Migrador(conexion, migraciones=[m for m in MIGRACIONES if m.version == VERSION])
+    if migrador.version() >= VERSION:
+        if not args.revertir:
+            print(f"La migración {VERSION} ya está aplicada: use --revertir para medir el estado anterior")
+            sys.exit(1)
+        migrador.revertir(VERSION - 1)
+
+    conn = mysql.connector.connect(autocommit=True, **conexion)
+    cursor = conn.cursor()
+    try:
+        parametros = elegir_parametros(cursor)
+        antes = medir(cursor, parametros, args.repeticiones)
+        inicio = time.perf_counter()
+        migrador.aplicar(VERSION)
+        segundos_migracion = time.perf_counter() - inicio
+        despues = medir(cursor, parametros, args.repeticiones)
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"Migración {VERSION} aplicada en {segundos_migracion:.1f} s; mediana de {args.repeticiones} ejecuciones\n")
+    print(f"{'consulta':<22}{'antes (ms)':>12}{'después (ms)':>14}{'aceleración':>13}")
+    for nombre in parametros:
+        ms_antes, ms_despues = antes[nombre]['ms'], despues[nombre]['ms']
+        aceleracion = ms_antes / ms_despues if ms_despues else float('inf')
+        print(f"{nombre:<22}{ms_antes:>12.3f}{ms_despues:>14.3f}{aceleracion:>12.1f}x")
+    print("\nPlanes (tabla:tipo/índice/filas estimadas):")
+    for nombre in parametros:
+        print(f"  {nombre} [{CONSULTAS[nombre][0]}]")
+        print(f"    antes:   {resumen_plan(antes[nombre]['plan'])}")
+        print(f"    después: {resumen_plan(despues[nombre]['plan'])}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'repeticiones': args.repeticiones,
+                       'segundos_migracion': segundos_migracion, 'parametros': parametros,
+                       'antes': antes, 'despues': despues}, f, ensure_ascii=False, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_modelos.py – Compara memoria y tiempo de hidratación de filas de libros.
+
+Simula el resultado de `SELECT * FROM vista_libros_detallada` y mide, por
+cada representación, el tiempo de construcción y la memoria retenida:
+  - dict:   lo que devuelve hoy cursor(dictionary=True)
+  - tupla:  filas crudas del cursor
+  - Libro:  modelos con __slots__ construidos con Libro.from_rows
+
+Uso:
+  python benchmarks/bench_modelos.py --filas 1000000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import Libro
+
+COLUMNAS = Libro.CAMPOS
+
+
+def generar_filas(n):
+    """Filas con los tipos que devuelve mysql.connector para la vista de libros"""
+    return [
+        (i, f"Título {i}", "Subtítulo", f"978{i:010d}", date(2000, 1, 1), "1ª Edición",
+         "Editorial", Decimal("19.99"), 10, "Descripción", 300, "es", Decimal("4.50"),
+         None, "Tapa blanda", "Autor Uno", "Ficción")
+        for i in range(n)
+    ]
+
+
+def como_dicts(filas):
+    return [dict(zip(COLUMNAS, fila)) for fila in filas]
+
+
+def como_tuplas(filas):
+    # Las tuplas ya las crea el cursor: solo se retiene la lista
+    return list(filas)
+
+
+def como_modelos(filas):
+    return Libro.from_rows(filas, COLUMNAS)
+
+
+def medir(nombre, funcion, filas):
+    """Tiempo sin trazas y, en una segunda pasada, memoria retenida con tracemalloc"""
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = funcion(filas)
+    segundos = time.perf_counter() - inicio
+    del resultado
+
+    gc.collect()
+    tracemalloc.start()
+    resultado = funcion(filas)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    return nombre, segundos, memoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de hidratación de modelos')
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Número de filas simuladas")
+    args = parser.parse_args()
+
+    filas = generar_filas(args.filas)
+    print(f"Filas: {args.filas:,}")
+    print(f"{'representación':<16}{'tiempo (s)':>12}{'memoria (MB)':>15}{'bytes/fila':>12}")
+    for nombre, funcion in (("dict", como_dicts), ("tupla (cursor)", como_tuplas), ("Libro (slots)", como_modelos)):
+        nombre, segundos, memoria = medir(nombre, funcion, filas)
+        print(f"{nombre:<16}{segundos:>12.3f}{memoria / 1e6:>15.1f}{memoria / args.filas:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+bench_similitud.py – Construcción y latencia de consulta del índice de similitud.
+
+Genera un catálogo sintético (temas con vocabulario propio, palabras de
+cola larga, autores y categorías) servido por un `consultar` en memoria, y
+mide:
+  - reconstruir(): tiempo y tamaño de la matriz
+  - similares(): latencia p50/p95/p99 sobre libros al azar
+  - recargar_ids(): tiempo por lote de libros modificados
+
+Uso:
+  python benchmarks/bench_similitud.py --libros 1000000 --consultas 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db_manager import FilasCrudas
+from similitud import COLUMNAS, IndiceSimilitud
+
+
+def generar_catalogo(n, temas=200, vocabulario=200_000, semilla=1):
+    azar = random.Random(semilla)
+    palabras_tema = [[f"tema{t}p{i}" for i in range(15)] for t in range(temas)]
+    libros = []
+    for libro_id in range(1, n + 1):
+        tema = azar.randrange(temas)
+        palabras = azar.sample(palabras_tema[tema], 6) + [f"w{azar.randrange(vocabulario)}" for _ in range(25)]
+        libros.append((libro_id, " ".join(palabras[:4]), None, " ".join(palabras),
+                       f"Autor{azar.randrange(n // 20 + 1)} Apellido", f"Categoria{tema}"))
+    return libros
+
+
+def consultor(libros):
+    """`consultar` en memoria con la semántica de SQL_TEXTOS (libros[i] tiene libro_id i + 1)"""
+    def consultar(query, params):
+        if "IN (" in query:
+            filas = [libros[i - 1] for i in params[:-1] if 0 < i <= len(libros)]
+        else:
+            desde, limite = params
+            filas = libros[desde:desde + limite]
+        return FilasCrudas(filas, COLUMNAS)
+    return consultar
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del índice de similitud')
+    parser.add_argument("--libros", type=int, default=1_000_000, help="Libros del catálogo sintético")
+    parser.add_argument("--consultas", type=int, default=2000, help="Consultas de similares a medir")
+    parser.add_argument("--modificados", type=int, default=1000, help="Libros por lote de recargar_ids")
+    args = parser.parse_args()
+
+    libros = generar_catalogo(args.libros)
+    indice = IndiceSimilitud(consultor(libros))
+
+    inicio = time.perf_counter()
+    indice.reconstruir()
+    print(f"Libros: {args.libros:,}")
+    print(f"reconstruir: {time.perf_counter() - inicio:.1f} s, {len(indice.principal.indices):,} rasgos, "
+          f"{(indice.principal.indices.nbytes + indice.principal.pesos.nbytes) * 2 / 1e6:.0f} MB")
+
+    azar = random.Random(2)
+    tiempos = []
+    for _ in range(args.consultas):
+        libro_id = azar.randint(1, args.libros)
+        inicio = time.perf_counter()
+        indice.similares(libro_id, 10)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    print(f"similares (ms): p50 {percentil(tiempos, 50):.2f}  p95 {percentil(tiempos, 95):.2f}  "
+          f"p99 {percentil(tiempos, 99):.2f}")
+
+    ids = azar.sample(range(1, args.libros + 1), min(args.modificados, args.libros))
+    inicio = time.perf_counter()
+    indice.recargar_ids(ids)
+    print(f"recargar_ids({len(ids)}): {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+carga_reservas.py – Prueba de carga del motor de reservas: el stock nunca es negativo.
+
+Crea unos libros de prueba con poco stock y lanza muchos compradores
+concurrentes contra ellos durante `--segundos`. Cada comprador reserva un
+carrito y luego lo confirma (en lotes, por un hilo confirmador), lo libera o
+lo abandona para que venza; una parte de las ventas entra además sin reserva,
+directamente en detalles_venta, para ejercitar la condición del trigger.
+Mientras tanto un monitor consulta el stock de los libros de prueba.
+
+Al final se comprueba que:
+  - el monitor nunca vio stock < 0 ni stock_reservado > stock,
+  - tras el barrido no queda nada reservado,
+  - stock inicial - stock final == unidades vendidas en detalles_venta.
+Sale con código 1 si alguna comprobación falla. Necesita una base de datos
+creada con libreria.sql; los datos de prueba se borran al terminar.
+
+Uso:
+  python benchmarks/carga_reservas.py --compradores 64 --stock 30 --segundos 20
+"""
+
+import argparse
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import mysql.connector
+
+from config import DB_CONFIG
+from ingesta_ventas import SQL_DETALLE, SQL_VENTA
+from reservas_stock import MotorReservas, StockInsuficiente
+
+
+class Contadores:
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self.valores = {}
+
+    def sumar(self, nombre, n=1):
+        with self._bloqueo:
+            self.valores[nombre] = self.valores.get(nombre, 0) + n
+
+
+def preparar(conexion, n_libros, stock):
+    conn = mysql.connector.connect(autocommit=True, **conexion)
+    cursor = conn.cursor()
+    marca = uuid.uuid4().hex[:12]
+    cursor.execute("INSERT INTO clientes (nombre, apellido, email, password) VALUES (%s, %s, %s, %s)",
+                   ("Carga", "Reservas", f"carga-{marca}@example.invalid", "-"))
+    cliente_id = cursor.lastrowid
+    libros = []
+    for i in range(n_libros):
+        cursor.execute("INSERT INTO libros (titulo, precio, stock) VALUES (%s, %s, %s)",
+                       (f"Carga reservas {marca} #{i}", 10, stock))
+        libros.append(cursor.lastrowid)
+    cursor.close()
+    conn.close()
+    return cliente_id, libros
+
+
+def limpiar(conexion, cliente_id, libros):
+    conn = mysql.connector.connect(autocommit=True, **conexion)
+    cursor = conn.cursor()
+    marcadores = ', '.join(['%s'] * len(libros))
+    cursor.execute("DELETE FROM ventas WHERE cliente_id = %s", (cliente_id,))
+    cursor.execute(f"DELETE FROM libros WHERE libro_id IN ({marcadores})", libros)
+    cursor.execute("DELETE FROM clientes WHERE cliente_id = %s", (cliente_id,))
+    cursor.close()
+    conn.close()
+
+
+def comprador(motor, conexion, cliente_id, libros, fin, confirmaciones, contadores, semilla):
+    azar = random.Random(semilla)
+    directa = mysql.connector.connect(**conexion)
+    cursor = directa.cursor()
+    while time.perf_counter() < fin:
+        lineas = [(libro_id, azar.randint(1, 3)) for libro_id in azar.sample(libros, azar.randint(1, 2))]
+        if azar.random() < 0.1:
+            # Venta sin reserva: solo la protege la condición del trigger
+            try:
+                directa.start_transaction()
+                cursor.execute(SQL_VENTA, (cliente_id, 0, 'Efectivo', 'Completada'))
+                venta_id = cursor.lastrowid
+                cursor.executemany(SQL_DETALLE, [(venta_id, libro_id, cantidad, 10, 0)
+                                                 for libro_id, cantidad in lineas])
+                directa.commit()
+                contadores.sumar('ventas_directas')
+            except mysql.connector.Error:
+                directa.rollback()
+                contadores.sumar('directas_rechazadas')
+            continue
+
+        carrito = f"carga-{uuid.uuid4().hex}"
+        try:
+            motor.reservar(carrito, lineas)
+        except StockInsuficiente:
+            contadores.sumar('reservas_rechazadas')
+            continue
+        contadores.sumar('reservas')
+        time.sleep(azar.uniform(0, 0.05))
+        destino = azar.random()
+        if destino < 0.6:
+            confirmaciones.put((carrito, {
+                'cliente_id': cliente_id, 'metodo_pago': 'Tarjeta',
+                'detalles': [{'libro_id': libro_id, 'cantidad': cantidad, 'precio_unitario': 10}
+                             for libro_id, cantidad in lineas],
+            }))
+        elif destino < 0.8:
+            motor.liberar(carrito)
+            contadores.sumar('liberadas')
+        else:
+            contadores.sumar('abandonadas')
+    cursor.close()
+    directa.close()
+
+
+def confirmador(motor, confirmaciones, tam_lote, contadores, terminar):
+    while not (terminar.is_set() and confirmaciones.empty()):
+        try:
+            lote = [confirmaciones.get(timeout=0.05)]
+        except queue.Empty:
+            continue
+        while len(lote) < tam_lote:
+            try:
+                lote.append(confirmaciones.get_nowait())
+            except queue.Empty:
+                break
+        inicio = time.perf_counter()
+        resultados = motor.confirmar_lote(lote)
+        contadores.sumar('lotes_confirmados')
+        contadores.sumar('ms_confirmacion', (time.perf_counter() - inicio) * 1000)
+        for resultado in resultados:
+            contadores.sumar('confirmadas_error' if isinstance(resultado, Exception) else 'confirmadas')
+
+
+def monitor(conexion, libros, terminar, minimos):
+    conn = mysql.connector.connect(autocommit=True, **conexion)
+    cursor = conn.cursor()
+    marcadores = ', '.join(['%s'] * len(libros))
+    while not terminar.is_set():
+        cursor.execute(f"SELECT MIN(stock), MIN(stock - stock_reservado), MIN(stock_reservado) "
+                       f"FROM libros WHERE libro_id IN ({marcadores})", libros)
+        stock, libre, reservado = cursor.fetchone()
+        minimos['stock'] = min(minimos['stock'], stock)
+        minimos['libre'] = min(minimos['libre'], libre)
+        minimos['reservado'] = min(minimos['reservado'], reservado)
+        time.sleep(0.01)
+    cursor.close()
+    conn.close()
+
+
+def comprobar(conexion, libros, stock_inicial, minimos):
+    conn = mysql.connector.connect(autocommit=True, **conexion)
+    cursor = conn.cursor()
+    marcadores = ', '.join(['%s'] * len(libros))
+    cursor.execute(f"SELECT libro_id, stock, stock_reservado FROM libros WHERE libro_id IN ({marcadores})", libros)
+    finales = {libro_id: (stock, reservado) for libro_id, stock, reservado in cursor.fetchall()}
+    cursor.execute(f"SELECT libro_id, COALESCE(SUM(cantidad), 0) FROM detalles_venta "
+                   f"WHERE libro_id IN ({marcadores}) GROUP BY libro_id", libros)
+    vendidas = dict(cursor.fetchall())
+    cursor.execute(f"SELECT COUNT(*) FROM reservas_stock WHERE libro_id IN ({marcadores})", libros)
+    reservas_vivas = cursor.fetchone()[0]
+    cursor.close()
+    conn.close()
+
+    fallos = []
+    if minimos['stock'] < 0 or minimos['libre'] < 0 or minimos['reservado'] < 0:
+        fallos.append(f"el monitor vio valores negativos: {minimos}")
+    if reservas_vivas:
+        fallos.append(f"quedan {reservas_vivas} reservas tras el barrido")
+    for libro_id in libros:
+        stock, reservado = finales[libro_id]
+        if stock < 0:
+            fallos.append(f"libro {libro_id}: stock final negativo ({stock})")
+        if reservado:
+            fallos.append(f"libro {libro_id}: stock_reservado final {reservado}")
+        if stock_inicial - stock != int(vendidas.get(libro_id, 0)):
+            fallos.append(f"libro {libro_id}: faltan {stock_inicial - stock} unidades y se vendieron "
+                          f"{vendidas.get(libro_id, 0)}")
+    return finales, vendidas, fallos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de reservas de stock')
+    parser.add_argument("--compradores", type=int, default=32, help="Hilos compradores concurrentes")
+    parser.add_argument("--libros", type=int, default=3, help="Libros de prueba")
+    parser.add_argument("--stock", type=int, default=50, help="Stock inicial de cada libro")
+    parser.add_argument("--segundos", type=float, default=10, help="Duración de la carga")
+    parser.add_argument("--duracion-reserva", type=float, default=1.0, help="Segundos hasta que vence una reserva")
+    parser.add_argument("--tam-lote", type=int, default=20, help="Carritos por transacción de confirmación")
+    parser.add_argument("--pool", type=int, default=16, help="Conexiones del motor de reservas")
+    parser.add_argument("--host", default=DB_CONFIG.get('host', 'localhost'))
+    parser.add_argument("--port", type=int, default=DB_CONFIG.get('port', 3306))
+    parser.add_argument("--user", default=DB_CONFIG.get('user'))
+    parser.add_argument("--password", default=DB_CONFIG.get('password'))
+    parser.add_argument("--database", default=DB_CONFIG.get('database', 'libreria'))
+    args = parser.parse_args()
+
+    conexion = {'host': args.host, 'port': args.port, 'user': args.user,
+                'password': args.password, 'database': args.database}
+    cliente_id, libros = preparar(conexion, args.libros, args.stock)
+    motor = MotorReservas(conexion, duracion=args.duracion_reserva, tam_pool=args.pool)
+    motor.iniciar_barrido(intervalo=min(0.5, args.duracion_reserva / 2))
+    contadores = Contadores()
+    confirmaciones = queue.Queue()
+    terminar = threading.Event()
+    minimos = {'stock': args.stock, 'libre': args.stock, 'reservado': 0}
+
+    try:
+        fin = time.perf_counter() + args.segundos
+        hilos = [threading.Thread(target=comprador, args=(motor, conexion, cliente_id, libros, fin,
+                                                          confirmaciones, contadores, i))
+                 for i in range(args.compradores)]
+        auxiliares = [threading.Thread(target=confirmador, args=(motor, confirmaciones, args.tam_lote,
+                                                                 contadores, terminar)),
+                      threading.Thread(target=monitor, args=(conexion, libros, terminar, minimos))]
+        for hilo in hilos + auxiliares:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        terminar.set()
+        for hilo in auxiliares:
+            hilo.join()
+
+        motor.detener_barrido()
+        time.sleep(args.duracion_reserva)
+        while motor.liberar_caducadas():
+            pass
+
+        finales, vendidas, fallos = comprobar(conexion, libros, args.stock, minimos)
+    finally:
+        motor.detener_barrido()
+        limpiar(conexion, cliente_id, libros)
+
+    valores = contadores.valores
+    print(f"Compradores: {args.compradores}  libros: {args.libros}  stock inicial: {args.stock}")
+    for nombre in ('reservas', 'reservas_rechazadas', 'confirmadas', 'confirmadas_error', 'liberadas',
+                   'abandonadas', 'ventas_directas', 'directas_rechazadas', 'lotes_confirmados'):
+        print(f"{nombre:<22}{valores.get(nombre, 0):>10}")
+    print(f"{'reservas/s':<22}{valores.get('reservas', 0) / args.segundos:>10.1f}")
+    if valores.get('lotes_confirmados'):
+        print(f"{'ms por lote':<22}{valores['ms_confirmacion'] / valores['lotes_confirmados']:>10.2f}")
+    print(f"Mínimos observados: {minimos}")
+    for libro_id, (stock, reservado) in finales.items():
+        print(f"  libro {libro_id}: stock final {stock}, reservado {reservado}, vendidas {vendidas.get(libro_id, 0)}")
+    if fallos:
+        print("FALLO:\n  " + "\n  ".join(fallos))
+        sys.exit(1)
+    print("OK: el stock nunca fue negativo y cuadra con lo vendido")
+
+
+if __name__ == "__main__":
+    main()
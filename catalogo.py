@@ -0,0 +1,265 @@
+"""
+catalogo.py – Instantánea columnar del catálogo de libros en memoria.
+
+Las columnas numéricas se guardan en array.array (precio, stock,
+calificación) y las de texto repetitivo (idioma, formato, editorial) se
+codifican como diccionario: un array de códigos enteros más la lista de
+valores internados. Filtrar por formato es comparar enteros y ordenar por
+precio es ordenar un array, sin ida y vuelta a MySQL.
+
+Si NumPy está instalado los filtros y ordenaciones se vectorizan sobre
+vistas sin copia de los arrays; si no, se usa una ruta en Python puro.
+"""
+
+import sys
+from array import array
+from itertools import compress
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from db_manager import FilasCrudas
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+SQL_INSTANTANEA = """
+SELECT l.libro_id, l.titulo, l.editorial, l.precio, l.stock, l.idioma, l.formato,
+       l.calificacion,
+       GROUP_CONCAT(DISTINCT CONCAT(a.nombre, ' ', a.apellido) SEPARATOR ', ') AS autores,
+       GROUP_CONCAT(DISTINCT c.nombre SEPARATOR ', ') AS categorias
+FROM libros l
+LEFT JOIN libro_autor la ON l.libro_id = la.libro_id
+LEFT JOIN autores a ON la.autor_id = a.autor_id
+LEFT JOIN libro_categoria lc ON l.libro_id = lc.libro_id
+LEFT JOIN categorias c ON lc.categoria_id = c.categoria_id
+WHERE {condicion}
+GROUP BY l.libro_id
+ORDER BY l.libro_id
+LIMIT %s
+"""
+
+COLUMNAS = ('libro_id', 'titulo', 'autores', 'categorias', 'editorial',
+            'precio', 'stock', 'idioma', 'formato', 'calificacion')
+NUMERICAS = ('libro_id', 'precio', 'stock', 'calificacion')
+CODIFICADAS = ('idioma', 'formato', 'editorial')
+
+
+class ColumnaCodificada:
+    """Columna de texto codificada como diccionario (código entero por fila)"""
+
+    def __init__(self):
+        self.codigos = array('l')
+        self.valores: List[Optional[str]] = []
+        self._indice: Dict[Optional[str], int] = {}
+
+    def codigo(self, valor: Optional[str]) -> int:
+        codigo = self._indice.get(valor)
+        if codigo is None:
+            codigo = len(self.valores)
+            self.valores.append(sys.intern(valor) if isinstance(valor, str) else valor)
+            self._indice[valor] = codigo
+        return codigo
+
+    def buscar(self, valor: Optional[str]) -> int:
+        """Código de `valor` o -1 si no aparece en la columna"""
+        return self._indice.get(valor, -1)
+
+    def __getitem__(self, posicion: int) -> Optional[str]:
+        return self.valores[self.codigos[posicion]]
+
+
+class CatalogoColumnar:
+    """
+    Instantánea columnar de libros + autores + categorías.
+
+    `consultar(query, params)` debe devolver FilasCrudas (por ejemplo
+    SistemaLibreria.ejecutar_consulta con crudo=True). `refrescar` solo trae
+    los libros con libro_id mayor que la marca de agua; `recargar_ids`
+    reemplaza en sitio filas modificadas o las marca como borradas.
+    """
+
+    def __init__(self, consultar: Callable[[str, tuple], FilasCrudas], lote: int = 50_000):
+        self.consultar = consultar
+        self.lote = lote
+        self.marca_libro_id = 0
+        self.libro_id = array('l')
+        self.precio = array('d')
+        self.stock = array('l')
+        self.calificacion = array('d')
+        self.titulo: List[str] = []
+        self.autores: List[Optional[str]] = []
+        self.categorias: List[Optional[str]] = []
+        self.idioma = ColumnaCodificada()
+        self.formato = ColumnaCodificada()
+        self.editorial = ColumnaCodificada()
+        self.activo = bytearray()
+        self._posicion: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.libro_id)
+
+    def refrescar(self, consultar: Optional[Callable] = None) -> int:
+        """
+        Añade los libros nuevos (libro_id > marca de agua) y devuelve cuántos se añadieron.
+
+        Como en leer_ids, `consultar` permite leer con la conexión de otro hilo.
+        """
+        consultar = consultar or self.consultar
+        nuevos = 0
+        while True:
+            filas = consultar(SQL_INSTANTANEA.format(condicion="l.libro_id > %s"),
+                                   (self.marca_libro_id, self.lote))
+            if not filas:
+                break
+            self._agregar(filas)
+            nuevos += len(filas)
+            if len(filas) < self.lote:
+                break
+        return nuevos
+
+    def recargar_ids(self, ids: Iterable[int]):
+        """Vuelve a leer los libros indicados; los que ya no existen quedan inactivos"""
+        ids = list(ids)
+        if ids:
+            self.aplicar_ids(ids, self.leer_ids(ids))
+
+    def leer_ids(self, ids: List[int], consultar: Optional[Callable] = None) -> FilasCrudas:
+        """
+        Lee las filas actuales de `ids` sin tocar el catálogo.
+
+        Con `consultar` la lectura usa otra conexión, p. ej. desde un hilo
+        distinto del que aplica el resultado con aplicar_ids.
+        """
+        marcadores = ','.join(['%s'] * len(ids))
+        return (consultar or self.consultar)(SQL_INSTANTANEA.format(condicion=f"l.libro_id IN ({marcadores})"),
+                                             tuple(ids) + (len(ids),))
+
+    def aplicar_ids(self, ids: List[int], filas: FilasCrudas):
+        """Escribe las filas leídas con leer_ids; los `ids` sin fila quedan inactivos"""
+        encontrados = set()
+        columnas = filas.columnas if filas else None
+        for fila in filas:
+            libro_id = fila[columnas['libro_id']]
+            encontrados.add(libro_id)
+            posicion = self._posicion.get(libro_id)
+            if posicion is None:
+                self._agregar(FilasCrudas([fila], columnas))
+            else:
+                self._escribir(posicion, fila, columnas)
+        for libro_id in ids:
+            if libro_id not in encontrados and libro_id in self._posicion:
+                self.activo[self._posicion[libro_id]] = 0
+
+    def _agregar(self, filas: FilasCrudas):
+        obtener = filas.columnas.getter(*COLUMNAS)
+        for (libro_id, titulo, autores, categorias, editorial,
+             precio, stock, idioma, formato, calificacion) in map(obtener, filas):
+            self._posicion[libro_id] = len(self.libro_id)
+            self.libro_id.append(libro_id)
+            self.titulo.append(titulo)
+            self.autores.append(autores)
+            self.categorias.append(categorias)
+            self.editorial.codigos.append(self.editorial.codigo(editorial))
+            self.precio.append(float(precio or 0))
+            self.stock.append(stock or 0)
+            self.idioma.codigos.append(self.idioma.codigo(idioma))
+            self.formato.codigos.append(self.formato.codigo(formato))
+            self.calificacion.append(float(calificacion or 0))
+            self.activo.append(1)
+            if libro_id > self.marca_libro_id:
+                self.marca_libro_id = libro_id
+
+    def _escribir(self, posicion: int, fila: tuple, columnas):
+        (_, titulo, autores, categorias, editorial,
+         precio, stock, idioma, formato, calificacion) = columnas.getter(*COLUMNAS)(fila)
+        self.titulo[posicion] = titulo
+        self.autores[posicion] = autores
+        self.categorias[posicion] = categorias
+        self.editorial.codigos[posicion] = self.editorial.codigo(editorial)
+        self.precio[posicion] = float(precio or 0)
+        self.stock[posicion] = stock or 0
+        self.idioma.codigos[posicion] = self.idioma.codigo(idioma)
+        self.formato.codigos[posicion] = self.formato.codigo(formato)
+        self.calificacion[posicion] = float(calificacion or 0)
+        self.activo[posicion] = 1
+
+    def filtrar(self, precio_min: float = None, precio_max: float = None,
+                stock_min: int = None, calificacion_min: float = None,
+                idioma: str = None, formato: str = None, editorial: str = None) -> Sequence[int]:
+        """Posiciones de los libros activos que cumplen todos los filtros indicados"""
+        codificados = []
+        for columna, valor in (('idioma', idioma), ('formato', formato), ('editorial', editorial)):
+            if valor is not None:
+                codigo = getattr(self, columna).buscar(valor)
+                if codigo < 0:
+                    return []
+                codificados.append((getattr(self, columna).codigos, codigo))
+
+        rangos = [(columna, minimo, maximo) for columna, minimo, maximo in (
+            (self.precio, precio_min, precio_max),
+            (self.stock, stock_min, None),
+            (self.calificacion, calificacion_min, None),
+        ) if minimo is not None or maximo is not None]
+
+        if np is not None and len(self):
+            return self._filtrar_numpy(rangos, codificados)
+
+        # Ruta sin NumPy: primero los filtros por código (comparaciones de enteros)
+        posiciones = list(compress(range(len(self.activo)), self.activo))
+        for codigos, codigo in codificados:
+            posiciones = [i for i in posiciones if codigos[i] == codigo]
+        for columna, minimo, maximo in rangos:
+            if minimo is not None:
+                posiciones = [i for i in posiciones if columna[i] >= minimo]
+            if maximo is not None:
+                posiciones = [i for i in posiciones if columna[i] <= maximo]
+        return posiciones
+
+    def _filtrar_numpy(self, rangos, codificados) -> Sequence[int]:
+        mascara = np.frombuffer(self.activo, dtype=np.uint8).astype(bool)
+        for columna, minimo, maximo in rangos:
+            vista = np.frombuffer(columna, dtype=np.dtype(columna.typecode))
+            if minimo is not None:
+                mascara &= vista >= minimo
+            if maximo is not None:
+                mascara &= vista <= maximo
+        for codigos, codigo in codificados:
+            mascara &= np.frombuffer(codigos, dtype=np.dtype(codigos.typecode)) == codigo
+        return np.flatnonzero(mascara)
+
+    def ordenar(self, posiciones: Sequence[int], por: str = 'titulo', descendente: bool = False) -> Sequence[int]:
+        """Ordena las posiciones por una columna (estable)"""
+        if por in NUMERICAS:
+            columna = getattr(self, por)
+            if np is not None and len(posiciones):
+                posiciones = np.asarray(posiciones)
+                valores = np.frombuffer(columna, dtype=np.dtype(columna.typecode))[posiciones]
+                orden = np.argsort(-valores if descendente else valores, kind='stable')
+                return posiciones[orden]
+            clave = columna.__getitem__
+        else:
+            columna = getattr(self, por)
+            clave = lambda i: columna[i] or ''
+        return sorted(posiciones, key=clave, reverse=descendente)
+
+    def filas(self, posiciones: Sequence[int], columnas: Sequence[str] = COLUMNAS) -> FilasCrudas:
+        """Materializa las posiciones como FilasCrudas (para mostrar_tabla o DataTable)"""
+        lectores = []
+        for nombre in columnas:
+            columna = getattr(self, nombre)
+            lectores.append(columna.__getitem__)
+        return FilasCrudas(
+            (tuple(leer(i) for leer in lectores) for i in map(int, posiciones)),
+            columnas
+        )
+
+    def consultar_vista(self, orden: str = None, descendente: bool = False,
+                        limite: int = None, columnas: Sequence[str] = COLUMNAS, **filtros) -> FilasCrudas:
+        """Filtra, ordena y materializa en una sola llamada"""
+        posiciones = self.filtrar(**filtros)
+        if orden:
+            posiciones = self.ordenar(posiciones, orden, descendente)
+        if limite is not None:
+            posiciones = posiciones[:limite]
+        return self.filas(posiciones, columnas)
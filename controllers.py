@@ -1,17 +1,173 @@
+from collections import defaultdict
+from datetime import datetime
+
+import arbol_categorias
+from arbol_categorias import ARBOL
 from db_manager import DatabaseManager
+from eventos import SQL_REGISTRAR, inicio_ventana
 from models import Libro, Autor, Categoria, Cliente, Venta, DetalleVenta, Resena
 
-class LibroController:
+# Claves por consulta IN (...) al volver a leer filas del refresco incremental
+LOTE_CLAVES = 1000
+
+# Por debajo de este stock se registra un evento 'stock_bajo' (como hace after_venta_insert)
+UMBRAL_STOCK_BAJO = 5
+
+
+class ConsultaCambios:
+    """
+    Consultas para el refresco incremental de listados desde log_cambios.
+
+    Las clases que lo usan definen TABLA, CLAVE, COLUMNA_CLAVE (la clave con
+    el alias usado en la consulta) y SQL_LISTADO (el SELECT del listado, con
+    un marcador {condicion} en su WHERE). DEPENDENCIAS lleva las otras
+    tablas del feed que cambian filas del listado: tabla -> SELECT que
+    traduce sus claves (marcador {claves}) a claves del listado, o None si
+    la clave registrada ya es la del listado (relaciones por libro_id). La
+    marca de agua es el último cambio_id, tomado antes de leer el listado.
+    """
+    TABLA = None
+    CLAVE = None
+    COLUMNA_CLAVE = None
+    SQL_LISTADO = None
+    DEPENDENCIAS = {}
+
+    def _marca(self):
+        filas = self.db.fetch_all("SELECT COALESCE(MAX(cambio_id), 0) FROM log_cambios", crudo=True)
+        return filas[0][0] if filas else None
+
+    def marca_actual(self):
+        """Último cambio_id de log_cambios, usado como marca de agua (None si la consulta falla)"""
+        self.db.connect()
+        marca = self._marca()
+        self.db.disconnect()
+        return marca
+
+    def obtener_listado(self):
+        """Devuelve (FilasCrudas del listado completo, marca de agua inicial)"""
+        self.db.connect()
+        marca = self._marca()
+        filas = self.db.fetch_all(self.SQL_LISTADO.format(condicion="1 = 1"), crudo=True)
+        self.db.disconnect()
+        return filas, marca
+
+    def obtener_cambios(self, cambios):
+        """
+        Traduce un lote de log_cambios en (filas actuales de las claves afectadas, claves borradas).
+
+        Los DELETE de TABLA dan las claves borradas; del resto de claves
+        afectadas se vuelve a leer solo su fila del listado (en lotes de
+        LOTE_CLAVES). Devuelve None
+        si alguna consulta falla, para que el lote se reintente.
+        """
+        borradas = {c.clave for c in cambios if c.tabla == self.TABLA and c.operacion == 'DELETE'}
+        claves = {c.clave for c in cambios if c.tabla == self.TABLA and c.operacion != 'DELETE'}
+        relacionadas = defaultdict(set)
+        for cambio in cambios:
+            consulta = self.DEPENDENCIAS.get(cambio.tabla, False)
+            if consulta is None:
+                claves.add(cambio.clave)
+            elif consulta and cambio.operacion == 'UPDATE':
+                # Un autor o un cliente renombrados cambian las filas que los muestran
+                relacionadas[cambio.tabla].add(cambio.clave)
+        claves -= borradas
+
+        if not self.db.connect():
+            return None
+        try:
+            for tabla, ids in relacionadas.items():
+                filas = self.db.fetch_all(self.DEPENDENCIAS[tabla].format(claves=','.join(['%s'] * len(ids))),
+                                          tuple(ids), crudo=True)
+                if not filas.columnas:
+                    return None
+                claves.update(fila[0] for fila in filas)
+            claves = sorted(claves)
+            filas = []
+            for i in range(0, len(claves), LOTE_CLAVES):
+                lote = claves[i:i + LOTE_CLAVES]
+                leidas = self.db.fetch_all(
+                    self.SQL_LISTADO.format(condicion=f"{self.COLUMNA_CLAVE} IN ({','.join(['%s'] * len(lote))})"),
+                    tuple(lote), crudo=True
+                )
+                if not leidas.columnas:
+                    return None
+                filas.extend(leidas)
+            return filas, sorted(borradas)
+        finally:
+            self.db.disconnect()
+
+
+class LibroController(ConsultaCambios):
+    TABLA = "libros"
+    CLAVE = "libro_id"
+    COLUMNA_CLAVE = "l.libro_id"
+    DEPENDENCIAS = {
+        'libro_autor': None,
+        'libro_categoria': None,
+        'autores': "SELECT DISTINCT libro_id FROM libro_autor WHERE autor_id IN ({claves})",
+        'categorias': "SELECT DISTINCT libro_id FROM libro_categoria WHERE categoria_id IN ({claves})",
+    }
+    SQL_LISTADO = """
+    SELECT l.libro_id, l.titulo,
+           GROUP_CONCAT(DISTINCT CONCAT(a.nombre, ' ', a.apellido) SEPARATOR ', ') AS autores,
+           l.precio, l.stock
+    FROM libros l
+    LEFT JOIN libro_autor la ON l.libro_id = la.libro_id
+    LEFT JOIN autores a ON la.autor_id = a.autor_id
+    WHERE {condicion}
+    GROUP BY l.libro_id
+    ORDER BY l.libro_id
+    """
+
     def __init__(self):
         self.db = DatabaseManager()
     
-    def obtener_todos(self):
-        """Obtiene todos los libros con sus autores y categorías"""
+    def obtener_todos(self, como_modelos=False, crudo=False):
+        """
+        Obtiene todos los libros con sus autores y categorías.
+
+        como_modelos devuelve instancias de Libro; crudo devuelve FilasCrudas.
+        """
         self.db.connect()
-        libros = self.db.fetch_all("SELECT * FROM vista_libros_detallada")
+        if como_modelos:
+            libros = self.db.fetch_models("SELECT * FROM vista_libros_detallada", Libro)
+        else:
+            libros = self.db.fetch_all("SELECT * FROM vista_libros_detallada", crudo=crudo)
         self.db.disconnect()
         return libros
     
+    def obtener_pagina(self, despues_de=None, antes_de=None, limite=100):
+        """
+        Obtiene una página de libros ordenada por libro_id (paginación por clave).
+
+        Con despues_de devuelve los `limite` libros siguientes a ese ID; con
+        antes_de, los `limite` anteriores. Devuelve FilasCrudas con
+        libro_id, titulo, autores, precio y stock.
+        """
+        if antes_de is not None:
+            condicion, orden, valor = "libro_id < %s", "DESC", antes_de
+        else:
+            condicion, orden, valor = "libro_id > %s", "ASC", despues_de or 0
+        query = f"""
+        SELECT l.libro_id, l.titulo,
+               GROUP_CONCAT(DISTINCT CONCAT(a.nombre, ' ', a.apellido) SEPARATOR ', ') AS autores,
+               l.precio, l.stock
+        FROM (SELECT libro_id FROM libros WHERE {condicion} ORDER BY libro_id {orden} LIMIT %s) p
+        JOIN libros l ON l.libro_id = p.libro_id
+        LEFT JOIN libro_autor la ON l.libro_id = la.libro_id
+        LEFT JOIN autores a ON la.autor_id = a.autor_id
+        GROUP BY l.libro_id
+        ORDER BY l.libro_id
+        """
+        return self.consultar_crudo(query, (valor, limite))
+    
+    def consultar_crudo(self, query, params=None):
+        """Ejecuta una consulta de lectura sobre libros y devuelve FilasCrudas"""
+        self.db.connect()
+        filas = self.db.fetch_all(query, params, crudo=True)
+        self.db.disconnect()
+        return filas
+    
     def obtener_por_id(self, libro_id):
         """Obtiene un libro por su ID"""
         self.db.connect()
@@ -82,6 +238,86 @@ class LibroController:
         self.db.call_procedure("actualizar_stock", (libro_id, cantidad))
         self.db.disconnect()
     
+    def ajustar_stock_lote(self, ajustes, tam_lote=1000, umbral=UMBRAL_STOCK_BAJO):
+        """
+        Aplica muchos pares (libro_id, delta) con una sola conexión y un UPDATE por lote.
+
+        Los deltas del mismo libro se suman. En cada lote se bloquean las filas
+        (SELECT ... FOR UPDATE), se actualizan todas con un UPDATE ... JOIN y se
+        registran en log_eventos los libros que cruzan el umbral de stock bajo en
+        este ajuste (agrupados por libro y ventana, como el trigger); cada lote es
+        una transacción. Los ajustes que dejarían el stock por debajo de lo
+        reservado (o de 0) no se aplican.
+
+        Devuelve {'niveles': {libro_id: stock nuevo}, 'stock_bajo': [libro_id],
+        'rechazados': {libro_id: motivo}, 'no_encontrados': [libro_id]}.
+        """
+        totales = defaultdict(int)
+        for libro_id, delta in ajustes:
+            totales[int(libro_id)] += int(delta)
+        resultado = {'niveles': {}, 'stock_bajo': [], 'rechazados': {}, 'no_encontrados': []}
+        ids = sorted(totales)  # mismo orden de bloqueo que el motor de reservas
+
+        self.db.connect()
+        cursor = self.db.connection.cursor()
+        try:
+            for inicio in range(0, len(ids), tam_lote):
+                lote = {libro_id: totales[libro_id] for libro_id in ids[inicio:inicio + tam_lote]}
+                self._ajustar_lote(cursor, lote, umbral, resultado)
+                self.db.connection.commit()
+        except Exception:
+            self.db.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            self.db.disconnect()
+        return resultado
+
+    @staticmethod
+    def _ajustar_lote(cursor, lote, umbral, resultado):
+        marcadores = ', '.join(['%s'] * len(lote))
+        cursor.execute(
+            f"SELECT libro_id, stock, stock_reservado FROM libros WHERE libro_id IN ({marcadores}) FOR UPDATE",
+            tuple(lote)
+        )
+        actuales = {libro_id: (stock, reservado) for libro_id, stock, reservado in cursor.fetchall()}
+
+        aplicar = []
+        bajos = []
+        for libro_id, delta in lote.items():
+            if libro_id not in actuales:
+                resultado['no_encontrados'].append(libro_id)
+                continue
+            stock, reservado = actuales[libro_id]
+            nuevo = stock + delta
+            if nuevo < reservado:
+                resultado['rechazados'][libro_id] = f"quedaría {nuevo} con {reservado} reservados"
+                continue
+            resultado['niveles'][libro_id] = nuevo
+            if delta:
+                aplicar.extend((libro_id, delta))
+            if nuevo < umbral <= stock:
+                bajos.append((libro_id, nuevo))
+
+        if aplicar:
+            # Tabla derivada con los pares del lote: una sola sentencia para todo el lote
+            filas = " UNION ALL ".join(
+                ["SELECT %s AS libro_id, %s AS delta"] + ["SELECT %s, %s"] * (len(aplicar) // 2 - 1)
+            )
+            cursor.execute(
+                f"UPDATE libros l JOIN ({filas}) AS a ON a.libro_id = l.libro_id SET l.stock = l.stock + a.delta",
+                tuple(aplicar)
+            )
+        if bajos:
+            ahora = datetime.now()
+            ventana = inicio_ventana(ahora)
+            cursor.executemany(SQL_REGISTRAR, [
+                ('stock_bajo', f"libro:{libro_id}", f"Stock bajo para libro ID: {libro_id}. Stock actual: {nuevo}",
+                 1, ventana, ahora, ahora)
+                for libro_id, nuevo in bajos
+            ])
+            resultado['stock_bajo'].extend(libro_id for libro_id, _ in bajos)
+
     def asignar_autor(self, libro_id, autor_id):
         """Asigna un autor a un libro"""
         self.db.connect()
@@ -100,6 +336,8 @@ class LibroController:
             (libro_id, categoria_id)
         )
         self.db.disconnect()
+        if result:
+            ARBOL.invalidar()
         return result
 
 
@@ -107,10 +345,13 @@ class AutorController:
     def __init__(self):
         self.db = DatabaseManager()
     
-    def obtener_todos(self):
-        """Obtiene todos los autores"""
+    def obtener_todos(self, como_modelos=False):
+        """Obtiene todos los autores (como Autor si como_modelos)"""
         self.db.connect()
-        autores = self.db.fetch_all("SELECT * FROM autores")
+        if como_modelos:
+            autores = self.db.fetch_models("SELECT * FROM autores", Autor)
+        else:
+            autores = self.db.fetch_all("SELECT * FROM autores")
         self.db.disconnect()
         return autores
     
@@ -169,10 +410,13 @@ class CategoriaController:
     def __init__(self):
         self.db = DatabaseManager()
     
-    def obtener_todas(self):
-        """Obtiene todas las categorías"""
+    def obtener_todas(self, como_modelos=False):
+        """Obtiene todas las categorías (como Categoria si como_modelos)"""
         self.db.connect()
-        categorias = self.db.fetch_all("SELECT * FROM categorias")
+        if como_modelos:
+            categorias = self.db.fetch_models("SELECT * FROM categorias", Categoria)
+        else:
+            categorias = self.db.fetch_all("SELECT * FROM categorias")
         self.db.disconnect()
         return categorias
     
@@ -183,46 +427,129 @@ class CategoriaController:
         self.db.disconnect()
         return categoria
     
+    def _escribir(self, funcion, *args):
+        """
+        Ejecuta funcion(cursor, *args) en una transacción que cubre categorias y
+        categorias_cierre; invalida el árbol en memoria si se confirma.
+        """
+        self.db.connect()
+        cursor = self.db.connection.cursor()
+        try:
+            self.db.connection.start_transaction()
+            resultado = funcion(cursor, *args)
+            self.db.connection.commit()
+        except Exception as e:
+            self.db.connection.rollback()
+            print(f"Error al modificar categorías: {e}")
+            return None
+        finally:
+            cursor.close()
+            self.db.disconnect()
+        ARBOL.invalidar()
+        return resultado
+
     def crear(self, categoria):
         """Crea una nueva categoría"""
+        return self._escribir(self._crear, categoria)
+
+    @staticmethod
+    def _crear(cursor, categoria):
+        cursor.execute("INSERT INTO categorias (nombre, categoria_padre_id) VALUES (%s, %s)",
+                       (categoria.nombre, categoria.categoria_padre_id))
+        categoria_id = cursor.lastrowid
+        arbol_categorias.enlazar(cursor, categoria_id, categoria.categoria_padre_id)
+        return categoria_id
+
+    def actualizar(self, categoria):
+        """Actualiza una categoría existente (moviendo su subárbol si cambia el padre)"""
+        return bool(self._escribir(self._actualizar, categoria))
+
+    @staticmethod
+    def _actualizar(cursor, categoria):
+        cursor.execute("SELECT categoria_padre_id FROM categorias WHERE categoria_id = %s FOR UPDATE",
+                       (categoria.categoria_id,))
+        fila = cursor.fetchone()
+        if fila is None:
+            raise ValueError(f"No existe la categoría {categoria.categoria_id}")
+        nuevo_padre = categoria.categoria_padre_id
+        if nuevo_padre != fila[0] and nuevo_padre is not None and (
+                nuevo_padre == categoria.categoria_id
+                or arbol_categorias.es_descendiente(cursor, categoria.categoria_id, nuevo_padre)):
+            raise ValueError("Una categoría no puede colgar de sí misma ni de una subcategoría suya")
+
+        cursor.execute("UPDATE categorias SET nombre = %s, categoria_padre_id = %s WHERE categoria_id = %s",
+                       (categoria.nombre, nuevo_padre, categoria.categoria_id))
+        if nuevo_padre != fila[0]:
+            arbol_categorias.desenlazar(cursor, categoria.categoria_id)
+            arbol_categorias.enlazar(cursor, categoria.categoria_id, nuevo_padre)
+        return True
+
+    def eliminar(self, categoria_id):
+        """Elimina una categoría por su ID (sus subcategorías pasan a ser raíces)"""
+        return bool(self._escribir(self._eliminar, categoria_id))
+
+    @staticmethod
+    def _eliminar(cursor, categoria_id):
+        # Las hijas quedan sin padre (ON DELETE SET NULL): se separan de los
+        # ancestros de la eliminada; sus filas propias caen por ON DELETE CASCADE
+        arbol_categorias.desenlazar(cursor, categoria_id)
+        cursor.execute("DELETE FROM categorias WHERE categoria_id = %s", (categoria_id,))
+        return cursor.rowcount > 0
+
+    def reconstruir_jerarquia(self):
+        """Regenera categorias_cierre desde categoria_padre_id; devuelve las filas escritas"""
+        return self._escribir(arbol_categorias.reconstruir)
+
+    def obtener_subarbol(self, categoria_id):
+        """La categoría y todas sus subcategorías, por nivel (con su profundidad)"""
         self.db.connect()
-        query = "INSERT INTO categorias (nombre, categoria_padre_id) VALUES (%s, %s)"
-        params = (categoria.nombre, categoria.categoria_padre_id)
-        
-        result = self.db.execute_query(query, params)
-        if result:
-            categoria_id = self.db.fetch_one("SELECT LAST_INSERT_ID() as id")['id']
-            self.db.disconnect()
-            return categoria_id
+        categorias = self.db.fetch_all(arbol_categorias.SQL_SUBARBOL, (categoria_id, categoria_id))
         self.db.disconnect()
-        return None
-    
-    def actualizar(self, categoria):
-        """Actualiza una categoría existente"""
+        return categorias
+
+    def obtener_ruta(self, categoria_id):
+        """Las categorías desde la raíz hasta `categoria_id`"""
         self.db.connect()
-        query = "UPDATE categorias SET nombre = %s, categoria_padre_id = %s WHERE categoria_id = %s"
-        params = (categoria.nombre, categoria.categoria_padre_id, categoria.categoria_id)
-        
-        result = self.db.execute_query(query, params)
+        categorias = self.db.fetch_all(arbol_categorias.SQL_RUTA, (categoria_id, categoria_id))
         self.db.disconnect()
-        return result
-    
-    def eliminar(self, categoria_id):
-        """Elimina una categoría por su ID"""
+        return categorias
+
+    def obtener_libros_subarbol(self, categoria_id):
+        """Libros de la categoría o de cualquiera de sus subcategorías"""
         self.db.connect()
-        result = self.db.execute_query("DELETE FROM categorias WHERE categoria_id = %s", (categoria_id,))
+        libros = self.db.fetch_all(arbol_categorias.SQL_LIBROS_SUBARBOL, (categoria_id, categoria_id))
         self.db.disconnect()
-        return result
+        return libros
+
+    def contar_libros_subarbol(self, categoria_id):
+        """Número de libros distintos en el subárbol de la categoría"""
+        self.db.connect()
+        filas = self.db.fetch_all(arbol_categorias.SQL_CONTAR_SUBARBOL, (categoria_id, categoria_id), crudo=True)
+        self.db.disconnect()
+        return filas[0][0] if filas else 0
 
 
-class ClienteController:
+class ClienteController(ConsultaCambios):
+    TABLA = "clientes"
+    CLAVE = "cliente_id"
+    COLUMNA_CLAVE = "c.cliente_id"
+    SQL_LISTADO = """
+    SELECT c.cliente_id, c.nombre, c.apellido, c.email, c.ciudad
+    FROM clientes c
+    WHERE {condicion}
+    ORDER BY c.cliente_id
+    """
+
     def __init__(self):
         self.db = DatabaseManager()
     
-    def obtener_todos(self):
-        """Obtiene todos los clientes"""
+    def obtener_todos(self, como_modelos=False):
+        """Obtiene todos los clientes (como Cliente si como_modelos)"""
         self.db.connect()
-        clientes = self.db.fetch_all("SELECT * FROM clientes")
+        if como_modelos:
+            clientes = self.db.fetch_models("SELECT * FROM clientes", Cliente)
+        else:
+            clientes = self.db.fetch_all("SELECT * FROM clientes")
         self.db.disconnect()
         return clientes
     
@@ -277,14 +604,32 @@ class ClienteController:
         return result
 
 
-class VentaController:
+class VentaController(ConsultaCambios):
+    TABLA = "ventas"
+    CLAVE = "venta_id"
+    COLUMNA_CLAVE = "v.venta_id"
+    DEPENDENCIAS = {
+        'clientes': "SELECT venta_id FROM ventas WHERE cliente_id IN ({claves})",
+    }
+    SQL_LISTADO = """
+    SELECT v.venta_id, v.fecha_venta, CONCAT(c.nombre, ' ', c.apellido) AS cliente,
+           v.total, v.estado
+    FROM ventas v
+    LEFT JOIN clientes c ON v.cliente_id = c.cliente_id
+    WHERE {condicion}
+    ORDER BY v.venta_id
+    """
+
     def __init__(self):
         self.db = DatabaseManager()
     
-    def obtener_todas(self):
-        """Obtiene todas las ventas con sus detalles"""
+    def obtener_todas(self, como_modelos=False):
+        """Obtiene todas las ventas con sus detalles (como Venta si como_modelos)"""
         self.db.connect()
-        ventas = self.db.fetch_all("SELECT * FROM vista_ventas_detallada")
+        if como_modelos:
+            ventas = self.db.fetch_models("SELECT * FROM vista_ventas_detallada", Venta)
+        else:
+            ventas = self.db.fetch_all("SELECT * FROM vista_ventas_detallada")
         self.db.disconnect()
         return ventas
     
@@ -296,40 +641,41 @@ class VentaController:
         return venta
     
     def crear_venta(self, venta, detalles):
-        """Crea una nueva venta con sus detalles"""
-        self.db.connect()
-        
-        # Insertar la venta
-        query_venta = """
-        INSERT INTO ventas (cliente_id, total, metodo_pago, estado)
-        VALUES (%s, %s, %s, %s)
         """
-        params_venta = (venta.cliente_id, venta.total, venta.metodo_pago, venta.estado)
-        
-        result = self.db.execute_query(query_venta, params_venta)
-        if not result:
-            self.db.disconnect()
-            return None
-        
-        # Obtener el ID de la venta recién insertada
-        venta_id = self.db.fetch_one("SELECT LAST_INSERT_ID() as id")['id']
-        
-        # Insertar los detalles de la venta
-        for detalle in detalles:
-            query_detalle = """
+        Crea una nueva venta con sus detalles en una sola transacción.
+
+        Si falla cualquier inserción (p. ej. after_venta_insert sin stock
+        suficiente) se deshace todo y devuelve None: nunca queda una venta
+        con parte de sus líneas.
+        """
+        self.db.connect()
+        cursor = self.db.connection.cursor()
+        try:
+            self.db.connection.start_transaction()
+            cursor.execute("""
+            INSERT INTO ventas (cliente_id, total, metodo_pago, estado)
+            VALUES (%s, %s, %s, %s)
+            """, (venta.cliente_id, venta.total, venta.metodo_pago, venta.estado))
+            venta_id = cursor.lastrowid
+
+            # El trigger after_venta_insert descuenta el stock de cada línea
+            cursor.executemany("""
             INSERT INTO detalles_venta (venta_id, libro_id, cantidad, precio_unitario, descuento)
             VALUES (%s, %s, %s, %s, %s)
-            """
-            params_detalle = (venta_id, detalle.libro_id, detalle.cantidad, 
-                             detalle.precio_unitario, detalle.descuento)
-            
-            self.db.execute_query(query_detalle, params_detalle)
-        
-        self.db.disconnect()
+            """, [(venta_id, detalle.libro_id, detalle.cantidad, detalle.precio_unitario, detalle.descuento)
+                  for detalle in detalles])
+            self.db.connection.commit()
+        except Exception as e:
+            self.db.connection.rollback()
+            print(f"Error al crear la venta: {e}")
+            return None
+        finally:
+            cursor.close()
+            self.db.disconnect()
         return venta_id
     
-    def obtener_detalles_venta(self, venta_id):
-        """Obtiene los detalles de una venta"""
+    def obtener_detalles_venta(self, venta_id, como_modelos=False):
+        """Obtiene los detalles de una venta (como DetalleVenta si como_modelos)"""
         self.db.connect()
         query = """
         SELECT dv.*, l.titulo
@@ -337,7 +683,10 @@ class VentaController:
         JOIN libros l ON dv.libro_id = l.libro_id
         WHERE dv.venta_id = %s
         """
-        detalles = self.db.fetch_all(query, (venta_id,))
+        if como_modelos:
+            detalles = self.db.fetch_models(query, DetalleVenta, (venta_id,))
+        else:
+            detalles = self.db.fetch_all(query, (venta_id,))
         self.db.disconnect()
         return detalles
 
@@ -346,8 +695,8 @@ class ResenaController:
     def __init__(self):
         self.db = DatabaseManager()
     
-    def obtener_por_libro(self, libro_id):
-        """Obtiene todas las reseñas de un libro"""
+    def obtener_por_libro(self, libro_id, como_modelos=False):
+        """Obtiene todas las reseñas de un libro (como Resena si como_modelos)"""
         self.db.connect()
         query = """
         SELECT r.*, CONCAT(c.nombre, ' ', c.apellido) as cliente_nombre
@@ -356,7 +705,10 @@ class ResenaController:
         WHERE r.libro_id = %s
         ORDER BY r.fecha_resena DESC
         """
-        resenas = self.db.fetch_all(query, (libro_id,))
+        if como_modelos:
+            resenas = self.db.fetch_models(query, Resena, (libro_id,))
+        else:
+            resenas = self.db.fetch_all(query, (libro_id,))
         self.db.disconnect()
         return resenas
     
@@ -1,6 +1,100 @@
-import mysql.connector
-from mysql.connector import Error
+from operator import itemgetter
 from config import DB_CONFIG
+from utils.arranque import ModuloPerezoso
+
+# mysql.connector se importa en la primera conexión, no al importar este módulo
+mysql = ModuloPerezoso("mysql")
+
+
+class Columnas:
+    """Descriptor de columnas compartido por todas las filas de un resultado"""
+    __slots__ = ('nombres', 'indice')
+
+    def __init__(self, nombres):
+        self.nombres = tuple(nombres)
+        self.indice = {nombre: i for i, nombre in enumerate(self.nombres)}
+
+    def __getitem__(self, nombre):
+        """Posición de la columna `nombre`"""
+        return self.indice[nombre]
+
+    def __contains__(self, nombre):
+        return nombre in self.indice
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def getter(self, *nombres):
+        """
+        itemgetter que extrae de cada fila las columnas indicadas (en ese orden).
+
+        Un descriptor sin columnas solo acompaña al resultado vacío de una
+        consulta fallida: se devuelve un getter que nunca llega a aplicarse,
+        en lugar de un KeyError en el llamador.
+        """
+        if not self.nombres:
+            return _sin_columnas
+        return itemgetter(*(self.indice[nombre] for nombre in nombres))
+
+    def como_dict(self, fila):
+        """Convierte una fila cruda en diccionario (para los casos que lo necesiten)"""
+        return dict(zip(self.nombres, fila))
+
+
+def _sin_columnas(fila):
+    raise LookupError("El resultado no tiene descriptor de columnas")
+
+
+class FilasCrudas(list):
+    """Lista de filas como tuplas con su descriptor de columnas en `columnas`"""
+    __slots__ = ('columnas',)
+
+    def __init__(self, filas, columnas):
+        super().__init__(filas)
+        self.columnas = columnas if isinstance(columnas, Columnas) else Columnas(columnas)
+
+
+class FlujoFilas:
+    """
+    Resultado leído por páginas con paginación por clave (keyset).
+
+    `consultar(marca, lote)` devuelve FilasCrudas con las `lote` filas que
+    siguen a `marca` (None en la primera página) en el orden de la clave;
+    `clave` es la columna del resultado con la que continúa la página
+    siguiente. Como FilasCrudas, expone `columnas`, pero no retiene el
+    resultado: se recorre una sola vez y la memoria no depende del número de
+    filas. Cada página es una consulta completa que usa el índice de la
+    clave, así que la conexión queda libre entre páginas y dejar de
+    recorrerlo (`cerrar`) no obliga a leer el resto.
+    """
+
+    def __init__(self, consultar, clave, lote=1000):
+        self.consultar = consultar
+        self.lote = lote
+        # La primera página trae también el descriptor de columnas
+        self._primera = consultar(None, lote)
+        self.columnas = self._primera.columnas
+        self._clave = self.columnas[clave] if clave in self.columnas else None
+        self.cerrado = False
+
+    def __iter__(self):
+        pagina = self._primera
+        while pagina and not self.cerrado:
+            yield from pagina
+            if len(pagina) < self.lote:
+                return
+            pagina = self.consultar(pagina[-1][self._clave], self.lote)
+
+    def cerrar(self):
+        self.cerrado = True
+        self._primera = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
 
 class DatabaseManager:
     def __init__(self):
@@ -15,7 +109,7 @@ class DatabaseManager:
                 self.cursor = self.connection.cursor(dictionary=True)
                 print("Conexión establecida con la base de datos")
                 return True
-        except Error as e:
+        except mysql.connector.Error as e:
             print(f"Error al conectar a la base de datos: {e}")
             return False
     
@@ -33,25 +127,53 @@ class DatabaseManager:
             self.cursor.execute(query, params or ())
             self.connection.commit()
             return True
-        except Error as e:
+        except mysql.connector.Error as e:
             print(f"Error al ejecutar la consulta: {e}")
             return False
     
-    def fetch_all(self, query, params=None):
-        """Ejecuta una consulta y devuelve todos los resultados"""
+    def fetch_all(self, query, params=None, crudo=False):
+        """
+        Ejecuta una consulta y devuelve todos los resultados.
+
+        Con crudo=True devuelve FilasCrudas (tuplas + descriptor de columnas)
+        en lugar de un diccionario por fila.
+        """
+        if crudo:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(query, params or ())
+                return FilasCrudas(cursor.fetchall(), cursor.column_names)
+            except mysql.connector.Error as e:
+                # Sin filas; Columnas.getter sigue funcionando sobre el descriptor vacío
+                print(f"Error al obtener datos: {e}")
+                return FilasCrudas([], ())
+            finally:
+                cursor.close()
         try:
             self.cursor.execute(query, params or ())
             return self.cursor.fetchall()
-        except Error as e:
+        except mysql.connector.Error as e:
+            print(f"Error al obtener datos: {e}")
+            return []
+    
+    def fetch_models(self, query, modelo, params=None):
+        """Ejecuta una consulta y devuelve los resultados como instancias de `modelo`"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, params or ())
+            return modelo.from_rows(cursor.fetchall(), cursor.column_names)
+        except mysql.connector.Error as e:
             print(f"Error al obtener datos: {e}")
             return []
+        finally:
+            cursor.close()
     
     def fetch_one(self, query, params=None):
         """Ejecuta una consulta y devuelve un solo resultado"""
         try:
             self.cursor.execute(query, params or ())
             return self.cursor.fetchone()
-        except Error as e:
+        except mysql.connector.Error as e:
             print(f"Error al obtener datos: {e}")
             return None
     
@@ -65,6 +187,6 @@ class DatabaseManager:
                 results.extend(result.fetchall())
             self.connection.commit()
             return results
-        except Error as e:
+        except mysql.connector.Error as e:
             print(f"Error al llamar al procedimiento {procedure_name}: {e}")
             return []
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+eventos.py – Registro agrupado de eventos en log_eventos y consultas sobre él.
+
+SumideroEventos acumula en memoria los eventos de la aplicación y los
+escribe por lotes. Los que llevan clave (p. ej. tipo 'stock_bajo', clave
+'libro:12') se agrupan por ventana de `ventana` segundos: todas las
+repeticiones de la misma ventana acaban en una sola fila con su número de
+ocurrencias y el último mensaje, tanto dentro del búfer como contra lo ya
+escrito (INSERT ... ON DUPLICATE KEY UPDATE sobre el índice único
+(tipo, clave, ventana_inicio)). Los triggers de stock de libreria.sql usan la
+misma clave y la misma ventana de 5 minutos.
+
+LectorEventos consulta log_eventos por tipo, clave y rango de fechas con
+los índices (tipo, fecha_evento) y (fecha_evento), paginando por clave
+(fecha_evento, evento_id) en lugar de OFFSET.
+
+Ejemplo:
+    with SumideroEventos() as eventos:
+        eventos.registrar('stock_bajo', 'Stock bajo para libro ID: 12. Stock actual: 3', clave='libro:12')
+    ultimos = LectorEventos().buscar(tipo='stock_bajo', desde=hace_una_hora)
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from db_manager import DatabaseManager
+from models import Evento
+
+# Misma ventana que los triggers de stock bajo
+VENTANA = 300
+
+SQL_REGISTRAR = """
+INSERT INTO log_eventos (tipo, clave, mensaje, ocurrencias, ventana_inicio, fecha_evento, ultima_fecha)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE ocurrencias = ocurrencias + VALUES(ocurrencias),
+                        mensaje = VALUES(mensaje),
+                        ultima_fecha = VALUES(ultima_fecha)
+"""
+
+SQL_EVENTOS = """
+SELECT evento_id, tipo, clave, mensaje, ocurrencias, ventana_inicio, fecha_evento, ultima_fecha
+FROM log_eventos
+WHERE {condiciones}
+ORDER BY fecha_evento DESC, evento_id DESC
+LIMIT %s
+"""
+
+
+def inicio_ventana(instante: datetime, ventana: int = VENTANA) -> datetime:
+    """Comienzo de la ventana de agrupación que contiene `instante`"""
+    return datetime.fromtimestamp(int(instante.timestamp()) // ventana * ventana)
+
+
+class SumideroEventos:
+    """
+    Búfer de eventos con agrupación por (tipo, clave, ventana) y escritura por lotes.
+
+    Se vacía cada `intervalo` segundos desde un hilo propio (iniciar/detener),
+    antes si se juntan `max_pendientes` filas, o a mano con vaciar(). Si la
+    escritura falla, las filas vuelven al búfer para el siguiente intento.
+    """
+
+    def __init__(self, ventana: int = VENTANA, intervalo: float = 2.0, max_pendientes: int = 500):
+        self.db = DatabaseManager()
+        self.ventana = ventana
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        # (tipo, clave, ventana_inicio) -> [mensaje, ocurrencias, primera, ultima]
+        self._agrupados: Dict[Tuple[str, str, datetime], list] = {}
+        self._sueltos: List[tuple] = []
+        self._bloqueo = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self.registrados = 0
+        self.filas_escritas = 0
+
+    # ------------------------------------------------------------------ registro
+
+    def registrar(self, tipo: str, mensaje: str, clave: Optional[str] = None):
+        """Añade un evento al búfer; con clave se agrupa con los de su ventana"""
+        ahora = datetime.now()
+        with self._bloqueo:
+            self.registrados += 1
+            if clave is None:
+                self._sueltos.append((tipo, None, mensaje, 1, None, ahora, ahora))
+            else:
+                grupo = (tipo, str(clave), inicio_ventana(ahora, self.ventana))
+                agrupado = self._agrupados.get(grupo)
+                if agrupado is None:
+                    self._agrupados[grupo] = [mensaje, 1, ahora, ahora]
+                else:
+                    agrupado[0] = mensaje
+                    agrupado[1] += 1
+                    agrupado[3] = ahora
+            if len(self._agrupados) + len(self._sueltos) >= self.max_pendientes:
+                self._despertar.set()
+
+    @property
+    def pendientes(self) -> int:
+        with self._bloqueo:
+            return len(self._agrupados) + len(self._sueltos)
+
+    # ------------------------------------------------------------------ escritura
+
+    def vaciar(self) -> int:
+        """Escribe el búfer con una sola sentencia por lote; devuelve las filas enviadas"""
+        with self._bloqueo:
+            agrupados, self._agrupados = self._agrupados, {}
+            sueltos, self._sueltos = self._sueltos, []
+        filas = [(tipo, clave, mensaje, ocurrencias, ventana, primera, ultima)
+                 for (tipo, clave, ventana), (mensaje, ocurrencias, primera, ultima) in agrupados.items()]
+        filas.extend(sueltos)
+        if not filas:
+            return 0
+
+        try:
+            if self.db.connection is None or not self.db.connection.is_connected():
+                self.db.connect()
+            cursor = self.db.connection.cursor()
+            try:
+                cursor.executemany(SQL_REGISTRAR, filas)
+                self.db.connection.commit()
+            finally:
+                cursor.close()
+        except Exception as e:
+            logging.error(f"No se pudieron escribir {len(filas)} eventos: {e}")
+            self._reincorporar(agrupados, sueltos)
+            return 0
+        self.filas_escritas += len(filas)
+        return len(filas)
+
+    def _reincorporar(self, agrupados, sueltos):
+        """Devuelve al búfer lo que no se pudo escribir, sumándolo a lo llegado entretanto"""
+        with self._bloqueo:
+            for grupo, (mensaje, ocurrencias, primera, ultima) in agrupados.items():
+                actual = self._agrupados.get(grupo)
+                if actual is None:
+                    self._agrupados[grupo] = [mensaje, ocurrencias, primera, ultima]
+                else:
+                    actual[1] += ocurrencias
+                    actual[2] = primera
+            self._sueltos[:0] = sueltos
+
+    # ------------------------------------------------------------------ ciclo de vida
+
+    def iniciar(self) -> "SumideroEventos":
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="sumidero_eventos", daemon=True)
+            self._hilo.start()
+        return self
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self.vaciar()
+
+    def detener(self):
+        """Para el hilo y escribe lo que quede pendiente"""
+        if self._hilo is not None:
+            self._detener.set()
+            self._despertar.set()
+            self._hilo.join()
+            self._hilo = None
+        self.vaciar()
+        self.db.disconnect()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excepcion):
+        self.detener()
+
+
+class LectorEventos:
+    """Consultas sobre log_eventos por tipo, clave y fecha"""
+
+    def __init__(self):
+        self.db = DatabaseManager()
+
+    def buscar(self, tipo: Optional[str] = None, clave: Optional[str] = None,
+               desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+               limite: int = 100, despues_de: Optional[Evento] = None) -> List[Evento]:
+        """
+        Eventos más recientes primero, filtrados por tipo, clave y [desde, hasta).
+
+        Para la página siguiente se pasa el último evento recibido en `despues_de`.
+        """
+        condiciones = []
+        params: List[Any] = []
+        if tipo is not None:
+            condiciones.append("tipo = %s")
+            params.append(tipo)
+        if clave is not None:
+            condiciones.append("clave = %s")
+            params.append(clave)
+        if desde is not None:
+            condiciones.append("fecha_evento >= %s")
+            params.append(desde)
+        if hasta is not None:
+            condiciones.append("fecha_evento < %s")
+            params.append(hasta)
+        if despues_de is not None:
+            condiciones.append("(fecha_evento < %s OR (fecha_evento = %s AND evento_id < %s))")
+            params.extend((despues_de.fecha_evento, despues_de.fecha_evento, despues_de.evento_id))
+        params.append(limite)
+
+        sql = SQL_EVENTOS.format(condiciones=" AND ".join(condiciones) or "1 = 1")
+        self.db.connect()
+        eventos = self.db.fetch_models(sql, Evento, tuple(params))
+        self.db.disconnect()
+        return eventos
+
+    def contar_por_tipo(self, desde: Optional[datetime] = None,
+                        hasta: Optional[datetime] = None) -> Dict[str, int]:
+        """Ocurrencias por tipo en [desde, hasta), contando las repeticiones agrupadas"""
+        condiciones = []
+        params: List[Any] = []
+        if desde is not None:
+            condiciones.append("fecha_evento >= %s")
+            params.append(desde)
+        if hasta is not None:
+            condiciones.append("fecha_evento < %s")
+            params.append(hasta)
+        self.db.connect()
+        filas = self.db.fetch_all(
+            f"SELECT tipo, SUM(ocurrencias) FROM log_eventos WHERE {' AND '.join(condiciones) or '1 = 1'} "
+            f"GROUP BY tipo", tuple(params), crudo=True
+        )
+        self.db.disconnect()
+        return {tipo: int(total) for tipo, total in filas}
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+exportar_datos.py – Exporta libros, clientes, ventas y detalles de venta a CSV, JSONL o Parquet.
+
+Las filas se leen con un cursor sin buffer (el servidor las envía a medida
+que se consumen) en lotes de `--lote` filas y cada lote se codifica y se
+escribe antes de pedir el siguiente, así que la memoria no depende del
+tamaño de la tabla. Con --fragmentos o --por-fecha la exportación se divide
+en rangos de ID o de fechas que se escriben en paralelo, cada uno en su
+fichero y con su propia conexión, y se genera un manifest.json con las
+filas y bytes de cada fichero.
+
+Parquet (columnar, comprimido con zstd) requiere pyarrow; CSV y JSONL pueden
+comprimirse con --gzip.
+
+Uso:
+  python exportar_datos.py ventas --formato parquet --fragmentos 8 --procesos 4
+  python exportar_datos.py clientes libros --formato csv --gzip --salida export/
+  python exportar_datos.py ventas --por-fecha mes --desde 2024-01-01 --hasta 2025-01-01
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import mysql.connector
+
+from config import DB_CONFIG
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+# Cada exportación: consulta con un marcador {condicion}, columna de ID y columna de fecha.
+# libros repite la consulta de vista_libros_detallada: la vista usa GROUP BY (algoritmo
+# TEMPTABLE) y un WHERE sobre ella no se aplicaría antes de agrupar todo el catálogo.
+EXPORTACIONES: Dict[str, Dict[str, str]] = {
+    'libros': {
+        'sql': """
+            SELECT l.libro_id, l.titulo, l.subtitulo, l.isbn, l.fecha_publicacion, l.edicion,
+                   l.editorial, l.precio, l.stock, l.descripcion, l.num_paginas, l.idioma,
+                   l.calificacion, l.imagen_portada, l.formato,
+                   GROUP_CONCAT(DISTINCT CONCAT(a.nombre, ' ', a.apellido) SEPARATOR ', ') AS autores,
+                   GROUP_CONCAT(DISTINCT c.nombre SEPARATOR ', ') AS categorias
+            FROM libros l
+            LEFT JOIN libro_autor la ON l.libro_id = la.libro_id
+            LEFT JOIN autores a ON la.autor_id = a.autor_id
+            LEFT JOIN libro_categoria lc ON l.libro_id = lc.libro_id
+            LEFT JOIN categorias c ON lc.categoria_id = c.categoria_id
+            WHERE {condicion}
+            GROUP BY l.libro_id
+            ORDER BY l.libro_id""",
+        'tabla': 'libros', 'id': 'libro_id', 'fecha': 'fecha_publicacion', 'alias': 'l.',
+    },
+    'clientes': {
+        # Sin la columna password
+        'sql': """
+            SELECT cliente_id, nombre, apellido, email, telefono, direccion, ciudad,
+                   codigo_postal, pais, fecha_registro, created_at, updated_at
+            FROM clientes
+            WHERE {condicion}
+            ORDER BY cliente_id""",
+        'tabla': 'clientes', 'id': 'cliente_id', 'fecha': 'fecha_registro', 'alias': '',
+    },
+    'ventas': {
+        'sql': """
+            SELECT venta_id, cliente_id, fecha_venta, total, metodo_pago, estado,
+                   created_at, updated_at
+            FROM ventas
+            WHERE {condicion}
+            ORDER BY venta_id""",
+        'tabla': 'ventas', 'id': 'venta_id', 'fecha': 'fecha_venta', 'alias': '',
+    },
+    'detalles_venta': {
+        'sql': """
+            SELECT detalle_id, venta_id, libro_id, cantidad, precio_unitario, descuento,
+                   created_at, updated_at
+            FROM detalles_venta
+            WHERE {condicion}
+            ORDER BY detalle_id""",
+        'tabla': 'detalles_venta', 'id': 'detalle_id', 'fecha': 'created_at', 'alias': '',
+    },
+}
+
+EXTENSIONES = {'csv': 'csv', 'jsonl': 'jsonl', 'parquet': 'parquet'}
+PERIODOS = {'dia': '%Y-%m-%d', 'mes': '%Y-%m', 'anio': '%Y'}
+
+
+# ---------------------------------------------------------------------------- escritores
+
+class EscritorCSV:
+    def __init__(self, ruta: str, columnas: List[str], comprimir: bool):
+        self.archivo = (gzip.open(ruta, 'wt', encoding='utf-8', newline='', compresslevel=1)
+                        if comprimir else open(ruta, 'w', encoding='utf-8', newline='', buffering=1 << 20))
+        self.escritor = csv.writer(self.archivo)
+        self.escritor.writerow(columnas)
+
+    def escribir(self, filas: List[tuple]):
+        self.escritor.writerows(filas)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+def _json_por_defecto(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        # Texto exacto: los importes no pasan por float
+        return str(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return valor.decode('utf-8', errors='replace')
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+class EscritorJSONL:
+    def __init__(self, ruta: str, columnas: List[str], comprimir: bool):
+        self.archivo = (gzip.open(ruta, 'wt', encoding='utf-8', compresslevel=1)
+                        if comprimir else open(ruta, 'w', encoding='utf-8', buffering=1 << 20))
+        self.columnas = columnas
+        self.codificar = json.JSONEncoder(ensure_ascii=False, default=_json_por_defecto).encode
+
+    def escribir(self, filas: List[tuple]):
+        columnas, codificar = self.columnas, self.codificar
+        self.archivo.write(''.join([codificar(dict(zip(columnas, fila))) + '\n' for fila in filas]))
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+class EscritorParquet:
+    """Parquet con un row group por cada `filas_por_grupo` filas; el esquema sale de los tipos MySQL"""
+
+    def __init__(self, ruta: str, columnas: List[str], tipos: List[int], filas_por_grupo: int = 100_000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("El formato parquet requiere pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.schema = pa.schema([(nombre, _tipo_arrow(pa, tipo)) for nombre, tipo in zip(columnas, tipos)])
+        self.escritor = pq.ParquetWriter(ruta, self.schema, compression='zstd')
+        self.filas_por_grupo = filas_por_grupo
+        self.pendientes: List[tuple] = []
+
+    def escribir(self, filas: List[tuple]):
+        self.pendientes.extend(filas)
+        if len(self.pendientes) >= self.filas_por_grupo:
+            self._volcar()
+
+    def _volcar(self):
+        if not self.pendientes:
+            return
+        columnas = list(zip(*self.pendientes))
+        arrays = [self.pa.array(valores, type=campo.type) for valores, campo in zip(columnas, self.schema)]
+        self.escritor.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.pendientes = []
+
+    def cerrar(self):
+        self._volcar()
+        self.escritor.close()
+
+
+def _tipo_arrow(pa, tipo_mysql: int):
+    from mysql.connector import FieldType
+
+    if tipo_mysql in (FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24):
+        return pa.int64()
+    if tipo_mysql in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        # Las columnas DECIMAL del esquema tienen como mucho 2 decimales
+        return pa.decimal128(20, 4)
+    if tipo_mysql in (FieldType.FLOAT, FieldType.DOUBLE):
+        return pa.float64()
+    if tipo_mysql in (FieldType.DATE, FieldType.NEWDATE):
+        return pa.date32()
+    if tipo_mysql in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp('s')
+    return pa.string()
+
+
+# ---------------------------------------------------------------------------- fragmentos
+
+def _conectar(conexion: Dict[str, Any]):
+    return mysql.connector.connect(**conexion)
+
+
+def planificar(conexion: Dict[str, Any], nombre: str, fragmentos: int = 1, por_fecha: Optional[str] = None,
+               desde: Optional[str] = None, hasta: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Divide una exportación en tareas por rango de ID o por periodo de fecha"""
+    exportacion = EXPORTACIONES[nombre]
+    alias, columna_id, columna_fecha = exportacion['alias'], exportacion['id'], exportacion['fecha']
+
+    filtros, params = [], []
+    if desde:
+        filtros.append(f"{alias}{columna_fecha} >= %s")
+        params.append(desde)
+    if hasta:
+        filtros.append(f"{alias}{columna_fecha} < %s")
+        params.append(hasta)
+
+    conn = _conectar(conexion)
+    cursor = conn.cursor()
+    try:
+        base = " AND ".join(filtros) or "1 = 1"
+        if por_fecha:
+            formato = PERIODOS[por_fecha]
+            cursor.execute(
+                f"SELECT DISTINCT DATE_FORMAT({columna_fecha}, %s) FROM {exportacion['tabla']} {alias.rstrip('.')} "
+                f"WHERE {base} AND {alias}{columna_fecha} IS NOT NULL ORDER BY 1",
+                [formato] + params
+            )
+            periodos = [fila[0] for fila in cursor.fetchall()]
+            # Rango semiabierto por periodo para que cada fragmento use el índice de la fecha
+            return [{
+                'nombre': nombre, 'sufijo': periodo,
+                'condicion': f"{base} AND {alias}{columna_fecha} >= %s AND {alias}{columna_fecha} < %s",
+                'params': params + list(_rango_periodo(periodo, por_fecha)),
+            } for periodo in periodos]
+
+        cursor.execute(f"SELECT MIN({columna_id}), MAX({columna_id}) FROM {exportacion['tabla']}")
+        minimo, maximo = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if minimo is None:
+        return [{'nombre': nombre, 'sufijo': None, 'condicion': base, 'params': params}]
+    fragmentos = max(1, min(fragmentos, maximo - minimo + 1))
+    paso = (maximo - minimo + fragmentos) // fragmentos
+    tareas = []
+    for i in range(fragmentos):
+        inicio = minimo + i * paso
+        fin = min(maximo, inicio + paso - 1)
+        if inicio > maximo:
+            break
+        tareas.append({
+            'nombre': nombre,
+            'sufijo': f"{inicio}-{fin}" if fragmentos > 1 else None,
+            'condicion': f"{base} AND {alias}{columna_id} BETWEEN %s AND %s",
+            'params': params + [inicio, fin],
+        })
+    return tareas
+
+
+def _rango_periodo(periodo: str, por_fecha: str) -> Tuple[date, date]:
+    """Primer día del periodo y primer día del siguiente"""
+    inicio = datetime.strptime(periodo, PERIODOS[por_fecha]).date()
+    if por_fecha == 'dia':
+        return inicio, date.fromordinal(inicio.toordinal() + 1)
+    if por_fecha == 'mes':
+        return inicio, date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    return inicio, date(inicio.year + 1, 1, 1)
+
+
+def exportar_fragmento(conexion: Dict[str, Any], tarea: Dict[str, Any], formato: str, directorio: str,
+                       comprimir: bool = False, lote: int = 10_000) -> Dict[str, Any]:
+    """Exporta una tarea de `planificar` a su fichero (se ejecuta en un proceso del pool)"""
+    inicio = time.perf_counter()
+    exportacion = EXPORTACIONES[tarea['nombre']]
+    base = tarea['nombre'] + (f"_{tarea['sufijo']}" if tarea['sufijo'] else "")
+    ruta = os.path.join(directorio, f"{base}.{EXTENSIONES[formato]}")
+    if comprimir and formato != 'parquet':
+        ruta += '.gz'
+    temporal = ruta + '.parcial'
+
+    conn = _conectar(conexion)
+    # Cursor sin buffer: el resultado llega del servidor a medida que se consume
+    cursor = conn.cursor(buffered=False, raw=False)
+    filas_totales = 0
+    try:
+        cursor.execute(exportacion['sql'].format(condicion=tarea['condicion']), tarea['params'])
+        columnas = list(cursor.column_names)
+        if formato == 'parquet':
+            escritor = EscritorParquet(temporal, columnas, [d[1] for d in cursor.description])
+        elif formato == 'jsonl':
+            escritor = EscritorJSONL(temporal, columnas, comprimir)
+        else:
+            escritor = EscritorCSV(temporal, columnas, comprimir)
+        try:
+            while True:
+                filas = cursor.fetchmany(lote)
+                if not filas:
+                    break
+                escritor.escribir(filas)
+                filas_totales += len(filas)
+        finally:
+            escritor.cerrar()
+    finally:
+        cursor.close()
+        conn.close()
+
+    os.replace(temporal, ruta)
+    segundos = time.perf_counter() - inicio
+    return {'fichero': os.path.basename(ruta), 'exportacion': tarea['nombre'], 'fragmento': tarea['sufijo'],
+            'filas': filas_totales, 'bytes': os.path.getsize(ruta), 'segundos': round(segundos, 3)}
+
+
+def exportar(conexion: Dict[str, Any], nombres: List[str], formato: str = 'csv', directorio: str = 'export',
+             fragmentos: int = 1, por_fecha: Optional[str] = None, desde: Optional[str] = None,
+             hasta: Optional[str] = None, procesos: int = 1, comprimir: bool = False,
+             lote: int = 10_000) -> Dict[str, Any]:
+    """Planifica y ejecuta las exportaciones; devuelve el manifiesto (también en manifest.json)"""
+    os.makedirs(directorio, exist_ok=True)
+    inicio = time.perf_counter()
+    tareas = [tarea for nombre in nombres
+              for tarea in planificar(conexion, nombre, fragmentos, por_fecha, desde, hasta)]
+    logging.info(f"{len(tareas)} ficheros a exportar con {procesos} procesos")
+
+    ficheros = []
+    if procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(exportar_fragmento, conexion, tarea, formato, directorio, comprimir, lote)
+                       for tarea in tareas]
+            for futuro in futuros:
+                ficheros.append(futuro.result())
+                logging.info(_resumen_fichero(ficheros[-1]))
+    else:
+        for tarea in tareas:
+            ficheros.append(exportar_fragmento(conexion, tarea, formato, directorio, comprimir, lote))
+            logging.info(_resumen_fichero(ficheros[-1]))
+
+    segundos = time.perf_counter() - inicio
+    filas = sum(f['filas'] for f in ficheros)
+    total_bytes = sum(f['bytes'] for f in ficheros)
+    manifiesto = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'formato': formato + ('+gzip' if comprimir and formato != 'parquet' else ''),
+        'desde': desde, 'hasta': hasta,
+        'filas': filas, 'bytes': total_bytes, 'segundos': round(segundos, 3),
+        'filas_por_segundo': round(filas / segundos, 1) if segundos > 0 else None,
+        'ficheros': ficheros,
+    }
+    with open(os.path.join(directorio, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    logging.info(f"Exportadas {filas} filas ({total_bytes / 1e6:.1f} MB) en {segundos:.1f} s "
+                 f"({manifiesto['filas_por_segundo']} filas/s)")
+    return manifiesto
+
+
+def _resumen_fichero(fichero: Dict[str, Any]) -> str:
+    velocidad = fichero['filas'] / fichero['segundos'] if fichero['segundos'] else 0
+    return (f"{fichero['fichero']}: {fichero['filas']} filas, {fichero['bytes'] / 1e6:.1f} MB "
+            f"en {fichero['segundos']} s ({velocidad:,.0f} filas/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar datos de la librería')
+    parser.add_argument("exportaciones", nargs='+', choices=sorted(EXPORTACIONES),
+                        help="Qué exportar")
+    parser.add_argument("--formato", choices=sorted(EXTENSIONES), default='csv', help="Formato de salida")
+    parser.add_argument("--salida", default='export', help="Directorio de salida")
+    parser.add_argument("--gzip", action='store_true', help="Comprime CSV/JSONL con gzip")
+    parser.add_argument("--fragmentos", type=int, default=1, help="Divide cada exportación en N rangos de ID")
+    parser.add_argument("--por-fecha", choices=sorted(PERIODOS), help="Un fichero por día, mes o año")
+    parser.add_argument("--desde", help="Fecha inicial (incluida), p. ej. 2024-01-01")
+    parser.add_argument("--hasta", help="Fecha final (excluida)")
+    parser.add_argument("--procesos", type=int, default=1, help="Ficheros escritos en paralelo")
+    parser.add_argument("--lote", type=int, default=10_000, help="Filas por fetchmany")
+    parser.add_argument("--host", default=DB_CONFIG.get('host', 'localhost'), help="Host de la base de datos")
+    parser.add_argument("--port", type=int, default=DB_CONFIG.get('port', 3306), help="Puerto de MySQL")
+    parser.add_argument("--user", default=DB_CONFIG.get('user'), help="Usuario de la base de datos")
+    parser.add_argument("--password", default=DB_CONFIG.get('password'), help="Contraseña de la base de datos")
+    parser.add_argument("--database", default=DB_CONFIG.get('database', 'libreria'), help="Nombre de la base de datos")
+    args = parser.parse_args()
+
+    conexion = {'host': args.host, 'port': args.port, 'user': args.user,
+                'password': args.password, 'database': args.database}
+    try:
+        exportar(conexion, args.exportaciones, args.formato, args.salida, args.fragmentos, args.por_fecha,
+                 args.desde, args.hasta, args.procesos, args.gzip, args.lote)
+    except mysql.connector.Error as err:
+        logging.error(f"Error de MySQL durante la exportación: {err}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+feed_cambios.py – Consumidor del change-data feed de log_cambios.
+
+Los triggers cambios_<tabla>_<operacion> de libreria.sql registran cada
+INSERT/UPDATE/DELETE de libros, autores, categorias, clientes, ventas y
+resenas, y de las relaciones libro_autor y libro_categoria (con el
+libro_id como clave). ConsumidorCambios lee esas filas por lotes en orden de cambio_id
+a partir de una marca de agua y las entrega como objetos Cambio a los
+suscriptores, de modo que cachés y vistas se mantienen al día sin volver a
+leer tablas completas.
+
+Ejemplo:
+    feed = ConsumidorCambios(ruta_marca="feed_cambios.marca")
+    feed.suscribir(lambda cambios: catalogo.recargar_ids({c.clave for c in cambios}),
+                   tabla="libros", en_lote=True)
+    feed.seguir(intervalo=1.0)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from db_manager import DatabaseManager
+from models import Cambio
+
+INSERT = 'INSERT'
+UPDATE = 'UPDATE'
+DELETE = 'DELETE'
+
+TABLAS = ('libros', 'autores', 'categorias', 'clientes', 'ventas', 'resenas', 'libro_autor', 'libro_categoria')
+
+SQL_CAMBIOS = """
+SELECT cambio_id, tabla, operacion, clave, fecha_cambio
+FROM log_cambios
+WHERE cambio_id > %s
+ORDER BY cambio_id
+LIMIT %s
+"""
+
+
+class Suscripcion:
+    """Suscriptor con su filtro por tabla y operación"""
+    __slots__ = ('callback', 'tablas', 'operaciones', 'en_lote')
+
+    def __init__(self, callback, tablas, operaciones, en_lote):
+        self.callback = callback
+        self.tablas = tablas
+        self.operaciones = operaciones
+        self.en_lote = en_lote
+
+    def acepta(self, cambio: Cambio) -> bool:
+        return ((self.tablas is None or cambio.tabla in self.tablas) and
+                (self.operaciones is None or cambio.operacion in self.operaciones))
+
+
+class ConsumidorCambios:
+    """
+    Lee log_cambios por marca de agua (cambio_id) y reparte los cambios.
+
+    Los suscriptores reciben cada Cambio por separado o, con en_lote=True,
+    la lista de cambios de cada lote que cumple su filtro. La marca avanza
+    tras repartir el lote (entrega al menos una vez) y, si se indica
+    `ruta_marca`, se guarda en disco para continuar tras un reinicio.
+
+    Un cambio_id con un hueco delante puede pertenecer a una transacción que
+    aún no ha hecho commit: el lote se corta en el hueco y solo se salta
+    cuando lleva más de `espera_huecos` segundos sin rellenarse (ids
+    perdidos por rollback).
+    """
+
+    def __init__(self, lote: int = 500, marca: Optional[int] = None,
+                 ruta_marca: Optional[str] = None, espera_huecos: float = 2.0):
+        self.db = DatabaseManager()
+        self.lote = lote
+        self.ruta_marca = ruta_marca
+        self.espera_huecos = espera_huecos
+        self.marca = marca if marca is not None else self._leer_marca()
+        self.suscripciones: List[Suscripcion] = []
+        self._huecos: Dict[int, float] = {}
+
+    # ------------------------------------------------------------------ suscriptores
+
+    def suscribir(self, callback: Callable, tabla=None, operacion=None, en_lote: bool = False) -> Callable:
+        """
+        Registra `callback` para los cambios de `tabla` y `operacion`
+        (un nombre, una colección de nombres o None para todos).
+        """
+        def como_conjunto(valor, validos):
+            if valor is None:
+                return None
+            valores = frozenset((valor,) if isinstance(valor, str) else valor)
+            if not valores <= set(validos):
+                raise ValueError(f"Valores no válidos: {sorted(valores - set(validos))}")
+            return valores
+
+        self.suscripciones.append(Suscripcion(callback, como_conjunto(tabla, TABLAS),
+                                              como_conjunto(operacion, (INSERT, UPDATE, DELETE)),
+                                              en_lote))
+        return callback
+
+    def cancelar(self, callback: Callable):
+        """Elimina todas las suscripciones de `callback`"""
+        self.suscripciones = [s for s in self.suscripciones if s.callback is not callback]
+
+    # ------------------------------------------------------------------ lectura
+
+    def conectar(self) -> bool:
+        if self.db.connection is not None and self.db.connection.is_connected():
+            return True
+        return bool(self.db.connect())
+
+    def cerrar(self):
+        self.db.disconnect()
+
+    def leer(self) -> List[Cambio]:
+        """
+        Lee el siguiente lote de cambios sin avanzar la marca.
+
+        Quien lo procesa por su cuenta llama a confirmar() cuando termina;
+        si no, la siguiente lectura devuelve el mismo lote.
+        """
+        if not self.conectar():
+            return []
+        cambios = self.db.fetch_models(SQL_CAMBIOS, Cambio, (self.marca, self.lote))
+        # Cierra la transacción de lectura para que el siguiente SELECT vea commits nuevos
+        self.db.connection.commit()
+        return self._hasta_hueco(cambios)
+
+    def confirmar(self, cambios: List[Cambio]):
+        """Avanza la marca hasta el último cambio de un lote ya procesado"""
+        self.marca = cambios[-1].cambio_id
+        self._guardar_marca()
+
+    def sondear(self) -> int:
+        """Lee y reparte un lote de cambios; devuelve cuántos se procesaron"""
+        cambios = self.leer()
+        if not cambios:
+            return 0
+
+        self.repartir(cambios)
+        self.confirmar(cambios)
+        return len(cambios)
+
+    def ponerse_al_dia(self) -> int:
+        """Procesa lotes hasta agotar los cambios pendientes"""
+        total = 0
+        while True:
+            procesados = self.sondear()
+            total += procesados
+            if procesados < self.lote:
+                return total
+
+    def seguir(self, intervalo: float = 1.0, detener: Optional[threading.Event] = None):
+        """Sigue log_cambios hasta que se active `detener` (o Ctrl+C)"""
+        detener = detener or threading.Event()
+        try:
+            while not detener.is_set():
+                if self.ponerse_al_dia() == 0:
+                    detener.wait(intervalo)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.cerrar()
+
+    def _hasta_hueco(self, cambios: List[Cambio]) -> List[Cambio]:
+        """Corta el lote en el primer hueco de ids que todavía puede rellenarse"""
+        esperado = self.marca + 1
+        ahora = time.monotonic()
+        for i, cambio in enumerate(cambios):
+            # En la primera lectura sin marca no hay hueco que esperar
+            if cambio.cambio_id != esperado and not (self.marca == 0 and i == 0):
+                if ahora - self._huecos.setdefault(esperado, ahora) < self.espera_huecos:
+                    return cambios[:i]
+                else:
+                    logging.warning(f"log_cambios: se saltan los ids {esperado}..{cambio.cambio_id - 1}")
+                    self._huecos.pop(esperado, None)
+            esperado = cambio.cambio_id + 1
+        return cambios
+
+    # ------------------------------------------------------------------ reparto
+
+    def repartir(self, cambios: Iterable[Cambio]):
+        """Entrega los cambios a cada suscriptor que los acepte"""
+        cambios = list(cambios)
+        for suscripcion in self.suscripciones:
+            try:
+                if suscripcion.en_lote:
+                    aceptados = [c for c in cambios if suscripcion.acepta(c)]
+                    if aceptados:
+                        suscripcion.callback(aceptados)
+                else:
+                    for cambio in cambios:
+                        if suscripcion.acepta(cambio):
+                            suscripcion.callback(cambio)
+            except Exception:
+                # Un suscriptor con errores no detiene el feed para los demás
+                logging.exception(f"Error en el suscriptor {suscripcion.callback!r} de log_cambios")
+
+    # ------------------------------------------------------------------ marca de agua
+
+    def _leer_marca(self) -> int:
+        if self.ruta_marca and os.path.exists(self.ruta_marca):
+            with open(self.ruta_marca, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        return 0
+
+    def _guardar_marca(self):
+        if not self.ruta_marca:
+            return
+        temporal = f"{self.ruta_marca}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(str(self.marca))
+        os.replace(temporal, self.ruta_marca)
+
+    def purgar(self, hasta: Optional[int] = None) -> bool:
+        """Borra de log_cambios los cambios ya consumidos (hasta la marca por defecto)"""
+        if not self.conectar():
+            return False
+        return self.db.execute_query("DELETE FROM log_cambios WHERE cambio_id <= %s",
+                                     (self.marca if hasta is None else hasta,))
@@ -7,12 +7,16 @@ Uso:
         --password admin --database libreria
 """
 
-import json, argparse, mysql.connector, sys, requests, time, random
+import json, argparse, mysql.connector, sys, requests, time, random, os
+import hashlib
+import multiprocessing
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional
 import logging
 from urllib.parse import quote
 from config import DB_CONFIG
+from utils.filtro_isbn import FiltroISBN
+from utils.metricas import MetricasImportacion
 
 # Configuración de logging
 logging.basicConfig(
@@ -24,14 +28,191 @@ logging.basicConfig(
     ]
 )
 
+# Tablas temporales de staging para el modo bulk (mismas columnas que los TSV)
+SQL_STAGING = [
+    """CREATE TEMPORARY TABLE stg_libros (
+        titulo VARCHAR(255), subtitulo VARCHAR(255), isbn VARCHAR(20),
+        fecha_publicacion DATE, edicion VARCHAR(50), editorial VARCHAR(100),
+        precio DECIMAL(10, 2), stock INT, descripcion TEXT, num_paginas INT,
+        idioma VARCHAR(20), calificacion DECIMAL(3, 2), imagen_portada VARCHAR(255),
+        formato VARCHAR(50)
+    )""",
+    "CREATE TEMPORARY TABLE stg_autores (nombre VARCHAR(100), apellido VARCHAR(100))",
+    "CREATE TEMPORARY TABLE stg_categorias (nombre VARCHAR(100))",
+    """CREATE TEMPORARY TABLE stg_libro_autor (
+        isbn VARCHAR(20), nombre VARCHAR(100), apellido VARCHAR(100),
+        INDEX (isbn)
+    )""",
+    """CREATE TEMPORARY TABLE stg_libro_categoria (
+        isbn VARCHAR(20), nombre VARCHAR(100),
+        INDEX (isbn)
+    )""",
+]
+
+# Fusión set-based de staging con las tablas reales
+SQL_FUSION = [
+    ("libros", """
+        INSERT IGNORE INTO libros
+            (titulo, subtitulo, isbn, fecha_publicacion, edicion, editorial,
+             precio, stock, descripcion, num_paginas, idioma,
+             calificacion, imagen_portada, formato)
+        SELECT titulo, subtitulo, isbn, fecha_publicacion, edicion, editorial,
+               precio, stock, descripcion, num_paginas, idioma,
+               calificacion, imagen_portada, formato
+        FROM stg_libros
+    """),
+    ("autores", """
+        INSERT INTO autores (nombre, apellido)
+        SELECT s.nombre, s.apellido
+        FROM stg_autores s
+        LEFT JOIN autores a ON a.nombre = s.nombre AND a.apellido = s.apellido
+        WHERE a.autor_id IS NULL
+    """),
+    ("categorias", """
+        INSERT INTO categorias (nombre)
+        SELECT s.nombre
+        FROM stg_categorias s
+        LEFT JOIN categorias c ON c.nombre = s.nombre
+        WHERE c.categoria_id IS NULL
+    """),
+    ("libro_autor", """
+        INSERT IGNORE INTO libro_autor (libro_id, autor_id)
+        SELECT l.libro_id, MIN(a.autor_id)
+        FROM stg_libro_autor s
+        JOIN libros l ON l.isbn = s.isbn
+        JOIN autores a ON a.nombre = s.nombre AND a.apellido = s.apellido
+        GROUP BY l.libro_id, s.nombre, s.apellido
+    """),
+    ("libro_categoria", """
+        INSERT IGNORE INTO libro_categoria (libro_id, categoria_id)
+        SELECT l.libro_id, MIN(c.categoria_id)
+        FROM stg_libro_categoria s
+        JOIN libros l ON l.isbn = s.isbn
+        JOIN categorias c ON c.nombre = s.nombre
+        GROUP BY l.libro_id, s.nombre
+    """),
+]
+
+SQL_LIMPIEZA_STAGING = [
+    "DROP TEMPORARY TABLE IF EXISTS stg_libros, stg_autores, stg_categorias, "
+    "stg_libro_autor, stg_libro_categoria"
+]
+
+
+def _campo_tsv(valor) -> str:
+    """Serializa un valor para LOAD DATA (\\N para NULL, escapes de tab y saltos de línea)"""
+    if valor is None:
+        return '\\N'
+    return (str(valor)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+# Orden de los campos en las tuplas compactas que devuelve la normalización
+CAMPOS_NORMALIZADOS = (
+    'titulo', 'subtitulo', 'isbn', 'fecha_publicacion', 'edicion', 'editorial',
+    'precio', 'stock', 'descripcion', 'num_paginas', 'idioma', 'calificacion',
+    'imagen_portada', 'formato', 'autores', 'categorias', 'isbn_generado', 'sinteticos'
+)
+
+# Columnas de libros que forman el hash de contenido. stock y calificacion
+# quedan fuera: los mantienen las ventas y las reseñas, no el catálogo. Las
+# que _procesar_libro se inventa (libro['sinteticos']) cuentan como NULL: no
+# vienen de la fuente y cambiarían en cada importación.
+CAMPOS_HASH = (
+    'titulo', 'subtitulo', 'isbn', 'fecha_publicacion', 'edicion', 'editorial',
+    'precio', 'descripcion', 'num_paginas', 'idioma', 'imagen_portada', 'formato'
+)
+
+# Tamaño de los lotes de ISBN consultados con IN (...) en la sincronización
+LOTE_SINCRONIZACION = 1000
+
+
+def hash_contenido(libro: Dict[str, Any]) -> str:
+    """Hash SHA-1 de las columnas de catálogo de un libro normalizado que vienen de la fuente"""
+    sinteticos = libro.get('sinteticos', ())
+    valores = [None if campo in sinteticos else libro.get(campo) for campo in CAMPOS_HASH]
+    return hashlib.sha1(json.dumps(valores, default=str, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def hash_enlaces(libro: Dict[str, Any]) -> str:
+    """Hash SHA-1 del conjunto de autores y categorías de un libro (independiente del orden)"""
+    autores = sorted({(a.get('nombre', ""), a.get('apellido', "")) for a in libro.get('autores', [])})
+    categorias = sorted(set(libro.get('categorias', [])))
+    return hashlib.sha1(json.dumps([autores, categorias], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def autores_fuente(autores) -> List[Tuple[str, str]]:
+    """Pares (nombre, apellido) de los autores de un libro, ordenados y sin repetir"""
+    return sorted({(a.get('nombre', ""), a.get('apellido', "") or "") for a in autores})
+
+
+def identidad_fuente(libro: Dict[str, Any]) -> str:
+    """
+    Identidad en la fuente de un libro sin ISBN: hash de título y autores.
+
+    De ella se derivan sus ISBN ficticios, así que el mismo registro recibe
+    el mismo ISBN en cada importación.
+    """
+    valores = [libro.get('titulo'), autores_fuente(libro.get('autores', []))]
+    return hashlib.sha1(json.dumps(valores, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+# Estado por proceso del pool de normalización
+_worker = {}
+
+
+def _inicializar_worker(semilla: Optional[int], importador: "ImportadorLibros" = None):
+    """Prepara el proceso para normalizar items (se ejecuta una vez por worker)"""
+    _worker['semilla'] = semilla
+    _worker['importador'] = importador or ImportadorLibros(None, None, None, None, semilla=semilla)
+
+
+def _normalizar_item(tarea: Tuple[int, Dict[str, Any]]) -> Optional[Tuple]:
+    """Normaliza un item crudo y lo devuelve como tupla compacta (o None si falla)"""
+    indice, item = tarea
+    semilla = _worker['semilla']
+    # Generador propio por registro: el resultado no depende del reparto entre procesos
+    rng = random.Random(f"{semilla}:{indice}") if semilla is not None else random.Random()
+
+    libro = _worker['importador']._procesar_libro(item, rng)
+    if libro is None:
+        return None
+    libro['autores'] = tuple((a['nombre'], a['apellido'], a['nombre_completo']) for a in libro['autores'])
+    libro['categorias'] = tuple(libro['categorias'])
+    libro['sinteticos'] = tuple(libro['sinteticos'])
+    return tuple(libro[campo] for campo in CAMPOS_NORMALIZADOS)
+
+
+def _libro_desde_tupla(tupla: Tuple) -> Dict[str, Any]:
+    """Convierte una tupla compacta normalizada en el diccionario que usan los insert"""
+    libro = dict(zip(CAMPOS_NORMALIZADOS, tupla))
+    libro['autores'] = [
+        {'nombre': nombre, 'apellido': apellido, 'nombre_completo': completo}
+        for nombre, apellido, completo in libro['autores']
+    ]
+    libro['categorias'] = list(libro['categorias'])
+    libro['sinteticos'] = set(libro['sinteticos'])
+    return libro
+
+
 class ImportadorLibros:
-    def __init__(self, host: str, user: str, password: str, database: str, port: int = 3306):
+    def __init__(self, host: str, user: str, password: str, database: str, port: int = 3306,
+                 semilla: Optional[int] = None, procesos: int = 1, tamano_chunk: int = 500):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
         self.port = port
         self.conn = None
+        # Normalización: semilla para datos sintéticos reproducibles y tamaño del pool
+        self.semilla = semilla
+        self.procesos = procesos
+        self.tamano_chunk = tamano_chunk
+        self.metricas = MetricasImportacion()
+        self.filtro_isbn: Optional[FiltroISBN] = None
 
     def obtener_libros(self) -> List[Dict[str, Any]]:
         try:
@@ -54,50 +235,41 @@ class ImportadorLibros:
                 "subject:self-help"
             ]
             
-            todos_libros = []
+            items_crudos = []
             max_resultados = 40
             
-            for categoria in categorias:
+            for num, categoria in enumerate(categorias):
+                self.metricas.progreso("http", num, len(categorias), forzar=True)
                 try:
                     # Buscar en Google Books
                     categoria_codificada = quote(categoria)
                     gb_url = f"https://www.googleapis.com/books/v1/volumes?q={categoria_codificada}&maxResults={max_resultados}&langRestrict=es"
                     
                     logging.info(f"Buscando libros de categoría: {categoria.split(':')[1]}")
-                    respuesta = requests.get(gb_url, timeout=20)
+                    with self.metricas.medir("http"):
+                        respuesta = requests.get(gb_url, timeout=20)
+                    self.metricas.sumar("peticiones")
+                    self.metricas.sumar("bytes", len(respuesta.content))
                     respuesta.raise_for_status()
                     
-                    gb_data = respuesta.json()
+                    with self.metricas.medir("json"):
+                        gb_data = respuesta.json()
                     
-                    for item in gb_data.get('items', []):
-                        # Obtener ISBN si está disponible
-                        isbn = None
-                        industry_ids = item.get('volumeInfo', {}).get('industryIdentifiers', [])
-                        for id_type in industry_ids:
-                            if id_type.get('type') == 'ISBN_13':
-                                isbn = id_type.get('identifier')
-                                break
-                            elif id_type.get('type') == 'ISBN_10' and not isbn:
-                                isbn = id_type.get('identifier')
-                        
-                        if not isbn:
-                            # Generar ISBN ficticio si no existe
-                            isbn = self._generar_isbn_falso()
-                            
-                        # Procesar libro directamente de Google Books
-                        libro = self._procesar_libro(item)
-                        if libro and not any(b['isbn'] == libro['isbn'] for b in todos_libros):
-                            todos_libros.append(libro)
+                    # Los items se normalizan todos juntos al final
+                    items_crudos.extend(gb_data.get('items', []))
                     
                     time.sleep(1)  # Pausa entre peticiones
                     
                 except requests.exceptions.RequestException as e:
                     logging.error(f"Error al obtener libros de categoría {categoria}: {e}")
+                    self.metricas.sumar("peticiones_fallidas")
                     continue
                 except json.JSONDecodeError:
                     logging.error(f"Error al decodificar respuesta JSON para categoría {categoria}")
                     continue
             
+            self.metricas.terminar_progreso()
+            todos_libros = self.normalizar_libros(items_crudos)
             logging.info(f"Total de libros únicos encontrados: {len(todos_libros)}")
             return todos_libros
             
@@ -105,13 +277,67 @@ class ImportadorLibros:
             logging.error(f"Error inesperado al obtener libros: {e}")
             sys.exit(1)
 
-    def _generar_isbn_falso(self) -> str:
+    def obtener_libros_desde_dump(self, ruta: str) -> List[Dict[str, Any]]:
+        """Lee un volcado de items de Google Books (JSONL, un volumen por línea) y los normaliza"""
+        with self.metricas.medir("lectura_volcado"), open(ruta, encoding='utf-8') as f:
+            items_crudos = [json.loads(linea) for linea in f if linea.strip()]
+        self.metricas.sumar("bytes", os.path.getsize(ruta))
+        logging.info(f"Items leídos del volcado {ruta}: {len(items_crudos)}")
+
+        todos_libros = self.normalizar_libros(items_crudos)
+        logging.info(f"Total de libros únicos encontrados: {len(todos_libros)}")
+        return todos_libros
+
+    def normalizar_libros(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Normaliza items crudos de Google Books y elimina ISBN duplicados.
+
+        Con procesos > 1 los items se reparten en chunks entre un pool de
+        procesos que devuelve tuplas compactas (CAMPOS_NORMALIZADOS). Cada
+        registro usa su propio generador aleatorio derivado de la semilla y
+        de su posición, por lo que el resultado es idéntico con 1 o N procesos.
+        """
+        inicio = time.perf_counter()
+        tareas = list(enumerate(items))
+
+        if self.procesos > 1 and len(tareas) > self.tamano_chunk:
+            with multiprocessing.Pool(self.procesos, initializer=_inicializar_worker,
+                                      initargs=(self.semilla,)) as pool:
+                tuplas = pool.imap(_normalizar_item, tareas, chunksize=self.tamano_chunk)
+                libros = self._deduplicar(tuplas, len(tareas))
+        else:
+            _inicializar_worker(self.semilla, self)
+            libros = self._deduplicar(map(_normalizar_item, tareas), len(tareas))
+
+        self.metricas.terminar_progreso()
+        self.metricas.sumar("items_leidos", len(tareas))
+        self.metricas.sumar("libros_unicos", len(libros))
+        self.metricas.registrar_etapa(f"parseo ({self.procesos} proceso(s))", len(tareas),
+                                      time.perf_counter() - inicio)
+        return libros
+
+    def _deduplicar(self, tuplas, total: int) -> List[Dict[str, Any]]:
+        """Reconstruye los libros normalizados conservando el primero de cada ISBN"""
+        libros = []
+        vistos = set()
+        for num, tupla in enumerate(tuplas, 1):
+            self.metricas.progreso("parseo", num, total)
+            if tupla is None:
+                self.metricas.sumar("items_descartados")
+                continue
+            libro = _libro_desde_tupla(tupla)
+            if libro['isbn'] not in vistos:
+                vistos.add(libro['isbn'])
+                libros.append(libro)
+        return libros
+
+    def _generar_isbn_falso(self, rng=random) -> str:
         """Genera un ISBN-13 ficticio pero válido"""
         # Prefijo de ISBN-13 para libros (978)
         prefijo = "978"
         
         # Generar 9 dígitos aleatorios
-        medio = ''.join([str(random.randint(0, 9)) for _ in range(9)])
+        medio = ''.join([str(rng.randint(0, 9)) for _ in range(9)])
         
         # Calcular dígito de verificación
         digitos = prefijo + medio
@@ -119,6 +345,11 @@ class ImportadorLibros:
         
         return digitos + digito_verificacion
 
+    def _isbn_ficticio(self, libro: Dict[str, Any], intento: int = 0) -> str:
+        """ISBN ficticio de un libro derivado de su identidad en la fuente y de la semilla"""
+        rng = random.Random(f"{self.semilla}:isbn:{identidad_fuente(libro)}:{intento}")
+        return self._generar_isbn_falso(rng)
+
     def _calcular_digito_verificacion_isbn13(self, digitos: str) -> str:
         """Calcula el dígito de verificación para un ISBN-13"""
         total = 0
@@ -131,7 +362,7 @@ class ImportadorLibros:
         check = (10 - (total % 10)) % 10
         return str(check)
 
-    def _procesar_libro(self, gb_item: Dict[str, Any]) -> Dict[str, Any]:
+    def _procesar_libro(self, gb_item: Dict[str, Any], rng=random) -> Dict[str, Any]:
         try:
             gb_info = gb_item.get('volumeInfo', {})
             
@@ -145,9 +376,11 @@ class ImportadorLibros:
                 elif id_type.get('type') == 'ISBN_10' and not isbn:
                     isbn = id_type.get('identifier')
             
-            if not isbn:
-                isbn = self._generar_isbn_falso()
-                
+            # Campos que no vienen de Google Books y se generan al azar
+            sinteticos = ['precio']
+
+            isbn_generado = not isbn
+
             # Procesar fecha de publicación
             fecha_publicacion = None
             if 'publishedDate' in gb_info:
@@ -161,15 +394,17 @@ class ImportadorLibros:
                             fecha_publicacion = datetime.strptime(gb_info['publishedDate'], '%Y').strftime('%Y-%m-%d')
                         except:
                             # Generar fecha aleatoria entre 1950 y 2023
-                            anio = random.randint(1950, 2023)
-                            mes = random.randint(1, 12)
-                            dia = random.randint(1, 28)
+                            sinteticos.append('fecha_publicacion')
+                            anio = rng.randint(1950, 2023)
+                            mes = rng.randint(1, 12)
+                            dia = rng.randint(1, 28)
                             fecha_publicacion = f"{anio}-{mes:02d}-{dia:02d}"
             else:
                 # Generar fecha aleatoria entre 1950 y 2023
-                anio = random.randint(1950, 2023)
-                mes = random.randint(1, 12)
-                dia = random.randint(1, 28)
+                sinteticos.append('fecha_publicacion')
+                anio = rng.randint(1950, 2023)
+                mes = rng.randint(1, 12)
+                dia = rng.randint(1, 28)
                 fecha_publicacion = f"{anio}-{mes:02d}-{dia:02d}"
             
             # Obtener formato del libro
@@ -190,13 +425,13 @@ class ImportadorLibros:
                         break
                         
             # Generar precio basado en la popularidad
-            precio_base = random.uniform(10, 50)
+            precio_base = rng.uniform(10, 50)
             if gb_info.get('averageRating'):
                 precio_base *= (1 + (gb_info['averageRating'] - 3) * 0.1)
             precio = round(precio_base, 2)
             
             # Generar stock basado en la popularidad
-            stock_base = random.randint(5, 20)
+            stock_base = rng.randint(5, 20)
             if gb_info.get('ratingsCount', 0) > 100:
                 stock_base += 5
             stock = stock_base
@@ -250,9 +485,14 @@ class ImportadorLibros:
                 # Generar descripción genérica
                 descripcion = f"Este libro de {categorias[0] if categorias else 'temática general'} escrito por {info_autores[0]['nombre_completo'] if info_autores else 'un autor desconocido'} explora diversos temas relevantes en su campo."
             
+            # ISBN ficticio: depende solo de título, autores y semilla (no del orden del lote)
+            titulo = gb_info.get('title', 'Título Desconocido')
+            if isbn_generado:
+                isbn = self._isbn_ficticio({'titulo': titulo, 'autores': info_autores})
+
             # Generar subtítulo si no existe
             subtitulo = gb_info.get('subtitle', '')
-            if not subtitulo and random.random() < 0.3:  # 30% de probabilidad de tener subtítulo
+            if not subtitulo and rng.random() < 0.3:  # 30% de probabilidad de tener subtítulo
                 plantillas_subtitulos = [
                     f"Una introducción a {categorias[0] if categorias else 'la materia'}",
                     f"Perspectivas modernas sobre {categorias[0] if categorias else 'el tema'}",
@@ -260,10 +500,14 @@ class ImportadorLibros:
                     f"Teoría y práctica en {categorias[0] if categorias else 'el campo'}",
                     f"Conceptos avanzados de {categorias[0] if categorias else 'la materia'}"
                 ]
-                subtitulo = random.choice(plantillas_subtitulos)
+                subtitulo = rng.choice(plantillas_subtitulos)
+            if not gb_info.get('subtitle'):
+                sinteticos.append('subtitulo')
+            if 'pageCount' not in gb_info:
+                sinteticos.append('num_paginas')
             
             return {
-                'titulo': gb_info.get('title', 'Título Desconocido'),
+                'titulo': titulo,
                 'subtitulo': subtitulo,
                 'isbn': isbn,
                 'fecha_publicacion': fecha_publicacion,
@@ -272,19 +516,125 @@ class ImportadorLibros:
                 'precio': precio,
                 'stock': stock,
                 'descripcion': descripcion,
-                'num_paginas': gb_info.get('pageCount', random.randint(100, 500)),
+                'num_paginas': gb_info.get('pageCount', rng.randint(100, 500)),
                 'idioma': gb_info.get('language', 'es'),
                 'calificacion': round(calificacion, 2),
                 'imagen_portada': imagen_portada,
                 'formato': formato,
                 'autores': info_autores,
-                'categorias': categorias
+                'categorias': categorias,
+                'isbn_generado': isbn_generado,
+                'sinteticos': sinteticos
             }
             
         except Exception as e:
             logging.error(f"Error al procesar libro: {e}")
             return None
 
+    def depurar_isbns(self, libros: List[Dict[str, Any]], ruta_filtro: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Comprueba los ISBN del lote contra libros.isbn con un FiltroISBN.
+
+        Los ISBN ficticios se derivan de la identidad del registro (título y
+        autores), así que al reimportar colisionan con su propia fila: si la
+        fila tiene el mismo título y autores cuenta como existente. Solo una
+        colisión con otro libro (o con otro registro del lote) pasa al
+        siguiente ISBN derivado. Los ISBN reales ya existentes se cuentan
+        (los modos normal/bulk los ignoran y el incremental los actualiza).
+        El filtro queda en self.filtro_isbn y no se persiste hasta
+        guardar_filtro_isbn(), una vez insertado el lote.
+        """
+        if not self.conn:
+            logging.error("No hay conexión a la base de datos")
+            return libros
+
+        inicio = time.perf_counter()
+        filtro = FiltroISBN.desde_bd(self.conn, ruta_filtro)
+        existentes = regenerados = 0
+
+        colisiones = []
+        for libro in libros:
+            isbn = libro['isbn']
+            if not filtro.contiene(isbn):
+                filtro.agregar(isbn)
+            elif libro.get('isbn_generado'):
+                colisiones.append(libro)
+            else:
+                existentes += 1
+
+        fuentes = self._fuentes_isbn([libro['isbn'] for libro in colisiones])
+        for libro in colisiones:
+            for intento in range(1, 101):
+                if self._misma_fuente(libro, fuentes.get(libro['isbn'])):
+                    existentes += 1
+                    break
+                isbn = self._isbn_ficticio(libro, intento)
+                if not filtro.contiene(isbn):
+                    filtro.agregar(isbn)
+                    libro['isbn'] = isbn
+                    regenerados += 1
+                    break
+                libro['isbn'] = isbn
+                fuentes.update(self._fuentes_isbn([isbn]))
+            else:
+                raise RuntimeError(f"No se pudo generar un ISBN único para «{libro['titulo']}»")
+
+        self.filtro_isbn = filtro
+        self.metricas.sumar("isbn_existentes", existentes)
+        self.metricas.sumar("isbn_regenerados", regenerados)
+        self.metricas.sumar("isbn_consultas_bd", filtro.consultas_bd)
+        self.metricas.tiempos["filtro_isbn"] += time.perf_counter() - inicio
+        logging.info(f"ISBN comprobados: {len(libros)} ({existentes} ya existentes, "
+                     f"{regenerados} ficticios regenerados, {filtro.consultas_bd} consultas a MySQL) "
+                     f"en {time.perf_counter() - inicio:.3f} s")
+        return libros
+
+    def _fuentes_isbn(self, isbns: List[str]) -> Dict[str, Tuple[str, set]]:
+        """Título y autores (nombre, apellido) de los libros de la base de datos con esos ISBN"""
+        fuentes: Dict[str, Tuple[str, set]] = {}
+        cursor = self.conn.cursor()
+        try:
+            for i in range(0, len(isbns), LOTE_SINCRONIZACION):
+                lote = isbns[i:i + LOTE_SINCRONIZACION]
+                cursor.execute(
+                    "SELECT l.isbn, l.titulo, a.nombre, a.apellido FROM libros l "
+                    "LEFT JOIN libro_autor la ON la.libro_id = l.libro_id "
+                    "LEFT JOIN autores a ON a.autor_id = la.autor_id "
+                    "WHERE l.isbn IN (%s)" % ','.join(['%s'] * len(lote)), lote)
+                for isbn, titulo, nombre, apellido in cursor.fetchall():
+                    _, autores = fuentes.setdefault(isbn, (titulo, set()))
+                    if nombre is not None:
+                        autores.add((nombre, apellido or ""))
+        finally:
+            cursor.close()
+        return fuentes
+
+    @staticmethod
+    def _misma_fuente(libro: Dict[str, Any], fuente: Optional[Tuple[str, set]]) -> bool:
+        """
+        True si la fila (título, autores) es el mismo registro de la fuente.
+
+        Una fila sin autores enlazados se compara solo por título: el modo
+        normal no enlaza autores que ya existían (INSERT IGNORE).
+        """
+        if fuente is None:
+            return False
+        titulo, autores = fuente
+        return titulo == libro['titulo'] and (not autores or sorted(autores) == autores_fuente(libro['autores']))
+
+    def guardar_filtro_isbn(self, ruta_filtro: str):
+        """
+        Persiste el filtro de depurar_isbns() para la próxima ejecución.
+
+        Se llama después de una inserción correcta: la marca avanza hasta los
+        libros recién insertados, así que la siguiente ejecución no vuelve a
+        añadirlos ni a contarlos en `elementos`.
+        """
+        if self.filtro_isbn is None or not self.conn:
+            return
+        self.filtro_isbn.sincronizar(self.conn)
+        self.filtro_isbn.guardar(ruta_filtro)
+
     def conectar(self):
         try:
             self.conn = mysql.connector.connect(
@@ -293,7 +643,8 @@ class ImportadorLibros:
                 user=self.user,
                 password=self.password,
                 database=self.database,
-                autocommit=True
+                autocommit=True,
+                allow_local_infile=True
             )
             logging.info("Conexión a MySQL establecida correctamente")
         except mysql.connector.Error as err:
@@ -335,28 +686,16 @@ class ImportadorLibros:
                            "VALUES (%s, %s)")
 
         try:
+            inicio = time.perf_counter()
+
             # Insertar libros
-            datos_libros = []
-            for b in libros:
-                datos_libros.append((
-                    b.get("titulo", ""),
-                    b.get("subtitulo", ""),
-                    b.get("isbn", ""),
-                    b.get("fecha_publicacion"),
-                    b.get("edicion", ""),
-                    b.get("editorial", ""),
-                    float(b.get("precio", 0)),
-                    int(b.get("stock", 0)),
-                    b.get("descripcion", ""),
-                    int(b.get("num_paginas", 0)) if b.get("num_paginas") else None,
-                    b.get("idioma", "es"),
-                    float(b.get("calificacion", 3.0)),
-                    b.get("imagen_portada", ""),
-                    b.get("formato", "Tapa blanda")
-                ))
+            datos_libros = [self._fila_libro(b) for b in libros]
             
-            cursor.executemany(sql_libros, datos_libros)
+            with self.metricas.medir("insercion_libros"):
+                cursor.executemany(sql_libros, datos_libros)
             logging.info(f"Libros insertados/ignorados: {cursor.rowcount}")
+            self.metricas.sumar("filas_insertadas", max(cursor.rowcount, 0))
+            self.metricas.sumar("filas_ignoradas", len(datos_libros) - max(cursor.rowcount, 0))
             
             # Obtener IDs de libros insertados
             cursor.execute("SELECT libro_id, isbn FROM libros WHERE isbn IN (%s)" % 
@@ -365,7 +704,8 @@ class ImportadorLibros:
             ids_libros = {row[1]: row[0] for row in cursor.fetchall()}
             
             # Insertar autores y crear relaciones
-            for libro in libros:
+            for num, libro in enumerate(libros, 1):
+                self.metricas.progreso("autores", num, len(libros))
                 libro_id = ids_libros.get(libro['isbn'])
                 if not libro_id:
                     continue
@@ -384,9 +724,12 @@ class ImportadorLibros:
                     
                     if autor_id:
                         cursor.execute(sql_libro_autor, (libro_id, autor_id))
+                        self.metricas.sumar("filas_enlace", max(cursor.rowcount, 0))
+            self.metricas.terminar_progreso()
             
             # Insertar categorías y crear relaciones
-            for libro in libros:
+            for num, libro in enumerate(libros, 1):
+                self.metricas.progreso("categorias", num, len(libros))
                 libro_id = ids_libros.get(libro['isbn'])
                 if not libro_id:
                     continue
@@ -398,8 +741,12 @@ class ImportadorLibros:
                     
                     if categoria_id:
                         cursor.execute(sql_libro_categoria, (libro_id, categoria_id))
+                        self.metricas.sumar("filas_enlace", max(cursor.rowcount, 0))
+            self.metricas.terminar_progreso()
             
-            self.conn.commit()
+            with self.metricas.medir("commit"):
+                self.conn.commit()
+            self._registrar_etapa("insercion (executemany)", len(libros), time.perf_counter() - inicio)
             logging.info("Datos insertados correctamente")
             
         except mysql.connector.Error as err:
@@ -407,6 +754,316 @@ class ImportadorLibros:
             self.conn.rollback()
             sys.exit(1)
 
+    def _fila_libro(self, b: Dict[str, Any]) -> Tuple:
+        """Convierte un libro normalizado en la tupla de columnas de la tabla libros"""
+        return (
+            b.get("titulo", ""),
+            b.get("subtitulo", ""),
+            b.get("isbn", ""),
+            b.get("fecha_publicacion"),
+            b.get("edicion", ""),
+            b.get("editorial", ""),
+            float(b.get("precio", 0)),
+            int(b.get("stock", 0)),
+            b.get("descripcion", ""),
+            int(b.get("num_paginas", 0)) if b.get("num_paginas") else None,
+            b.get("idioma", "es"),
+            float(b.get("calificacion", 3.0)),
+            b.get("imagen_portada", ""),
+            b.get("formato", "Tapa blanda")
+        )
+
+    def _registrar_etapa(self, etapa: str, filas: int, segundos: float):
+        """Registra en el log y en las métricas la duración y el rendimiento de una etapa"""
+        self.metricas.registrar_etapa(etapa, filas, segundos)
+
+    def insertar_libros_bulk(self, libros: List[Dict[str, Any]], directorio: str = "staging"):
+        """
+        Inserta los libros usando la ruta de carga masiva del servidor.
+
+        Escribe las filas normalizadas en ficheros TSV, las carga con
+        LOAD DATA LOCAL INFILE en tablas temporales de staging y las fusiona
+        con las tablas reales mediante sentencias INSERT ... SELECT.
+        """
+        if not self.conn:
+            logging.error("No hay conexión a la base de datos")
+            return
+
+        inicio_total = time.perf_counter()
+
+        # 1. Escribir ficheros de staging
+        inicio = time.perf_counter()
+        ficheros = self._escribir_staging(libros, directorio)
+        filas_escritas = sum(filas for _, filas in ficheros.values())
+        self._registrar_etapa("escritura staging", filas_escritas, time.perf_counter() - inicio)
+
+        cursor = self.conn.cursor()
+        try:
+            # 2. Cargar ficheros en tablas de staging
+            inicio = time.perf_counter()
+            for sql in SQL_STAGING:
+                cursor.execute(sql)
+            for tabla, (ruta, _) in ficheros.items():
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE stg_{tabla} "
+                    "CHARACTER SET utf8mb4 "
+                    "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                    "LINES TERMINATED BY '\\n'",
+                    (os.path.abspath(ruta),)
+                )
+            self._registrar_etapa("carga LOAD DATA", filas_escritas, time.perf_counter() - inicio)
+
+            # 3. Fusionar con las tablas reales en una sola transacción (la conexión
+            # es autocommit: sin ella cada INSERT ... SELECT se confirmaría por separado)
+            inicio = time.perf_counter()
+            filas_fusionadas = 0
+            self.conn.start_transaction()
+            for descripcion, sql in SQL_FUSION:
+                cursor.execute(sql)
+                logging.info(f"Fusión {descripcion}: {cursor.rowcount} filas nuevas")
+                filas_fusionadas += max(cursor.rowcount, 0)
+                if descripcion == "libros":
+                    self.metricas.sumar("filas_insertadas", max(cursor.rowcount, 0))
+                    self.metricas.sumar("filas_ignoradas", len(libros) - max(cursor.rowcount, 0))
+                elif descripcion.startswith("libro_"):
+                    self.metricas.sumar("filas_enlace", max(cursor.rowcount, 0))
+            with self.metricas.medir("commit"):
+                self.conn.commit()
+            self._registrar_etapa("fusión set-based", filas_fusionadas, time.perf_counter() - inicio)
+
+            self._registrar_etapa("total bulk", len(libros), time.perf_counter() - inicio_total)
+            logging.info("Datos insertados correctamente (modo bulk)")
+
+        except mysql.connector.Error as err:
+            logging.error(f"Error al insertar datos en modo bulk: {err}")
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            sys.exit(1)
+        finally:
+            # Con la conexión caída la limpieza también falla: no debe ocultar el error original
+            try:
+                for sql in SQL_LIMPIEZA_STAGING:
+                    cursor.execute(sql)
+                cursor.close()
+            except mysql.connector.Error as err:
+                logging.warning(f"No se pudieron borrar las tablas de staging: {err}")
+
+    def _escribir_staging(self, libros: List[Dict[str, Any]], directorio: str) -> Dict[str, Tuple[str, int]]:
+        """Escribe las filas normalizadas en ficheros TSV y devuelve {tabla: (ruta, filas)}"""
+        os.makedirs(directorio, exist_ok=True)
+
+        filas = {
+            'libros': [self._fila_libro(b) for b in libros],
+            'autores': set(),
+            'categorias': set(),
+            'libro_autor': set(),
+            'libro_categoria': set()
+        }
+        for libro in libros:
+            for autor in libro.get('autores', []):
+                clave = (autor.get('nombre', ""), autor.get('apellido', ""))
+                filas['autores'].add(clave)
+                filas['libro_autor'].add((libro['isbn'],) + clave)
+            for categoria in libro.get('categorias', []):
+                filas['categorias'].add((categoria,))
+                filas['libro_categoria'].add((libro['isbn'], categoria))
+
+        ficheros = {}
+        for tabla, datos in filas.items():
+            ruta = os.path.join(directorio, f"{tabla}.tsv")
+            with open(ruta, 'w', encoding='utf-8', newline='\n') as f:
+                for fila in datos:
+                    f.write('\t'.join(_campo_tsv(v) for v in fila))
+                    f.write('\n')
+            ficheros[tabla] = (ruta, len(datos))
+        return ficheros
+
+    def sincronizar_libros(self, libros: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert incremental basado en hashes de contenido.
+
+        Compara hash_contenido y hash_enlaces de cada libro con los guardados
+        en la tabla libros y solo envía los INSERT, UPDATE y cambios de
+        relaciones autor/categoría necesarios. Devuelve los contadores
+        nuevos, actualizados, enlaces y sin_cambios.
+        """
+        if not self.conn:
+            logging.error("No hay conexión a la base de datos")
+            return {}
+
+        inicio = time.perf_counter()
+        cursor = self.conn.cursor()
+        contadores = {'nuevos': 0, 'actualizados': 0, 'enlaces': 0, 'sin_cambios': 0}
+
+        try:
+            # La conexión es autocommit: todo el upsert va en una transacción para
+            # que un fallo a mitad no deje aplicada solo una parte
+            self.conn.start_transaction()
+
+            # Hashes guardados, consultados por lotes de ISBN
+            guardados = {}
+            isbns = [b['isbn'] for b in libros]
+            for i in range(0, len(isbns), LOTE_SINCRONIZACION):
+                lote = isbns[i:i + LOTE_SINCRONIZACION]
+                cursor.execute(
+                    "SELECT isbn, libro_id, hash_contenido, hash_enlaces FROM libros "
+                    "WHERE isbn IN (%s)" % ','.join(['%s'] * len(lote)),
+                    lote
+                )
+                for isbn, libro_id, h_contenido, h_enlaces in cursor.fetchall():
+                    guardados[isbn] = (libro_id, h_contenido, h_enlaces)
+
+            # Calcular el diff
+            nuevos, actualizados, con_enlaces = [], [], []
+            for libro in libros:
+                h_contenido = hash_contenido(libro)
+                h_enlaces = hash_enlaces(libro)
+                guardado = guardados.get(libro['isbn'])
+
+                if guardado is None:
+                    nuevos.append(self._fila_libro(libro) + (h_contenido, h_enlaces))
+                    con_enlaces.append(libro)
+                    continue
+
+                libro_id, g_contenido, g_enlaces = guardado
+                cambiado = False
+                if g_contenido != h_contenido:
+                    actualizados.append(self._fila_actualizacion(libro) + (h_contenido, libro_id))
+                    cambiado = True
+                if g_enlaces != h_enlaces:
+                    con_enlaces.append(libro)
+                    cambiado = True
+                if not cambiado:
+                    contadores['sin_cambios'] += 1
+
+            # Insertar libros nuevos
+            if nuevos:
+                cursor.executemany(
+                    "INSERT INTO libros "
+                    "(titulo, subtitulo, isbn, fecha_publicacion, edicion, editorial, "
+                    "precio, stock, descripcion, num_paginas, idioma, "
+                    "calificacion, imagen_portada, formato, hash_contenido, hash_enlaces) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    nuevos
+                )
+                contadores['nuevos'] = len(nuevos)
+
+            # Actualizar libros con contenido distinto
+            if actualizados:
+                cursor.executemany(
+                    "UPDATE libros SET titulo = %s, subtitulo = IF(%s, subtitulo, %s), "
+                    "fecha_publicacion = IF(%s, fecha_publicacion, %s), "
+                    "edicion = %s, editorial = %s, precio = IF(%s, precio, %s), descripcion = %s, "
+                    "num_paginas = IF(%s, num_paginas, %s), idioma = %s, imagen_portada = %s, formato = %s, "
+                    "hash_contenido = %s "
+                    "WHERE libro_id = %s",
+                    actualizados
+                )
+                contadores['actualizados'] = len(actualizados)
+
+            # Reescribir relaciones de los libros nuevos o con enlaces distintos
+            if con_enlaces:
+                self._sincronizar_enlaces(cursor, con_enlaces)
+                contadores['enlaces'] = len(con_enlaces) - len(nuevos)
+
+            with self.metricas.medir("commit"):
+                self.conn.commit()
+            for contador, valor in contadores.items():
+                self.metricas.sumar(f"libros_{contador}", valor)
+            logging.info(
+                f"Sincronización: {contadores['nuevos']} nuevos, "
+                f"{contadores['actualizados']} actualizados, "
+                f"{contadores['enlaces']} con enlaces modificados, "
+                f"{contadores['sin_cambios']} sin cambios"
+            )
+            self._registrar_etapa("sincronización incremental", len(libros), time.perf_counter() - inicio)
+            return contadores
+
+        except mysql.connector.Error as err:
+            logging.error(f"Error al sincronizar datos: {err}")
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            sys.exit(1)
+        finally:
+            cursor.close()
+
+    def _fila_actualizacion(self, b: Dict[str, Any]) -> Tuple:
+        """
+        Columnas de catálogo para el UPDATE incremental (sin isbn, stock ni calificacion).
+
+        Los campos inventados van precedidos de un indicador: si es verdadero
+        el UPDATE conserva el valor guardado en lugar de sustituirlo por otro
+        valor aleatorio.
+        """
+        (titulo, subtitulo, _, fecha_publicacion, edicion, editorial, precio, _,
+         descripcion, num_paginas, idioma, _, imagen_portada, formato) = self._fila_libro(b)
+        sinteticos = b.get('sinteticos', ())
+        return (titulo, 'subtitulo' in sinteticos, subtitulo,
+                'fecha_publicacion' in sinteticos, fecha_publicacion, edicion, editorial,
+                'precio' in sinteticos, precio, descripcion,
+                'num_paginas' in sinteticos, num_paginas, idioma, imagen_portada, formato)
+
+    def _sincronizar_enlaces(self, cursor, libros: List[Dict[str, Any]]):
+        """Sustituye las relaciones libro_autor/libro_categoria de los libros indicados"""
+        cursor.execute("SELECT autor_id, nombre, apellido FROM autores")
+        ids_autores = {}
+        for autor_id, nombre, apellido in cursor.fetchall():
+            ids_autores.setdefault((nombre, apellido or ""), autor_id)
+        cursor.execute("SELECT categoria_id, nombre FROM categorias")
+        ids_categorias = {}
+        for categoria_id, nombre in cursor.fetchall():
+            ids_categorias.setdefault(nombre, categoria_id)
+
+        # Crear los autores y categorías que falten
+        for libro in libros:
+            for autor in libro.get('autores', []):
+                clave = (autor.get('nombre', ""), autor.get('apellido', ""))
+                if clave not in ids_autores:
+                    cursor.execute("INSERT INTO autores (nombre, apellido) VALUES (%s, %s)", clave)
+                    ids_autores[clave] = cursor.lastrowid
+            for categoria in libro.get('categorias', []):
+                if categoria not in ids_categorias:
+                    cursor.execute("INSERT INTO categorias (nombre) VALUES (%s)", (categoria,))
+                    ids_categorias[categoria] = cursor.lastrowid
+
+        # IDs de los libros (los nuevos acaban de insertarse)
+        ids_libros = {}
+        isbns = [b['isbn'] for b in libros]
+        for i in range(0, len(isbns), LOTE_SINCRONIZACION):
+            lote = isbns[i:i + LOTE_SINCRONIZACION]
+            cursor.execute("SELECT isbn, libro_id FROM libros WHERE isbn IN (%s)" %
+                           ','.join(['%s'] * len(lote)), lote)
+            ids_libros.update(cursor.fetchall())
+
+        filas_autor, filas_categoria, hashes = set(), set(), []
+        for libro in libros:
+            libro_id = ids_libros.get(libro['isbn'])
+            if not libro_id:
+                continue
+            for autor in libro.get('autores', []):
+                filas_autor.add((libro_id, ids_autores[(autor.get('nombre', ""), autor.get('apellido', ""))]))
+            for categoria in libro.get('categorias', []):
+                filas_categoria.add((libro_id, ids_categorias[categoria]))
+            hashes.append((hash_enlaces(libro), libro_id))
+
+        ids = [libro_id for _, libro_id in hashes]
+        for i in range(0, len(ids), LOTE_SINCRONIZACION):
+            lote = ids[i:i + LOTE_SINCRONIZACION]
+            marcadores = ','.join(['%s'] * len(lote))
+            cursor.execute(f"DELETE FROM libro_autor WHERE libro_id IN ({marcadores})", lote)
+            cursor.execute(f"DELETE FROM libro_categoria WHERE libro_id IN ({marcadores})", lote)
+
+        if filas_autor:
+            cursor.executemany("INSERT INTO libro_autor (libro_id, autor_id) VALUES (%s, %s)",
+                               list(filas_autor))
+        if filas_categoria:
+            cursor.executemany("INSERT INTO libro_categoria (libro_id, categoria_id) VALUES (%s, %s)",
+                               list(filas_categoria))
+        cursor.executemany("UPDATE libros SET hash_enlaces = %s WHERE libro_id = %s", hashes)
+        self.metricas.sumar("filas_enlace", len(filas_autor) + len(filas_categoria))
+        logging.info(f"Relaciones reescritas: {len(filas_autor)} libro_autor, "
+                     f"{len(filas_categoria)} libro_categoria")
+
     def cerrar(self):
         if self.conn:
             self.conn.close()
@@ -419,17 +1076,43 @@ def main():
     parser.add_argument("--user", required=True, help="Usuario de la base de datos")
     parser.add_argument("--password", required=True, help="Contraseña de la base de datos")
     parser.add_argument("--database", default="libreria", help="Nombre de la base de datos")
+    parser.add_argument("--modo", choices=["normal", "bulk", "incremental"], default="normal",
+                        help="normal: INSERT con executemany; bulk: ficheros + LOAD DATA + fusión; "
+                             "incremental: solo los cambios detectados por hash")
+    parser.add_argument("--staging", default="staging", help="Directorio de ficheros de staging (modo bulk)")
+    parser.add_argument("--dump", help="Volcado JSONL de items de Google Books en lugar de consultar la API")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos para la normalización de registros")
+    parser.add_argument("--chunk", type=int, default=500, help="Registros por chunk enviado a cada proceso")
+    parser.add_argument("--semilla", type=int, help="Semilla para que los datos sintéticos sean reproducibles")
+    parser.add_argument("--metricas", default="import_metricas.jsonl",
+                        help="Fichero JSONL donde se añade el resumen de métricas de cada ejecución")
+    parser.add_argument("--filtro-isbn", default="isbn_filtro.bin",
+                        help="Fichero donde se persiste el filtro de Bloom de ISBN entre ejecuciones")
     args = parser.parse_args()
 
-    importador = ImportadorLibros(args.host, args.user, args.password, args.database, args.port)
+    importador = ImportadorLibros(args.host, args.user, args.password, args.database, args.port,
+                                  semilla=args.semilla, procesos=args.procesos,
+                                  tamano_chunk=args.chunk)
     
     logging.info("Iniciando importación de libros...")
-    libros = importador.obtener_libros()
+    if args.dump:
+        libros = importador.obtener_libros_desde_dump(args.dump)
+    else:
+        libros = importador.obtener_libros()
     
     importador.conectar()
-    importador.insertar_libros(libros)
+    importador.depurar_isbns(libros, args.filtro_isbn)
+    if args.modo == "bulk":
+        importador.insertar_libros_bulk(libros, args.staging)
+    elif args.modo == "incremental":
+        importador.sincronizar_libros(libros)
+    else:
+        importador.insertar_libros(libros)
+    if args.filtro_isbn:
+        importador.guardar_filtro_isbn(args.filtro_isbn)
     importador.cerrar()
     
+    importador.metricas.guardar(args.metricas, modo=args.modo, procesos=args.procesos)
     logging.info("¡Importación completada!")
 
 if __name__ == "__main__":
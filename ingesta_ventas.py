@@ -0,0 +1,286 @@
+"""
+ingesta_ventas.py – Cola de ingesta de ventas con escritura por micro-lotes.
+
+Varias cajas (hilos o corrutinas) llaman a `ColaVentas.enviar(venta)`: la
+venta se valida en el momento y se encola, y la llamada devuelve un Future
+que se resuelve con el venta_id cuando la venta está confirmada. Un único
+hilo escritor saca de la cola hasta `tam_lote` ventas, o las que haya cuando
+la primera lleva `latencia_max` segundos esperando, y las escribe en una sola
+transacción con su propia conexión (group commit: un commit por lote).
+
+Cada venta se inserta con su propio INSERT para obtener un lastrowid exacto;
+los detalles de todo el lote van en un único executemany. Si el lote falla,
+se deshace y las ventas se reintentan una a una para que solo la venta
+errónea devuelva el error.
+
+Ejemplo:
+    with ColaVentas() as cola:
+        futuro = cola.enviar({'cliente_id': 3, 'detalles': [
+            {'libro_id': 10, 'cantidad': 2, 'precio_unitario': 19.9}]})
+        venta_id = futuro.result()
+        print(cola.metricas())
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+import mysql.connector
+
+from config import DB_CONFIG
+
+SQL_VENTA = """
+INSERT INTO ventas (cliente_id, total, metodo_pago, estado)
+VALUES (%s, %s, %s, %s)
+"""
+
+SQL_DETALLE = """
+INSERT INTO detalles_venta (venta_id, libro_id, cantidad, precio_unitario, descuento)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def _decimal(valor, campo: str) -> Decimal:
+    try:
+        numero = Decimal(str(valor))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"{campo} no es un número: {valor!r}")
+    if not numero.is_finite():
+        raise ValueError(f"{campo} no es un número finito: {valor!r}")
+    return numero
+
+
+def _entero_positivo(valor, campo: str) -> int:
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)) or not str(valor).isdigit() or int(valor) <= 0:
+        raise ValueError(f"{campo} debe ser un entero positivo: {valor!r}")
+    return int(valor)
+
+
+def validar_venta(datos: Dict[str, Any]) -> Tuple[tuple, List[tuple]]:
+    """
+    Comprueba una venta y devuelve (parámetros de ventas, parámetros de cada detalle sin venta_id).
+
+    Si no se indica el total se calcula a partir de los detalles.
+    """
+    if not isinstance(datos, dict):
+        raise ValueError("La venta debe ser un diccionario")
+    cliente_id = _entero_positivo(datos.get('cliente_id'), 'cliente_id')
+    detalles = datos.get('detalles')
+    if not detalles or not isinstance(detalles, list):
+        raise ValueError("La venta necesita al menos un detalle")
+
+    filas_detalle = []
+    total_calculado = Decimal('0')
+    for i, detalle in enumerate(detalles):
+        libro_id = _entero_positivo(detalle.get('libro_id'), f'detalles[{i}].libro_id')
+        cantidad = _entero_positivo(detalle.get('cantidad', 1), f'detalles[{i}].cantidad')
+        precio = _decimal(detalle.get('precio_unitario'), f'detalles[{i}].precio_unitario')
+        descuento = _decimal(detalle.get('descuento', 0), f'detalles[{i}].descuento')
+        if precio < 0:
+            raise ValueError(f"detalles[{i}].precio_unitario no puede ser negativo")
+        if not 0 <= descuento <= 100:
+            raise ValueError(f"detalles[{i}].descuento debe estar entre 0 y 100")
+        filas_detalle.append((libro_id, cantidad, precio, descuento))
+        total_calculado += cantidad * precio * (100 - descuento) / 100
+
+    total = datos.get('total')
+    total = _decimal(total, 'total') if total is not None else total_calculado.quantize(Decimal('0.01'))
+    if total < 0:
+        raise ValueError("total no puede ser negativo")
+    venta = (cliente_id, total, datos.get('metodo_pago', 'Efectivo'), datos.get('estado', 'Completada'))
+    return venta, filas_detalle
+
+
+class _Pendiente:
+    __slots__ = ('venta', 'detalles', 'futuro', 'encolada')
+
+    def __init__(self, venta, detalles, futuro, encolada):
+        self.venta = venta
+        self.detalles = detalles
+        self.futuro = futuro
+        self.encolada = encolada
+
+
+class ColaVentas:
+    """
+    Cola multi-productor de ventas con un escritor por micro-lotes.
+
+    `capacidad` limita las ventas en cola: cuando se llena, `enviar` espera
+    hasta `espera_encolar` segundos y luego lanza queue.Full (contrapresión
+    hacia las cajas en lugar de memoria sin límite).
+    """
+
+    def __init__(self, conexion: Optional[Dict[str, Any]] = None, tam_lote: int = 200,
+                 latencia_max: float = 0.05, capacidad: int = 10_000, espera_encolar: float = 5.0,
+                 ventana_metricas: int = 1000):
+        self.conexion = conexion or DB_CONFIG
+        self.tam_lote = tam_lote
+        self.latencia_max = latencia_max
+        self.espera_encolar = espera_encolar
+        self.cola: "queue.Queue[Optional[_Pendiente]]" = queue.Queue(maxsize=capacidad)
+        self.conn = None
+        self._hilo: Optional[threading.Thread] = None
+        self._bloqueo = threading.Lock()
+        # Métricas
+        self.ventas_confirmadas = 0
+        self.ventas_fallidas = 0
+        self.lotes = 0
+        self.rechazadas = 0
+        self._latencias_commit = deque(maxlen=ventana_metricas)
+        self._esperas = deque(maxlen=ventana_metricas)
+        self._tamanos_lote = deque(maxlen=ventana_metricas)
+
+    # ------------------------------------------------------------------ ciclo de vida
+
+    def iniciar(self) -> "ColaVentas":
+        if self._hilo is None:
+            self.conn = mysql.connector.connect(**self.conexion)
+            self._hilo = threading.Thread(target=self._escribir, name="ingesta_ventas", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, espera: Optional[float] = None):
+        """Escribe lo que queda en la cola y para el escritor"""
+        if self._hilo is None:
+            return
+        self.cola.put(None)
+        self._hilo.join(espera)
+        self._hilo = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excepcion):
+        self.detener()
+
+    # ------------------------------------------------------------------ productores
+
+    def enviar(self, datos_venta: Dict[str, Any]) -> Future:
+        """Valida y encola una venta; el Future devuelve su venta_id tras el commit"""
+        try:
+            venta, detalles = validar_venta(datos_venta)
+        except ValueError:
+            with self._bloqueo:
+                self.rechazadas += 1
+            raise
+        if self._hilo is None:
+            raise RuntimeError("La cola de ventas no está iniciada")
+        futuro = Future()
+        self.cola.put(_Pendiente(venta, detalles, futuro, time.perf_counter()), timeout=self.espera_encolar)
+        return futuro
+
+    async def enviar_async(self, datos_venta: Dict[str, Any]) -> int:
+        """Versión para corrutinas: espera el venta_id sin bloquear el bucle de eventos"""
+        return await asyncio.wrap_future(self.enviar(datos_venta))
+
+    # ------------------------------------------------------------------ escritor
+
+    def _escribir(self):
+        terminar = False
+        while not terminar:
+            primera = self.cola.get()
+            if primera is None:
+                break
+            lote = [primera]
+            limite = primera.encolada + self.latencia_max
+            while len(lote) < self.tam_lote:
+                restante = limite - time.perf_counter()
+                try:
+                    pendiente = self.cola.get(timeout=restante) if restante > 0 else self.cola.get_nowait()
+                except queue.Empty:
+                    break
+                if pendiente is None:
+                    terminar = True
+                    break
+                lote.append(pendiente)
+            self._escribir_lote(lote)
+
+    def _escribir_lote(self, lote: List[_Pendiente]):
+        inicio = time.perf_counter()
+        try:
+            ids = self._insertar(lote)
+        except Exception as e:
+            logging.warning(f"Lote de {len(lote)} ventas deshecho ({e}); se reintenta venta a venta")
+            self._reintentar_una_a_una(lote)
+            return
+        fin = time.perf_counter()
+        self._registrar(lote, ids, inicio, fin)
+
+    def _insertar(self, lote: List[_Pendiente]) -> List[int]:
+        """Inserta el lote en una transacción y devuelve los venta_id en orden"""
+        cursor = self.conn.cursor()
+        try:
+            self.conn.start_transaction()
+            ids = []
+            for pendiente in lote:
+                cursor.execute(SQL_VENTA, pendiente.venta)
+                ids.append(cursor.lastrowid)
+            detalles = [(venta_id,) + detalle
+                        for venta_id, pendiente in zip(ids, lote) for detalle in pendiente.detalles]
+            cursor.executemany(SQL_DETALLE, detalles)
+            self.conn.commit()
+            return ids
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _reintentar_una_a_una(self, lote: List[_Pendiente]):
+        for pendiente in lote:
+            inicio = time.perf_counter()
+            try:
+                ids = self._insertar([pendiente])
+            except Exception as e:
+                with self._bloqueo:
+                    self.ventas_fallidas += 1
+                pendiente.futuro.set_exception(e)
+                continue
+            self._registrar([pendiente], ids, inicio, time.perf_counter())
+
+    def _registrar(self, lote: List[_Pendiente], ids: List[int], inicio: float, fin: float):
+        with self._bloqueo:
+            self.lotes += 1
+            self.ventas_confirmadas += len(lote)
+            self._latencias_commit.append(fin - inicio)
+            self._tamanos_lote.append(len(lote))
+            self._esperas.extend(fin - pendiente.encolada for pendiente in lote)
+        for pendiente, venta_id in zip(lote, ids):
+            pendiente.futuro.set_result(venta_id)
+
+    # ------------------------------------------------------------------ métricas
+
+    def metricas(self) -> Dict[str, Any]:
+        """Profundidad de cola, contadores y percentiles (ms) de commit y de espera total"""
+        with self._bloqueo:
+            latencias = sorted(self._latencias_commit)
+            esperas = sorted(self._esperas)
+            tamanos = list(self._tamanos_lote)
+            return {
+                'profundidad_cola': self.cola.qsize(),
+                'ventas_confirmadas': self.ventas_confirmadas,
+                'ventas_fallidas': self.ventas_fallidas,
+                'rechazadas_validacion': self.rechazadas,
+                'lotes': self.lotes,
+                'tam_lote_medio': round(sum(tamanos) / len(tamanos), 1) if tamanos else 0,
+                'commit_ms': _percentiles(latencias),
+                'espera_ms': _percentiles(esperas),
+            }
+
+
+def _percentiles(valores: List[float]) -> Dict[str, Optional[float]]:
+    if not valores:
+        return {'p50': None, 'p95': None, 'max': None}
+
+    def percentil(p):
+        return round(1000 * valores[min(len(valores) - 1, int(p * len(valores)))], 3)
+    return {'p50': percentil(0.50), 'p95': percentil(0.95), 'max': round(1000 * valores[-1], 3)}
@@ -62,6 +62,20 @@ CREATE TABLE categorias (
     FOREIGN KEY (categoria_padre_id) REFERENCES categorias(categoria_id) ON DELETE SET NULL     -- --> Referencia a la tabla de categorias (esto solo por el momento)
 );
 
+-- Tabla de cierre de la jerarquía de categorías: una fila por cada par
+-- (ancestro, descendiente) a cualquier profundidad (1 = hijo directo). La
+-- propia categoría no tiene fila; las consultas la añaden aparte. La mantiene
+-- CategoriaController al crear, mover o eliminar (ver arbol_categorias.py).
+CREATE TABLE categorias_cierre (
+    ancestro_id                INT NOT NULL,                                                    -- --> Categoría ancestro
+    descendiente_id            INT NOT NULL,                                                    -- --> Categoría descendiente
+    profundidad                INT NOT NULL,                                                    -- --> Niveles entre ambas (>= 1)
+    PRIMARY KEY (ancestro_id, descendiente_id),                                                 -- --> Subárbol: búsqueda por ancestro
+    INDEX idx_cierre_descendiente (descendiente_id, profundidad),                               -- --> Ruta de ancestros ordenada
+    FOREIGN KEY (ancestro_id) REFERENCES categorias(categoria_id) ON DELETE CASCADE,
+    FOREIGN KEY (descendiente_id) REFERENCES categorias(categoria_id) ON DELETE CASCADE
+);
+
 /* ============================================================================ */
 
 -- Tabla de libros
@@ -75,14 +89,20 @@ CREATE TABLE libros (
     editorial 					VARCHAR(100),														-- --> Editorial
     precio 						DECIMAL(10, 2) NOT NULL,											-- --> Precio del libro (decimal, bytes) - (obligatorio)
     stock 						INT NOT NULL DEFAULT 0,												-- --> Cantidad de libros en stock (obligatorio) - (por defecto = 0)
+    stock_reservado 			INT NOT NULL DEFAULT 0,												-- --> Unidades retenidas por carritos (reservas_stock) sin vender aún
     descripcion 				TEXT,																-- --> Descripción de los libros
     num_paginas 				INT,																-- --> Número de páginas
     idioma 						VARCHAR(20) DEFAULT 'es',											-- --> Idioma del libro
     calificacion 				DECIMAL(3, 2) DEFAULT 0.00,											-- --> Calificación
     imagen_portada 				VARCHAR(255),														-- --> Imagen de portada
     formato 					VARCHAR(50) DEFAULT 'Digital',										-- --> Formato del libro (por defecto Digital)
+    hash_contenido 				CHAR(40),															-- --> SHA-1 del contenido de catálogo (importación incremental)
+    hash_enlaces 				CHAR(40),															-- --> SHA-1 de autores y categorías (importación incremental)
     created_at 					TIMESTAMP DEFAULT CURRENT_TIMESTAMP,								-- --> Fecha de creación (Tiempo actual)
-    updated_at 					TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP		-- --> Fecha de última modificación (Tiempo actual)
+    updated_at 					TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,		-- --> Fecha de última modificación (Tiempo actual)
+
+    CONSTRAINT chk_libros_stock CHECK (stock >= 0),																				-- --> Nunca se vende más de lo que hay
+    CONSTRAINT chk_libros_stock_reservado CHECK (stock_reservado >= 0)
 );
 
 /* ============================================================================ */
@@ -166,6 +186,23 @@ CREATE TABLE detalles_venta (
 
 /* ============================================================================ */
 
+-- Tabla de reservas de stock: unidades apartadas por un carrito hasta que se
+-- confirma la venta, se libera o vence expira_en (ver reservas_stock.py).
+CREATE TABLE reservas_stock (
+    reserva_id 			BIGINT AUTO_INCREMENT PRIMARY KEY, -- --> Id de la reserva
+    carrito 			VARCHAR(64) NOT NULL, -- --> Identificador del carrito / caja
+    libro_id 			INT NOT NULL, -- --> Libro reservado
+    cantidad 			INT NOT NULL CHECK (cantidad > 0), -- --> Unidades reservadas
+    expira_en 			DATETIME(3) NOT NULL, -- --> Vencimiento de la reserva
+    created_at 			TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- --> Fecha de creación de la reserva
+
+    INDEX idx_reservas_carrito (carrito),
+    INDEX idx_reservas_expira (expira_en),
+    FOREIGN KEY (libro_id) REFERENCES libros(libro_id) 		ON DELETE CASCADE -- --> Clave foranea libro
+);
+
+/* ============================================================================ */
+
 -- Tabla de reseñas
 CREATE TABLE resenas (
     resena_id 			  INT AUTO_INCREMENT PRIMARY KEY, -- --> Id de la reseña
@@ -316,15 +353,20 @@ CREATE PROCEDURE actualizar_stock(
     IN p_cantidad INT
 )
 BEGIN
+    DECLARE v_stock INT;
+
     UPDATE libros
     SET stock = stock + p_cantidad
     WHERE libro_id = p_libro_id;
     
-    -- Registrar si el stock es bajo
-    IF (SELECT stock FROM libros WHERE libro_id = p_libro_id) < 5 THEN
-        INSERT INTO log_eventos (tipo, mensaje)
-        VALUES ('stock_bajo', CONCAT('Stock bajo para libro ID: ', p_libro_id, '. Stock actual: ', 
-                (SELECT stock FROM libros WHERE libro_id = p_libro_id)));
+    -- Registrar si el stock es bajo (una sola lectura del nivel resultante)
+    SELECT stock INTO v_stock FROM libros WHERE libro_id = p_libro_id;
+    IF v_stock < 5 THEN
+        -- Una fila por libro cada 5 minutos; las repeticiones solo suman ocurrencias
+        INSERT INTO log_eventos (tipo, clave, mensaje, ventana_inicio)
+        VALUES ('stock_bajo', CONCAT('libro:', p_libro_id), CONCAT('Stock bajo para libro ID: ', p_libro_id, '. Stock actual: ', v_stock),
+                FROM_UNIXTIME(UNIX_TIMESTAMP() DIV 300 * 300))
+        ON DUPLICATE KEY UPDATE ocurrencias = ocurrencias + 1, mensaje = VALUES(mensaje), ultima_fecha = CURRENT_TIMESTAMP;
     END IF;
 END //
 DELIMITER ;
@@ -381,6 +423,39 @@ DELIMITER ;
 
 /* ============================================================================ */
 
+-- Procedimiento para la clasificación de ventas de todos los autores en una sola pasada:
+-- agrega detalles_venta por libro y solo después une con libro_autor (ver ventas_autores.py)
+DELIMITER //
+CREATE PROCEDURE ranking_ventas_autores(
+    IN p_desde DATETIME,
+    IN p_hasta DATETIME,
+    IN p_limite INT,
+    IN p_desplazamiento INT
+)
+BEGIN
+    SELECT
+        a.autor_id,
+        CONCAT(a.nombre, ' ', a.apellido) AS autor,
+        SUM(l.unidades) AS unidades,
+        SUM(l.importe) AS total_ventas
+    FROM (
+        SELECT dv.libro_id, SUM(dv.cantidad) AS unidades, SUM(dv.cantidad * dv.precio_unitario) AS importe
+        FROM detalles_venta dv
+        JOIN ventas v ON v.venta_id = dv.venta_id
+        WHERE (p_desde IS NULL OR v.fecha_venta >= p_desde)
+          AND (p_hasta IS NULL OR v.fecha_venta < p_hasta)
+        GROUP BY dv.libro_id
+    ) AS l
+    JOIN libro_autor la ON la.libro_id = l.libro_id
+    JOIN autores a ON a.autor_id = la.autor_id
+    GROUP BY a.autor_id
+    ORDER BY total_ventas DESC, a.autor_id
+    LIMIT p_limite OFFSET p_desplazamiento;
+END //
+DELIMITER ;
+
+/* ============================================================================ */
+
 -- Procedimiento para buscar libros
 DELIMITER //
 CREATE PROCEDURE buscar_libros(
@@ -427,12 +502,32 @@ DELIMITER ;
 
 /* ============================ TABLAS DE LOGS ============================*/
 
--- Tabla de log de eventos
+-- Tabla de log de eventos. Los eventos con clave (p. ej. 'libro:12') se agrupan
+-- por ventana: una fila por (tipo, clave, ventana_inicio) con el número de
+-- ocurrencias, en lugar de una fila por cada repetición (ver eventos.py).
 CREATE TABLE log_eventos (
     evento_id INT AUTO_INCREMENT PRIMARY KEY,
     tipo VARCHAR(50) NOT NULL,
-    mensaje TEXT NOT NULL,
-    fecha_evento TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    clave VARCHAR(100),                                                            -- --> Entidad a la que se refiere (agrupación)
+    mensaje TEXT NOT NULL,                                                         -- --> Mensaje de la última ocurrencia
+    ocurrencias INT NOT NULL DEFAULT 1,                                            -- --> Repeticiones agrupadas en esta fila
+    ventana_inicio DATETIME,                                                       -- --> Inicio de la ventana de agrupación (NULL: sin agrupar)
+    fecha_evento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,                              -- --> Primera ocurrencia
+    ultima_fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,                              -- --> Última ocurrencia
+    UNIQUE INDEX idx_log_eventos_agrupacion (tipo, clave, ventana_inicio),
+    INDEX idx_log_eventos_tipo_fecha (tipo, fecha_evento),
+    INDEX idx_log_eventos_fecha (fecha_evento)
+);
+
+-- Tabla de cambios (change-data feed): una fila por INSERT/UPDATE/DELETE en las
+-- tablas principales. Los consumidores la leen en orden de cambio_id.
+CREATE TABLE log_cambios (
+    cambio_id BIGINT AUTO_INCREMENT PRIMARY KEY,                                   -- --> Marca de agua de los consumidores
+    tabla VARCHAR(30) NOT NULL,                                                    -- --> Tabla modificada
+    operacion ENUM('INSERT', 'UPDATE', 'DELETE') NOT NULL,                         -- --> Tipo de cambio
+    clave INT NOT NULL,                                                            -- --> Clave primaria de la fila modificada
+    fecha_cambio TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),                        -- --> Fecha del cambio
+    INDEX idx_log_cambios_tabla (tabla, cambio_id)
 );
 
 /* ============================================================================ */
@@ -447,16 +542,27 @@ CREATE TRIGGER after_venta_insert
 AFTER INSERT ON detalles_venta
 FOR EACH ROW
 BEGIN
-    -- Reducir el stock
+    DECLARE v_stock INT;
+
+    -- Reducir el stock sin tocar lo reservado por otros carritos: la condición se
+    -- evalúa con el bloqueo de la fila, así que dos cajas no pueden vender la misma unidad
     UPDATE libros
     SET stock = stock - NEW.cantidad
-    WHERE libro_id = NEW.libro_id;
+    WHERE libro_id = NEW.libro_id AND stock - stock_reservado >= NEW.cantidad;
+
+    IF ROW_COUNT() = 0 AND NEW.cantidad > 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Stock insuficiente para el libro';
+    END IF;
     
-    -- Verificar si el stock es bajo después de la venta
-    IF (SELECT stock FROM libros WHERE libro_id = NEW.libro_id) < 5 THEN
-        INSERT INTO log_eventos (tipo, mensaje)
-        VALUES ('stock_bajo', CONCAT('Stock bajo para libro ID: ', NEW.libro_id, 
-                '. Stock actual: ', (SELECT stock FROM libros WHERE libro_id = NEW.libro_id)));
+    -- Verificar si el stock es bajo después de la venta (una sola lectura; la fila
+    -- ya está bloqueada por el UPDATE, así que el valor es el que acaba de quedar)
+    SELECT stock INTO v_stock FROM libros WHERE libro_id = NEW.libro_id;
+    IF v_stock < 5 THEN
+        -- Una fila por libro cada 5 minutos; las repeticiones solo suman ocurrencias
+        INSERT INTO log_eventos (tipo, clave, mensaje, ventana_inicio)
+        VALUES ('stock_bajo', CONCAT('libro:', NEW.libro_id), CONCAT('Stock bajo para libro ID: ', NEW.libro_id, '. Stock actual: ', v_stock),
+                FROM_UNIXTIME(UNIX_TIMESTAMP() DIV 300 * 300))
+        ON DUPLICATE KEY UPDATE ocurrencias = ocurrencias + 1, mensaje = VALUES(mensaje), ultima_fecha = CURRENT_TIMESTAMP;
     END IF;
 END //
 DELIMITER ;
@@ -487,9 +593,10 @@ CREATE TRIGGER after_cliente_delete
 AFTER DELETE ON clientes
 FOR EACH ROW
 BEGIN
-    INSERT INTO log_table(entidad, descripcion)
+    INSERT INTO log_eventos (tipo, clave, mensaje)
     VALUES (
-        'cliente',
+        'cliente_eliminado',
+        CONCAT('cliente:', OLD.cliente_id),
         CONCAT('Se eliminó cliente ID: ', OLD.cliente_id, ' - ', OLD.nombre, ' ', OLD.apellido)
     );
 END //
@@ -498,6 +605,77 @@ DELIMITER ;
 
 
 
+/* ============================ TRIGGERS DE CAMBIOS ============================*/
+
+-- Cada trigger registra solo (tabla, operación, clave) en log_cambios;
+-- el consumidor (feed_cambios.py) vuelve a leer la fila si la necesita.
+
+-- Cambios en libros
+CREATE TRIGGER cambios_libros_insert AFTER INSERT ON libros FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libros', 'INSERT', NEW.libro_id);
+CREATE TRIGGER cambios_libros_update AFTER UPDATE ON libros FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libros', 'UPDATE', NEW.libro_id);
+CREATE TRIGGER cambios_libros_delete AFTER DELETE ON libros FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libros', 'DELETE', OLD.libro_id);
+
+-- Cambios en autores
+CREATE TRIGGER cambios_autores_insert AFTER INSERT ON autores FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('autores', 'INSERT', NEW.autor_id);
+CREATE TRIGGER cambios_autores_update AFTER UPDATE ON autores FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('autores', 'UPDATE', NEW.autor_id);
+CREATE TRIGGER cambios_autores_delete AFTER DELETE ON autores FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('autores', 'DELETE', OLD.autor_id);
+
+-- Cambios en categorias
+CREATE TRIGGER cambios_categorias_insert AFTER INSERT ON categorias FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('categorias', 'INSERT', NEW.categoria_id);
+CREATE TRIGGER cambios_categorias_update AFTER UPDATE ON categorias FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('categorias', 'UPDATE', NEW.categoria_id);
+CREATE TRIGGER cambios_categorias_delete AFTER DELETE ON categorias FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('categorias', 'DELETE', OLD.categoria_id);
+
+-- Cambios en clientes
+CREATE TRIGGER cambios_clientes_insert AFTER INSERT ON clientes FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('clientes', 'INSERT', NEW.cliente_id);
+CREATE TRIGGER cambios_clientes_update AFTER UPDATE ON clientes FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('clientes', 'UPDATE', NEW.cliente_id);
+CREATE TRIGGER cambios_clientes_delete AFTER DELETE ON clientes FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('clientes', 'DELETE', OLD.cliente_id);
+
+-- Cambios en ventas
+CREATE TRIGGER cambios_ventas_insert AFTER INSERT ON ventas FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('ventas', 'INSERT', NEW.venta_id);
+CREATE TRIGGER cambios_ventas_update AFTER UPDATE ON ventas FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('ventas', 'UPDATE', NEW.venta_id);
+CREATE TRIGGER cambios_ventas_delete AFTER DELETE ON ventas FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('ventas', 'DELETE', OLD.venta_id);
+
+-- Cambios en resenas
+CREATE TRIGGER cambios_resenas_insert AFTER INSERT ON resenas FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('resenas', 'INSERT', NEW.resena_id);
+CREATE TRIGGER cambios_resenas_update AFTER UPDATE ON resenas FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('resenas', 'UPDATE', NEW.resena_id);
+CREATE TRIGGER cambios_resenas_delete AFTER DELETE ON resenas FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('resenas', 'DELETE', OLD.resena_id);
+
+-- Cambios en las relaciones de libros (la clave es el libro_id)
+CREATE TRIGGER cambios_libro_autor_insert AFTER INSERT ON libro_autor FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libro_autor', 'INSERT', NEW.libro_id);
+CREATE TRIGGER cambios_libro_autor_update AFTER UPDATE ON libro_autor FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libro_autor', 'UPDATE', NEW.libro_id);
+CREATE TRIGGER cambios_libro_autor_delete AFTER DELETE ON libro_autor FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libro_autor', 'DELETE', OLD.libro_id);
+CREATE TRIGGER cambios_libro_categoria_insert AFTER INSERT ON libro_categoria FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libro_categoria', 'INSERT', NEW.libro_id);
+CREATE TRIGGER cambios_libro_categoria_update AFTER UPDATE ON libro_categoria FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libro_categoria', 'UPDATE', NEW.libro_id);
+CREATE TRIGGER cambios_libro_categoria_delete AFTER DELETE ON libro_categoria FOR EACH ROW
+    INSERT INTO log_cambios (tabla, operacion, clave) VALUES ('libro_categoria', 'DELETE', OLD.libro_id);
+
+/* ============================================================================ */
+
+
+
 /* ============================ INDICES DE BUSQUEDA ============================*/
 
 -- Índices para mejorar el rendimiento
@@ -508,4 +686,12 @@ CREATE INDEX idx_categorias_nombre ON categorias(nombre);
 CREATE INDEX idx_clientes_email ON clientes(email);
 CREATE INDEX idx_ventas_fecha ON ventas(fecha_venta);
 
+-- Búsquedas inversas de relaciones y claves foráneas (migración 1 de migraciones.py)
+CREATE INDEX idx_libro_autor_autor ON libro_autor(autor_id, libro_id);
+CREATE INDEX idx_libro_categoria_categoria ON libro_categoria(categoria_id, libro_id);
+CREATE INDEX idx_detalles_libro ON detalles_venta(libro_id, cantidad, precio_unitario);
+CREATE INDEX idx_detalles_venta ON detalles_venta(venta_id, libro_id);
+CREATE INDEX idx_resenas_libro_fecha ON resenas(libro_id, fecha_resena);
+CREATE INDEX idx_ventas_cliente_fecha ON ventas(cliente_id, fecha_venta);
+
 /* ============================================================================ */
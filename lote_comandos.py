@@ -0,0 +1,270 @@
+"""
+lote_comandos.py – Modo por lotes de app.py: ejecuta comandos leídos de JSONL o CSV.
+
+Cada comando es un objeto con la operación en "op" y sus argumentos:
+  {"op": "crear_libro", "titulo": "...", "precio": 19.9, "autores": [{"nombre": "..."}]}
+  {"op": "actualizar_stock", "libro_id": 12, "delta": -3}
+  {"op": "buscar_libros", "termino": "python"}
+En CSV la primera fila es la cabecera (con una columna "op"); las celdas
+vacías se ignoran y las que empiezan por "[" o "{" se leen como JSON.
+
+Los comandos se ejecutan a través de SistemaLibreria en transacciones de
+`tam_lote` comandos, cada uno tras un SAVEPOINT para que un fallo solo deshaga
+ese comando. Los resultados (una línea JSON por comando) se escriben tras el
+commit de su lote, de modo que un "ok" siempre está confirmado en la base de
+datos. Al final se informa del total, los errores y el rendimiento.
+
+Uso:
+  python app.py --lote comandos.jsonl --resultados resultados.jsonl
+  cat comandos.csv | python app.py --lote - --formato csv
+"""
+
+import csv
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+
+def _leer_jsonl(fuente: TextIO) -> Iterator[Dict[str, Any]]:
+    for numero, linea in enumerate(fuente, 1):
+        linea = linea.strip()
+        if not linea or linea.startswith('#'):
+            continue
+        try:
+            yield json.loads(linea)
+        except json.JSONDecodeError as e:
+            yield {'op': None, '_error': f"línea {numero}: JSON no válido ({e})"}
+
+
+def _valor_csv(valor: str):
+    if valor[:1] in '[{':
+        try:
+            return json.loads(valor)
+        except json.JSONDecodeError:
+            pass
+    return valor
+
+
+def _leer_csv(fuente: TextIO) -> Iterator[Dict[str, Any]]:
+    for fila in csv.DictReader(fuente):
+        yield {campo: _valor_csv(valor) for campo, valor in fila.items() if campo and valor not in (None, '')}
+
+
+def leer_comandos(fuente: TextIO, formato: str = 'jsonl') -> Iterator[Dict[str, Any]]:
+    """Comandos de un fichero o de stdin en formato 'jsonl' o 'csv'"""
+    if formato == 'csv':
+        return _leer_csv(fuente)
+    return _leer_jsonl(fuente)
+
+
+# ---------------------------------------------------------------------------- comandos
+
+def _sin_op(comando: Dict[str, Any]) -> Dict[str, Any]:
+    return {campo: valor for campo, valor in comando.items() if campo != 'op'}
+
+
+def _filas(resultado) -> List[Dict[str, Any]]:
+    if hasattr(resultado, 'columnas'):
+        return [resultado.columnas.como_dict(fila) for fila in resultado]
+    return list(resultado)
+
+
+def _crear_libro(sistema, comando):
+    return {'libro_id': sistema.agregar_libro(_sin_op(comando))}
+
+
+def _crear_cliente(sistema, comando):
+    return {'cliente_id': sistema.agregar_cliente(_sin_op(comando))}
+
+
+def _crear_venta(sistema, comando):
+    return {'venta_id': sistema.crear_venta(_sin_op(comando))}
+
+
+def _actualizar_libro(sistema, comando):
+    datos = _sin_op(comando)
+    return {'actualizado': sistema.actualizar_libro(int(datos.pop('libro_id')), datos)}
+
+
+def _actualizar_cliente(sistema, comando):
+    datos = _sin_op(comando)
+    return {'actualizado': sistema.actualizar_cliente(int(datos.pop('cliente_id')), datos)}
+
+
+def _actualizar_stock(sistema, comando):
+    libro_id = int(comando['libro_id'])
+    if 'delta' in comando:
+        filas = sistema.ejecutar_accion("UPDATE libros SET stock = stock + %s WHERE libro_id = %s",
+                                        (int(comando['delta']), libro_id))
+    else:
+        filas = sistema.ejecutar_accion("UPDATE libros SET stock = %s WHERE libro_id = %s",
+                                        (int(comando['stock']), libro_id))
+    if not filas:
+        raise ValueError(f"No existe el libro {libro_id}")
+    return {'libro_id': libro_id}
+
+
+def _buscar_libros(sistema, comando):
+    filas = _filas(sistema.buscar_libros(comando['termino'], crudo=True))
+    return {'total': len(filas), 'filas': filas}
+
+
+def _buscar_clientes(sistema, comando):
+    filas = _filas(sistema.buscar_clientes(comando['termino'], crudo=True))
+    return {'total': len(filas), 'filas': filas}
+
+
+REPORTES = {
+    'estadisticas': lambda sistema: sistema.obtener_estadisticas(),
+    'libros': lambda sistema: _filas(sistema.obtener_libros(crudo=True)),
+    'autores': lambda sistema: _filas(sistema.obtener_autores(crudo=True)),
+    'categorias': lambda sistema: _filas(sistema.obtener_categorias(crudo=True)),
+    'clientes': lambda sistema: _filas(sistema.obtener_clientes(crudo=True)),
+    'ventas': lambda sistema: _filas(sistema.obtener_ventas(crudo=True)),
+}
+
+
+def _reporte(sistema, comando):
+    nombre = comando.get('nombre', 'estadisticas')
+    if nombre not in REPORTES:
+        raise ValueError(f"Reporte desconocido: {nombre} (disponibles: {', '.join(REPORTES)})")
+    return {'reporte': nombre, 'datos': REPORTES[nombre](sistema)}
+
+
+COMANDOS: Dict[str, Callable] = {
+    'crear_libro': _crear_libro,
+    'crear_cliente': _crear_cliente,
+    'crear_venta': _crear_venta,
+    'actualizar_libro': _actualizar_libro,
+    'actualizar_cliente': _actualizar_cliente,
+    'actualizar_stock': _actualizar_stock,
+    'buscar_libros': _buscar_libros,
+    'buscar_clientes': _buscar_clientes,
+    'reporte': _reporte,
+}
+
+
+# ---------------------------------------------------------------------------- ejecución
+
+class EjecutorLotes:
+    """Ejecuta comandos en transacciones de `tam_lote` y escribe un resultado JSON por comando"""
+
+    def __init__(self, sistema, tam_lote: int = 500, salida: Optional[TextIO] = None,
+                 detener_en_error: bool = False):
+        self.sistema = sistema
+        self.tam_lote = tam_lote
+        self.salida = salida or sys.stdout
+        self.detener_en_error = detener_en_error
+        self.total = 0
+        self.errores = 0
+        self.por_operacion: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def ejecutar(self, comandos: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Ejecuta todos los comandos y devuelve el resumen"""
+        inicio = time.perf_counter()
+        lote: List[Dict[str, Any]] = []
+        for comando in comandos:
+            lote.append(comando)
+            if len(lote) >= self.tam_lote:
+                if not self._ejecutar_lote(lote):
+                    break
+                lote = []
+        else:
+            if lote:
+                self._ejecutar_lote(lote)
+        return self._resumen(time.perf_counter() - inicio)
+
+    def _ejecutar_lote(self, lote: List[Dict[str, Any]]) -> bool:
+        """Ejecuta un lote en una transacción; devuelve False si hay que detenerse"""
+        resultados = []
+        continuar = True
+        try:
+            with self.sistema.transaccion():
+                for comando in lote:
+                    resultado = self._ejecutar_comando(comando)
+                    resultados.append(resultado)
+                    if not resultado['ok'] and self.detener_en_error:
+                        continuar = False
+                        break
+        except Exception as e:
+            # Falló el commit (o la transacción): nada del lote quedó confirmado
+            logging.error(f"Lote de {len(lote)} comandos deshecho: {e}")
+            for resultado in resultados:
+                if resultado['ok']:
+                    resultado.update(ok=False, error=f"lote deshecho: {e}")
+                    resultado.pop('resultado', None)
+            if continuar:
+                resultados.extend({'op': comando.get('op'), 'ok': False, 'error': f"lote deshecho: {e}"}
+                                  for comando in lote[len(resultados):])
+            continuar = not self.detener_en_error
+
+        for resultado in resultados:
+            self.total += 1
+            if not resultado['ok']:
+                self.errores += 1
+            self.salida.write(json.dumps({'n': self.total, **resultado}, ensure_ascii=False, default=str) + "\n")
+        self.salida.flush()
+        return continuar
+
+    def _ejecutar_comando(self, comando: Dict[str, Any]) -> Dict[str, Any]:
+        operacion = comando.get('op')
+        inicio = time.perf_counter()
+        resultado: Dict[str, Any] = {'op': operacion}
+        if comando.get('id') is not None:
+            resultado['id'] = comando['id']
+        try:
+            if '_error' in comando:
+                raise ValueError(comando['_error'])
+            if operacion not in COMANDOS:
+                raise ValueError(f"Operación desconocida: {operacion}")
+            self.sistema.punto_guardado()
+            try:
+                resultado['resultado'] = COMANDOS[operacion](self.sistema, comando)
+            except Exception:
+                self.sistema.volver_a_punto_guardado()
+                raise
+            resultado['ok'] = True
+        except Exception as e:
+            resultado['ok'] = False
+            resultado['error'] = str(e)
+        segundos = time.perf_counter() - inicio
+        resultado['ms'] = round(segundos * 1000, 3)
+        estadistica = self.por_operacion[operacion or '?']
+        estadistica[0] += 1
+        estadistica[1] += segundos
+        return resultado
+
+    def _resumen(self, segundos: float) -> Dict[str, Any]:
+        return {
+            'comandos': self.total,
+            'correctos': self.total - self.errores,
+            'errores': self.errores,
+            'segundos': round(segundos, 3),
+            'comandos_por_segundo': round(self.total / segundos, 1) if segundos > 0 else None,
+            'por_operacion': {
+                operacion: {'comandos': n, 'ms_medio': round(1000 * total / n, 3)}
+                for operacion, (n, total) in self.por_operacion.items()
+            },
+        }
+
+
+def ejecutar_lote(sistema, ruta: str, formato: Optional[str] = None, tam_lote: int = 500,
+                  ruta_resultados: Optional[str] = None, detener_en_error: bool = False) -> Dict[str, Any]:
+    """Lee los comandos de `ruta` ('-' para stdin), los ejecuta y devuelve el resumen"""
+    if formato is None:
+        formato = 'csv' if ruta.lower().endswith('.csv') else 'jsonl'
+    fuente = sys.stdin if ruta == '-' else open(ruta, encoding='utf-8', newline='')
+    salida = sys.stdout if ruta_resultados in (None, '-') else open(ruta_resultados, 'w', encoding='utf-8')
+    try:
+        ejecutor = EjecutorLotes(sistema, tam_lote, salida, detener_en_error)
+        resumen = ejecutor.ejecutar(leer_comandos(fuente, formato))
+    finally:
+        if fuente is not sys.stdin:
+            fuente.close()
+        if salida is not sys.stdout:
+            salida.close()
+    logging.info(f"Lote terminado: {json.dumps(resumen, ensure_ascii=False)}")
+    return resumen
@@ -1,13 +1,27 @@
+import time
+
+INICIO = time.perf_counter()
+
+import argparse
+import importlib
 from textual.app import App, ComposeResult
 from textual.widgets import Header, Footer
 from textual.binding import Binding
-from screens.libros import LibrosScreen
-from screens.autores import AutoresScreen
-from screens.categorias import CategoriasScreen
-from screens.clientes import ClientesScreen
-from screens.ventas import VentasScreen
-from screens.resenas import ResenasScreen
-from screens.estadisticas import EstadisticasScreen
+from utils.arranque import PerfilArranque, importar, precalentar
+
+FIN_IMPORTACIONES = time.perf_counter()
+
+# Pantallas por nombre: el módulo (y con él sus controladores) se importa al abrirla
+PANTALLAS = {
+    "libros": ("screens.libros", "LibrosScreen"),
+    "autores": ("screens.autores", "AutoresScreen"),
+    "categorias": ("screens.categorias", "CategoriasScreen"),
+    "clientes": ("screens.clientes", "ClientesScreen"),
+    "ventas": ("screens.ventas", "VentasScreen"),
+    "resenas": ("screens.resenas", "ResenasScreen"),
+    "estadisticas": ("screens.estadisticas", "EstadisticasScreen"),
+}
+
 
 class BibliotecaApp(App):
     CSS_PATH = "styles.css"
@@ -22,29 +36,67 @@ class BibliotecaApp(App):
         Binding("q", "quit", "Salir"),
     ]
 
+    def __init__(self, precalentar: bool = False, perfil: PerfilArranque = None):
+        super().__init__()
+        self.precalentado = precalentar
+        self.perfil = perfil
+
     def on_mount(self) -> None:
-        self.push_screen("libros")
+        self.action_libros()
+
+    def on_ready(self) -> None:
+        if self.perfil is not None:
+            self.perfil.marcar("primer pintado")
+            self.exit()
+        elif self.precalentado:
+            # Módulos de las demás pantallas, importados mientras se usa la primera
+            precalentar(modulo for modulo, _ in PANTALLAS.values())
+
+    def abrir_pantalla(self, nombre: str) -> None:
+        modulo, clase = PANTALLAS[nombre]
+        pantalla = getattr(importlib.import_module(modulo), clase)
+        self.push_screen(pantalla())
 
     def action_libros(self) -> None:
-        self.push_screen(LibrosScreen(), name="libros")
+        self.abrir_pantalla("libros")
 
     def action_autores(self) -> None:
-        self.push_screen(AutoresScreen(), name="autores")
+        self.abrir_pantalla("autores")
 
     def action_categorias(self) -> None:
-        self.push_screen(CategoriasScreen(), name="categorias")
+        self.abrir_pantalla("categorias")
 
     def action_clientes(self) -> None:
-        self.push_screen(ClientesScreen(), name="clientes")
+        self.abrir_pantalla("clientes")
 
     def action_ventas(self) -> None:
-        self.push_screen(VentasScreen(), name="ventas")
+        self.abrir_pantalla("ventas")
 
     def action_resenas(self) -> None:
-        self.push_screen(ResenasScreen(), name="resenas")
+        self.abrir_pantalla("resenas")
 
     def action_estadisticas(self) -> None:
-        self.push_screen(EstadisticasScreen(), name="estadisticas")
+        self.abrir_pantalla("estadisticas")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Interfaz de la librería')
+    parser.add_argument("--precalentar", action="store_true",
+                        help="Importa las demás pantallas en segundo plano tras el primer pintado")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Arranca hasta el primer pintado, muestra los tiempos y termina")
+    args = parser.parse_args()
+
+    if not args.startup_profile:
+        BibliotecaApp(precalentar=args.precalentar).run()
+        return
+
+    perfil = PerfilArranque(INICIO)
+    perfil.marcar("importaciones de main.py", FIN_IMPORTACIONES)
+    BibliotecaApp(perfil=perfil).run()
+    importar((modulo for modulo, _ in PANTALLAS.values()), perfil)
+    perfil.informe()
+
 
 if __name__ == "__main__":
-    BibliotecaApp().run()
+    main()
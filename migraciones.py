@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+"""
+migraciones.py – Migraciones de esquema versionadas.
+
+libreria.sql crea la base de datos desde cero; una base ya en uso se pone
+al día aplicando las migraciones de MIGRACIONES en orden de versión. Cada
+una queda registrada en schema_migraciones con la suma de comprobación de
+sus pasos, de modo que `estado` muestra qué falta y avisa si una migración
+aplicada ha cambiado después. La base creada antes de este registro es la
+versión 0.
+
+Las migraciones se aplican en caliente:
+  - los índices se crean y se borran con ALGORITHM=INPLACE, LOCK=NONE, así
+    que InnoDB los construye sin bloquear lecturas ni escrituras; las
+    columnas nuevas dejan elegir a MySQL (INSTANT cuando la versión lo
+    permite) y las restricciones CHECK sí copian la tabla para validarla;
+  - cada paso comprueba en information_schema si ya está hecho (o usa
+    IF NOT EXISTS): el DDL de MySQL no es transaccional y una migración
+    interrumpida se termina simplemente volviéndola a lanzar; una base
+    creada con la libreria.sql actual, que ya lo incluye todo, solo
+    registra las versiones;
+  - triggers y procedimientos se borran y se vuelven a crear (MySQL no
+    tiene CREATE OR REPLACE para ellos): entre ambas sentencias hay un
+    instante sin el trigger;
+  - GET_LOCK impide que dos procesos migren la misma base a la vez.
+
+Uso:
+  python migraciones.py estado
+  python migraciones.py aplicar [--hasta 1]
+  python migraciones.py revertir --hasta 0
+"""
+
+import argparse
+import hashlib
+import logging
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import mysql.connector
+
+import arbol_categorias
+from config import DB_CONFIG
+
+NOMBRE_BLOQUEO = 'libreria.migraciones'
+
+SQL_REGISTRO = """
+CREATE TABLE IF NOT EXISTS schema_migraciones (
+    version         INT PRIMARY KEY,
+    nombre          VARCHAR(100) NOT NULL,
+    checksum        CHAR(40) NOT NULL,
+    aplicada_en     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duracion_ms     INT NOT NULL
+)
+"""
+
+
+class Paso(ABC):
+    """Cambio de esquema idempotente: aplicar() y revertir() no fallan si ya están hechos"""
+
+    @abstractmethod
+    def aplicar(self, cursor):
+        """Hace el cambio si aún no está hecho"""
+
+    @abstractmethod
+    def revertir(self, cursor):
+        """Deshace el cambio si está hecho"""
+
+    @abstractmethod
+    def descripcion(self) -> str:
+        """Texto del paso; entra en la suma de comprobación de la migración"""
+
+
+class Sql(Paso):
+    """Sentencias SQL sueltas; `abajo` es opcional (sin él la migración no se puede revertir)"""
+
+    def __init__(self, arriba: str, abajo: Optional[str] = None):
+        self.arriba = arriba
+        self.abajo = abajo
+
+    def aplicar(self, cursor):
+        cursor.execute(self.arriba)
+
+    def revertir(self, cursor):
+        if self.abajo is None:
+            raise RuntimeError(f"Paso sin reversión: {self.arriba.strip()[:60]}")
+        cursor.execute(self.abajo)
+
+    def descripcion(self) -> str:
+        return f"SQL {self.arriba.strip()} / {(self.abajo or '').strip()}"
+
+
+class Indice(Paso):
+    """Índice secundario creado y borrado sin bloquear la tabla"""
+
+    def __init__(self, tabla: str, nombre: str, columnas: Sequence[str], unico: bool = False):
+        self.tabla = tabla
+        self.nombre = nombre
+        self.columnas = tuple(columnas)
+        self.unico = unico
+
+    def existe(self, cursor) -> bool:
+        cursor.execute("SELECT 1 FROM information_schema.statistics "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+                       (self.tabla, self.nombre))
+        return cursor.fetchone() is not None
+
+    def aplicar(self, cursor):
+        if self.existe(cursor):
+            return
+        columnas = ", ".join(f"`{c}`" for c in self.columnas)
+        tipo = "UNIQUE INDEX" if self.unico else "INDEX"
+        cursor.execute(f"ALTER TABLE `{self.tabla}` ADD {tipo} `{self.nombre}` ({columnas}), "
+                       f"ALGORITHM=INPLACE, LOCK=NONE")
+
+    def revertir(self, cursor):
+        if not self.existe(cursor):
+            return
+        sustituto = ""
+        if self._sostiene_clave_foranea(cursor):
+            # InnoDB no deja borrar el único índice que cubre una clave foránea
+            # (error 1553): se deja en su lugar uno simple sobre la columna
+            columna = self.columnas[0]
+            sustituto = f", ADD INDEX `{columna}` (`{columna}`)"
+        cursor.execute(f"ALTER TABLE `{self.tabla}` DROP INDEX `{self.nombre}`{sustituto}, "
+                       f"ALGORITHM=INPLACE, LOCK=NONE")
+
+    def _sostiene_clave_foranea(self, cursor) -> bool:
+        columna = self.columnas[0]
+        cursor.execute("SELECT 1 FROM information_schema.key_column_usage "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s "
+                       "AND referenced_table_name IS NOT NULL LIMIT 1", (self.tabla, columna))
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute("SELECT 1 FROM information_schema.statistics "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s "
+                       "AND seq_in_index = 1 AND index_name <> %s LIMIT 1", (self.tabla, columna, self.nombre))
+        return cursor.fetchone() is None
+
+    def descripcion(self) -> str:
+        tipo = "UNIQUE INDEX" if self.unico else "INDEX"
+        return f"{tipo} {self.tabla}.{self.nombre} ({', '.join(self.columnas)})"
+
+
+class Columna(Paso):
+    """Columna nueva; el algoritmo lo elige MySQL (INSTANT si la versión lo admite)"""
+
+    def __init__(self, tabla: str, nombre: str, definicion: str):
+        self.tabla = tabla
+        self.nombre = nombre
+        self.definicion = definicion
+
+    def existe(self, cursor) -> bool:
+        cursor.execute("SELECT 1 FROM information_schema.columns "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+                       (self.tabla, self.nombre))
+        return cursor.fetchone() is not None
+
+    def aplicar(self, cursor):
+        if not self.existe(cursor):
+            cursor.execute(f"ALTER TABLE `{self.tabla}` ADD COLUMN `{self.nombre}` {self.definicion}")
+
+    def revertir(self, cursor):
+        if self.existe(cursor):
+            cursor.execute(f"ALTER TABLE `{self.tabla}` DROP COLUMN `{self.nombre}`")
+
+    def descripcion(self) -> str:
+        return f"COLUMN {self.tabla}.{self.nombre} {self.definicion}"
+
+
+class Restriccion(Paso):
+    """Restricción CHECK con nombre; al añadirla MySQL valida (y copia) la tabla entera"""
+
+    def __init__(self, tabla: str, nombre: str, condicion: str):
+        self.tabla = tabla
+        self.nombre = nombre
+        self.condicion = condicion
+
+    def existe(self, cursor) -> bool:
+        cursor.execute("SELECT 1 FROM information_schema.table_constraints "
+                       "WHERE constraint_schema = DATABASE() AND table_name = %s AND constraint_name = %s "
+                       "AND constraint_type = 'CHECK' LIMIT 1", (self.tabla, self.nombre))
+        return cursor.fetchone() is not None
+
+    def aplicar(self, cursor):
+        if not self.existe(cursor):
+            cursor.execute(f"ALTER TABLE `{self.tabla}` ADD CONSTRAINT `{self.nombre}` CHECK ({self.condicion})")
+
+    def revertir(self, cursor):
+        if self.existe(cursor):
+            cursor.execute(f"ALTER TABLE `{self.tabla}` DROP CHECK `{self.nombre}`")
+
+    def descripcion(self) -> str:
+        return f"CHECK {self.tabla}.{self.nombre} ({self.condicion})"
+
+
+class Rutina(Paso):
+    """
+    Trigger o procedimiento almacenado: se borra y se crea con `definicion`.
+
+    Al revertir se vuelve a crear `anterior` (la versión previa) o, si no
+    se indica, solo se borra.
+    """
+
+    TIPOS = ('TRIGGER', 'PROCEDURE')
+
+    def __init__(self, tipo: str, nombre: str, definicion: str, anterior: Optional[str] = None):
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de rutina desconocido: {tipo}")
+        self.tipo = tipo
+        self.nombre = nombre
+        self.definicion = definicion
+        self.anterior = anterior
+
+    def aplicar(self, cursor):
+        cursor.execute(f"DROP {self.tipo} IF EXISTS `{self.nombre}`")
+        cursor.execute(self.definicion)
+
+    def revertir(self, cursor):
+        cursor.execute(f"DROP {self.tipo} IF EXISTS `{self.nombre}`")
+        if self.anterior is not None:
+            cursor.execute(self.anterior)
+
+    def descripcion(self) -> str:
+        return f"{self.tipo} {self.nombre} {self.definicion.strip()} / {(self.anterior or '').strip()}"
+
+
+class Funcion(Paso):
+    """Paso de datos en Python: `funcion(cursor)` debe poder repetirse; `deshacer` es opcional"""
+
+    def __init__(self, funcion: Callable, deshacer: Optional[Callable] = None):
+        self.funcion = funcion
+        self.deshacer = deshacer
+
+    def aplicar(self, cursor):
+        self.funcion(cursor)
+
+    def revertir(self, cursor):
+        if self.deshacer is not None:
+            self.deshacer(cursor)
+
+    def descripcion(self) -> str:
+        nombre = lambda f: f"{f.__module__}.{f.__qualname__}" if f else ""
+        return f"PY {nombre(self.funcion)} / {nombre(self.deshacer)}"
+
+
+class Migracion:
+    def __init__(self, version: int, nombre: str, pasos: List[Paso]):
+        self.version = version
+        self.nombre = nombre
+        self.pasos = pasos
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha1("\n".join(p.descripcion() for p in self.pasos).encode()).hexdigest()
+
+
+# ---------------------------------------------------------------------------- definiciones
+
+SQL_LOG_CAMBIOS = """
+CREATE TABLE IF NOT EXISTS log_cambios (
+    cambio_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tabla VARCHAR(30) NOT NULL,
+    operacion ENUM('INSERT', 'UPDATE', 'DELETE') NOT NULL,
+    clave INT NOT NULL,
+    fecha_cambio TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_log_cambios_tabla (tabla, cambio_id)
+)
+"""
+
+# Tabla del change-data feed -> columna de la clave (triggers cambios_<tabla>_<operacion>)
+CLAVES_CAMBIOS = (('libros', 'libro_id'), ('autores', 'autor_id'), ('categorias', 'categoria_id'),
+                  ('clientes', 'cliente_id'), ('ventas', 'venta_id'), ('resenas', 'resena_id'))
+
+# Relaciones de libros: registran el libro_id como clave
+CLAVES_CAMBIOS_ENLACES = (('libro_autor', 'libro_id'), ('libro_categoria', 'libro_id'))
+
+
+def _triggers_cambios(claves=CLAVES_CAMBIOS) -> List[Paso]:
+    pasos = []
+    for tabla, clave in claves:
+        for operacion, fila in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            nombre = f"cambios_{tabla}_{operacion.lower()}"
+            pasos.append(Rutina('TRIGGER', nombre,
+                                f"CREATE TRIGGER {nombre} AFTER {operacion} ON {tabla} FOR EACH ROW "
+                                f"INSERT INTO log_cambios (tabla, operacion, clave) "
+                                f"VALUES ('{tabla}', '{operacion}', {fila}.{clave})"))
+    return pasos
+
+
+SQL_ACTUALIZAR_STOCK_0 = """
+CREATE PROCEDURE actualizar_stock(IN p_libro_id INT, IN p_cantidad INT)
+BEGIN
+    UPDATE libros SET stock = stock + p_cantidad WHERE libro_id = p_libro_id;
+    IF (SELECT stock FROM libros WHERE libro_id = p_libro_id) < 5 THEN
+        INSERT INTO log_eventos (tipo, mensaje)
+        VALUES ('stock_bajo', CONCAT('Stock bajo para libro ID: ', p_libro_id, '. Stock actual: ',
+                (SELECT stock FROM libros WHERE libro_id = p_libro_id)));
+    END IF;
+END
+"""
+
+SQL_ACTUALIZAR_STOCK = """
+CREATE PROCEDURE actualizar_stock(IN p_libro_id INT, IN p_cantidad INT)
+BEGIN
+    DECLARE v_stock INT;
+
+    UPDATE libros SET stock = stock + p_cantidad WHERE libro_id = p_libro_id;
+    SELECT stock INTO v_stock FROM libros WHERE libro_id = p_libro_id;
+    IF v_stock < 5 THEN
+        INSERT INTO log_eventos (tipo, clave, mensaje, ventana_inicio)
+        VALUES ('stock_bajo', CONCAT('libro:', p_libro_id),
+                CONCAT('Stock bajo para libro ID: ', p_libro_id, '. Stock actual: ', v_stock),
+                FROM_UNIXTIME(UNIX_TIMESTAMP() DIV 300 * 300))
+        ON DUPLICATE KEY UPDATE ocurrencias = ocurrencias + 1, mensaje = VALUES(mensaje),
+                                ultima_fecha = CURRENT_TIMESTAMP;
+    END IF;
+END
+"""
+
+SQL_CLIENTE_ELIMINADO_0 = """
+CREATE TRIGGER after_cliente_delete AFTER DELETE ON clientes FOR EACH ROW
+BEGIN
+    INSERT INTO log_table(entidad, descripcion)
+    VALUES ('cliente', CONCAT('Se eliminó cliente ID: ', OLD.cliente_id, ' - ', OLD.nombre, ' ', OLD.apellido));
+END
+"""
+
+SQL_CLIENTE_ELIMINADO = """
+CREATE TRIGGER after_cliente_delete AFTER DELETE ON clientes FOR EACH ROW
+BEGIN
+    INSERT INTO log_eventos (tipo, clave, mensaje)
+    VALUES ('cliente_eliminado', CONCAT('cliente:', OLD.cliente_id),
+            CONCAT('Se eliminó cliente ID: ', OLD.cliente_id, ' - ', OLD.nombre, ' ', OLD.apellido));
+END
+"""
+
+SQL_RESERVAS_STOCK = """
+CREATE TABLE IF NOT EXISTS reservas_stock (
+    reserva_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    carrito VARCHAR(64) NOT NULL,
+    libro_id INT NOT NULL,
+    cantidad INT NOT NULL CHECK (cantidad > 0),
+    expira_en DATETIME(3) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_reservas_carrito (carrito),
+    INDEX idx_reservas_expira (expira_en),
+    FOREIGN KEY (libro_id) REFERENCES libros(libro_id) ON DELETE CASCADE
+)
+"""
+
+SQL_VENTA_INSERTADA_0 = """
+CREATE TRIGGER after_venta_insert AFTER INSERT ON detalles_venta FOR EACH ROW
+BEGIN
+    UPDATE libros SET stock = stock - NEW.cantidad WHERE libro_id = NEW.libro_id;
+    IF (SELECT stock FROM libros WHERE libro_id = NEW.libro_id) < 5 THEN
+        INSERT INTO log_eventos (tipo, mensaje)
+        VALUES ('stock_bajo', CONCAT('Stock bajo para libro ID: ', NEW.libro_id,
+                '. Stock actual: ', (SELECT stock FROM libros WHERE libro_id = NEW.libro_id)));
+    END IF;
+END
+"""
+
+SQL_VENTA_INSERTADA = """
+CREATE TRIGGER after_venta_insert AFTER INSERT ON detalles_venta FOR EACH ROW
+BEGIN
+    DECLARE v_stock INT;
+
+    UPDATE libros SET stock = stock - NEW.cantidad
+    WHERE libro_id = NEW.libro_id AND stock - stock_reservado >= NEW.cantidad;
+    IF ROW_COUNT() = 0 AND NEW.cantidad > 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Stock insuficiente para el libro';
+    END IF;
+
+    SELECT stock INTO v_stock FROM libros WHERE libro_id = NEW.libro_id;
+    IF v_stock < 5 THEN
+        INSERT INTO log_eventos (tipo, clave, mensaje, ventana_inicio)
+        VALUES ('stock_bajo', CONCAT('libro:', NEW.libro_id),
+                CONCAT('Stock bajo para libro ID: ', NEW.libro_id, '. Stock actual: ', v_stock),
+                FROM_UNIXTIME(UNIX_TIMESTAMP() DIV 300 * 300))
+        ON DUPLICATE KEY UPDATE ocurrencias = ocurrencias + 1, mensaje = VALUES(mensaje),
+                                ultima_fecha = CURRENT_TIMESTAMP;
+    END IF;
+END
+"""
+
+SQL_CATEGORIAS_CIERRE = """
+CREATE TABLE IF NOT EXISTS categorias_cierre (
+    ancestro_id INT NOT NULL,
+    descendiente_id INT NOT NULL,
+    profundidad INT NOT NULL,
+    PRIMARY KEY (ancestro_id, descendiente_id),
+    INDEX idx_cierre_descendiente (descendiente_id, profundidad),
+    FOREIGN KEY (ancestro_id) REFERENCES categorias(categoria_id) ON DELETE CASCADE,
+    FOREIGN KEY (descendiente_id) REFERENCES categorias(categoria_id) ON DELETE CASCADE
+)
+"""
+
+SQL_RANKING_VENTAS_AUTORES = """
+CREATE PROCEDURE ranking_ventas_autores(IN p_desde DATETIME, IN p_hasta DATETIME,
+                                        IN p_limite INT, IN p_desplazamiento INT)
+BEGIN
+    SELECT a.autor_id, CONCAT(a.nombre, ' ', a.apellido) AS autor,
+           SUM(l.unidades) AS unidades, SUM(l.importe) AS total_ventas
+    FROM (
+        SELECT dv.libro_id, SUM(dv.cantidad) AS unidades, SUM(dv.cantidad * dv.precio_unitario) AS importe
+        FROM detalles_venta dv
+        JOIN ventas v ON v.venta_id = dv.venta_id
+        WHERE (p_desde IS NULL OR v.fecha_venta >= p_desde)
+          AND (p_hasta IS NULL OR v.fecha_venta < p_hasta)
+        GROUP BY dv.libro_id
+    ) AS l
+    JOIN libro_autor la ON la.libro_id = l.libro_id
+    JOIN autores a ON a.autor_id = la.autor_id
+    GROUP BY a.autor_id
+    ORDER BY total_ventas DESC, a.autor_id
+    LIMIT p_limite OFFSET p_desplazamiento;
+END
+"""
+
+
+MIGRACIONES: List[Migracion] = [
+    # Búsquedas inversas de las tablas de relación y de las claves foráneas. InnoDB
+    # ya crea un índice simple para cada clave foránea; estos lo sustituyen por uno
+    # compuesto que además cubre la consulta (las columnas de la clave primaria van
+    # incluidas en todo índice secundario) o la ordenación por fecha.
+    Migracion(1, 'indices_relaciones', [
+        # Libros de un autor / de una categoría (la clave primaria empieza por libro_id)
+        Indice('libro_autor', 'idx_libro_autor_autor', ('autor_id', 'libro_id')),
+        Indice('libro_categoria', 'idx_libro_categoria_categoria', ('categoria_id', 'libro_id')),
+        # Ventas por libro y por autor (total_ventas_autor, ventas_autores.py) sin leer la fila
+        Indice('detalles_venta', 'idx_detalles_libro', ('libro_id', 'cantidad', 'precio_unitario')),
+        # Líneas de una venta y cestas de recomendaciones.py
+        Indice('detalles_venta', 'idx_detalles_venta', ('venta_id', 'libro_id')),
+        # Reseñas de un libro ORDER BY fecha_resena DESC sin filesort
+        Indice('resenas', 'idx_resenas_libro_fecha', ('libro_id', 'fecha_resena')),
+        # Historial de compras de un cliente por fecha
+        Indice('ventas', 'idx_ventas_cliente_fecha', ('cliente_id', 'fecha_venta')),
+    ]),
+    # Hashes de la importación incremental (import_books.py --modo incremental)
+    Migracion(2, 'hashes_importacion', [
+        Columna('libros', 'hash_contenido', 'CHAR(40)'),
+        Columna('libros', 'hash_enlaces', 'CHAR(40)'),
+    ]),
+    # Change-data feed que lee feed_cambios.py
+    Migracion(3, 'log_cambios', [
+        Sql(SQL_LOG_CAMBIOS, "DROP TABLE IF EXISTS log_cambios"),
+        *_triggers_cambios(),
+    ]),
+    # Agrupación de eventos repetidos por (tipo, clave, ventana) (eventos.py)
+    Migracion(4, 'log_eventos_agrupados', [
+        Columna('log_eventos', 'clave', 'VARCHAR(100)'),
+        Columna('log_eventos', 'ocurrencias', 'INT NOT NULL DEFAULT 1'),
+        Columna('log_eventos', 'ventana_inicio', 'DATETIME'),
+        Columna('log_eventos', 'ultima_fecha', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'),
+        Indice('log_eventos', 'idx_log_eventos_agrupacion', ('tipo', 'clave', 'ventana_inicio'), unico=True),
+        Indice('log_eventos', 'idx_log_eventos_tipo_fecha', ('tipo', 'fecha_evento')),
+        Indice('log_eventos', 'idx_log_eventos_fecha', ('fecha_evento',)),
+        Rutina('PROCEDURE', 'actualizar_stock', SQL_ACTUALIZAR_STOCK, SQL_ACTUALIZAR_STOCK_0),
+        Rutina('TRIGGER', 'after_cliente_delete', SQL_CLIENTE_ELIMINADO, SQL_CLIENTE_ELIMINADO_0),
+    ]),
+    # Reservas de stock (reservas_stock.py); after_venta_insert deja de vender lo
+    # reservado y registra el stock bajo con la agrupación de la migración 4
+    Migracion(5, 'reservas_stock', [
+        Columna('libros', 'stock_reservado', 'INT NOT NULL DEFAULT 0'),
+        Restriccion('libros', 'chk_libros_stock', 'stock >= 0'),
+        Restriccion('libros', 'chk_libros_stock_reservado', 'stock_reservado >= 0'),
+        Sql(SQL_RESERVAS_STOCK, "DROP TABLE IF EXISTS reservas_stock"),
+        Rutina('TRIGGER', 'after_venta_insert', SQL_VENTA_INSERTADA, SQL_VENTA_INSERTADA_0),
+    ]),
+    # Tabla de cierre de la jerarquía de categorías, rellenada desde categoria_padre_id
+    Migracion(6, 'categorias_cierre', [
+        Sql(SQL_CATEGORIAS_CIERRE, "DROP TABLE IF EXISTS categorias_cierre"),
+        Funcion(arbol_categorias.reconstruir),
+    ]),
+    # Clasificación de ventas de todos los autores en una pasada
+    Migracion(7, 'ranking_ventas_autores', [
+        Rutina('PROCEDURE', 'ranking_ventas_autores', SQL_RANKING_VENTAS_AUTORES),
+    ]),
+    # Cambios de autoría o de categorías de un libro en el change-data feed
+    Migracion(8, 'log_cambios_enlaces', _triggers_cambios(CLAVES_CAMBIOS_ENLACES)),
+]
+
+
+class Migrador:
+    """Aplica y revierte MIGRACIONES sobre una base de datos"""
+
+    def __init__(self, conexion: Optional[Dict[str, Any]] = None,
+                 migraciones: Sequence[Migracion] = MIGRACIONES, espera_bloqueo: int = 30):
+        self.conexion = conexion or DB_CONFIG
+        self.migraciones = sorted(migraciones, key=lambda m: m.version)
+        self.espera_bloqueo = espera_bloqueo
+
+    def _conectar(self):
+        conn = mysql.connector.connect(autocommit=True, **self.conexion)
+        cursor = conn.cursor()
+        cursor.execute(SQL_REGISTRO)
+        return conn, cursor
+
+    @staticmethod
+    def _aplicadas(cursor) -> Dict[int, Tuple[str, Any]]:
+        cursor.execute("SELECT version, checksum, aplicada_en FROM schema_migraciones")
+        return {version: (checksum, aplicada_en) for version, checksum, aplicada_en in cursor.fetchall()}
+
+    def estado(self) -> List[Tuple[int, str, Any, bool]]:
+        """(version, nombre, aplicada_en o None, checksum coincide) de cada migración"""
+        conn, cursor = self._conectar()
+        try:
+            aplicadas = self._aplicadas(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+        estado = []
+        for migracion in self.migraciones:
+            checksum, aplicada_en = aplicadas.get(migracion.version, (None, None))
+            estado.append((migracion.version, migracion.nombre, aplicada_en,
+                           checksum is None or checksum == migracion.checksum))
+        return estado
+
+    def version(self) -> int:
+        """Versión más alta aplicada (0 si ninguna)"""
+        return max((v for v, _, aplicada_en, _ in self.estado() if aplicada_en is not None), default=0)
+
+    def aplicar(self, hasta: Optional[int] = None) -> List[int]:
+        """Aplica las migraciones pendientes hasta `hasta` (todas si no se indica)"""
+        conn, cursor = self._conectar()
+        hechas = []
+        try:
+            self._bloquear(cursor)
+            try:
+                aplicadas = self._aplicadas(cursor)
+                for migracion in self.migraciones:
+                    if migracion.version in aplicadas or (hasta is not None and migracion.version > hasta):
+                        continue
+                    inicio = time.perf_counter()
+                    for paso in migracion.pasos:
+                        logging.info(f"Migración {migracion.version}: {paso.descripcion()}")
+                        paso.aplicar(cursor)
+                    duracion = int((time.perf_counter() - inicio) * 1000)
+                    cursor.execute("INSERT INTO schema_migraciones (version, nombre, checksum, duracion_ms) "
+                                   "VALUES (%s, %s, %s, %s)",
+                                   (migracion.version, migracion.nombre, migracion.checksum, duracion))
+                    logging.info(f"Migración {migracion.version} ({migracion.nombre}) aplicada en {duracion} ms")
+                    hechas.append(migracion.version)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (NOMBRE_BLOQUEO,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return hechas
+
+    def revertir(self, hasta: int) -> List[int]:
+        """Revierte, de la más reciente a la más antigua, las migraciones con versión mayor que `hasta`"""
+        conn, cursor = self._conectar()
+        deshechas = []
+        try:
+            self._bloquear(cursor)
+            try:
+                aplicadas = self._aplicadas(cursor)
+                for migracion in reversed(self.migraciones):
+                    if migracion.version <= hasta or migracion.version not in aplicadas:
+                        continue
+                    for paso in reversed(migracion.pasos):
+                        logging.info(f"Revirtiendo migración {migracion.version}: {paso.descripcion()}")
+                        paso.revertir(cursor)
+                    cursor.execute("DELETE FROM schema_migraciones WHERE version = %s", (migracion.version,))
+                    logging.info(f"Migración {migracion.version} ({migracion.nombre}) revertida")
+                    deshechas.append(migracion.version)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (NOMBRE_BLOQUEO,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        return deshechas
+
+    def _bloquear(self, cursor):
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (NOMBRE_BLOQUEO, self.espera_bloqueo))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Otro proceso está migrando la base de datos")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Migraciones de esquema de la librería')
+    parser.add_argument("accion", choices=('estado', 'aplicar', 'revertir'), help="Acción a realizar")
+    parser.add_argument("--hasta", type=int, default=None, help="Versión objetivo")
+    parser.add_argument("--host", default=DB_CONFIG.get('host', 'localhost'), help="Host de la base de datos")
+    parser.add_argument("--port", type=int, default=DB_CONFIG.get('port', 3306), help="Puerto de MySQL")
+    parser.add_argument("--user", default=DB_CONFIG.get('user'), help="Usuario de la base de datos")
+    parser.add_argument("--password", default=DB_CONFIG.get('password'), help="Contraseña de la base de datos")
+    parser.add_argument("--database", default=DB_CONFIG.get('database', 'libreria'), help="Nombre de la base de datos")
+    args = parser.parse_args()
+
+    migrador = Migrador({'host': args.host, 'port': args.port, 'user': args.user,
+                         'password': args.password, 'database': args.database})
+    try:
+        if args.accion == 'estado':
+            for version, nombre, aplicada_en, coincide in migrador.estado():
+                marca = aplicada_en.strftime('%Y-%m-%d %H:%M:%S') if aplicada_en else "pendiente"
+                aviso = "" if coincide else "  (¡modificada después de aplicarse!)"
+                print(f"{version:>5}  {nombre:<30} {marca}{aviso}")
+        elif args.accion == 'aplicar':
+            hechas = migrador.aplicar(args.hasta)
+            print(f"Aplicadas: {', '.join(map(str, hechas)) or 'ninguna'}")
+        else:
+            if args.hasta is None:
+                parser.error("revertir requiere --hasta")
+            deshechas = migrador.revertir(args.hasta)
+            print(f"Revertidas: {', '.join(map(str, deshechas)) or 'ninguna'}")
+    except (mysql.connector.Error, RuntimeError) as err:
+        logging.error(f"Error de migración: {err}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,58 @@
-class Libro:
+from operator import itemgetter
+
+
+class Modelo:
+    """
+    Base de los modelos: atributos en __slots__ e hidratación rápida desde filas.
+
+    CAMPOS define el orden de los argumentos de __init__ y de los slots.
+    from_rows resuelve una sola vez por resultado la posición de cada campo
+    en las columnas del cursor y construye todos los objetos con un
+    itemgetter, sin pasar por diccionarios intermedios.
+    """
+    __slots__ = ()
+    CAMPOS = ()
+
+    @classmethod
+    def from_row(cls, row, columnas=None):
+        """Construye un modelo desde una fila (diccionario, o tupla con sus columnas)"""
+        if row is None:
+            return None
+        return cls.from_rows((row,), columnas)[0]
+
+    @classmethod
+    def from_rows(cls, rows, columnas=None):
+        """Construye una lista de modelos desde filas de un mismo resultado"""
+        if columnas is None:
+            # Filas de cursor(dictionary=True)
+            campos = cls.CAMPOS
+            return [cls(*[row.get(campo) for campo in campos]) for row in rows]
+
+        indices = {columna: i for i, columna in enumerate(columnas)}
+        posiciones = [indices.get(campo) for campo in cls.CAMPOS]
+        if None in posiciones:
+            return [cls(*[row[p] if p is not None else None for p in posiciones]) for row in rows]
+        if len(posiciones) == 1:
+            return [cls(row[posiciones[0]]) for row in rows]
+        obtener = itemgetter(*posiciones)
+        return [cls(*obtener(row)) for row in rows]
+
+    def to_dict(self):
+        """Devuelve los campos del modelo como diccionario"""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+
+class Libro(Modelo):
+    CAMPOS = ('libro_id', 'titulo', 'subtitulo', 'isbn', 'fecha_publicacion', 'edicion',
+              'editorial', 'precio', 'stock', 'descripcion', 'num_paginas', 'idioma',
+              'calificacion', 'imagen_portada', 'formato', 'autores', 'categorias')
+    __slots__ = CAMPOS
+
     def __init__(self, libro_id=None, titulo=None, subtitulo=None, isbn=None, 
                  fecha_publicacion=None, edicion=None, editorial=None, precio=None, 
                  stock=None, descripcion=None, num_paginas=None, idioma=None, 
-                 calificacion=None, imagen_portada=None, formato=None):
+                 calificacion=None, imagen_portada=None, formato=None,
+                 autores=None, categorias=None):
         self.libro_id = libro_id
         self.titulo = titulo
         self.subtitulo = subtitulo
@@ -18,12 +68,19 @@ class Libro:
         self.calificacion = calificacion
         self.imagen_portada = imagen_portada
         self.formato = formato
+        # Columnas agregadas de las vistas (GROUP_CONCAT de autores y categorías)
+        self.autores = autores
+        self.categorias = categorias
     
     def __str__(self):
         return f"{self.titulo} ({self.isbn}) - {self.precio}€"
 
 
-class Autor:
+class Autor(Modelo):
+    CAMPOS = ('autor_id', 'nombre', 'apellido', 'fecha_nacimiento',
+              'fecha_fallecimiento', 'nacionalidad', 'sitio_web')
+    __slots__ = CAMPOS
+
     def __init__(self, autor_id=None, nombre=None, apellido=None, 
                  fecha_nacimiento=None, fecha_fallecimiento=None, 
                  nacionalidad=None, sitio_web=None):
@@ -39,7 +96,10 @@ class Autor:
         return f"{self.nombre} {self.apellido}"
 
 
-class Categoria:
+class Categoria(Modelo):
+    CAMPOS = ('categoria_id', 'nombre', 'categoria_padre_id')
+    __slots__ = CAMPOS
+
     def __init__(self, categoria_id=None, nombre=None, categoria_padre_id=None):
         self.categoria_id = categoria_id
         self.nombre = nombre
@@ -49,7 +109,11 @@ class Categoria:
         return self.nombre
 
 
-class Cliente:
+class Cliente(Modelo):
+    CAMPOS = ('cliente_id', 'nombre', 'apellido', 'email', 'telefono', 'direccion',
+              'ciudad', 'codigo_postal', 'pais', 'fecha_registro')
+    __slots__ = CAMPOS
+
     def __init__(self, cliente_id=None, nombre=None, apellido=None, email=None, 
                  telefono=None, direccion=None, ciudad=None, codigo_postal=None, 
                  pais=None, fecha_registro=None):
@@ -68,7 +132,10 @@ class Cliente:
         return f"{self.nombre} {self.apellido} ({self.email})"
 
 
-class Venta:
+class Venta(Modelo):
+    CAMPOS = ('venta_id', 'cliente_id', 'fecha_venta', 'total', 'metodo_pago', 'estado')
+    __slots__ = CAMPOS + ('detalles',)
+
     def __init__(self, venta_id=None, cliente_id=None, fecha_venta=None, 
                  total=None, metodo_pago=None, estado=None):
         self.venta_id = venta_id
@@ -83,7 +150,10 @@ class Venta:
         return f"Venta #{self.venta_id} - Total: {self.total}€"
 
 
-class DetalleVenta:
+class DetalleVenta(Modelo):
+    CAMPOS = ('detalle_id', 'venta_id', 'libro_id', 'cantidad', 'precio_unitario', 'descuento')
+    __slots__ = CAMPOS
+
     def __init__(self, detalle_id=None, venta_id=None, libro_id=None, 
                  cantidad=None, precio_unitario=None, descuento=None):
         self.detalle_id = detalle_id
@@ -97,7 +167,10 @@ class DetalleVenta:
         return f"Libro ID: {self.libro_id}, Cantidad: {self.cantidad}, Precio: {self.precio_unitario}€"
 
 
-class Resena:
+class Resena(Modelo):
+    CAMPOS = ('resena_id', 'libro_id', 'cliente_id', 'calificacion', 'comentario', 'fecha_resena')
+    __slots__ = CAMPOS
+
     def __init__(self, resena_id=None, libro_id=None, cliente_id=None, 
                  calificacion=None, comentario=None, fecha_resena=None):
         self.resena_id = resena_id
@@ -108,4 +181,42 @@ class Resena:
         self.fecha_resena = fecha_resena
     
     def __str__(self):
-        return f"Calificación: {self.calificacion}/5 - {self.comentario[:50]}..."
\ No newline at end of file
+        return f"Calificación: {self.calificacion}/5 - {self.comentario[:50]}..."
+
+
+class Cambio(Modelo):
+    """Fila de log_cambios: un INSERT, UPDATE o DELETE sobre una tabla principal"""
+    CAMPOS = ('cambio_id', 'tabla', 'operacion', 'clave', 'fecha_cambio')
+    __slots__ = CAMPOS
+
+    def __init__(self, cambio_id=None, tabla=None, operacion=None, clave=None, fecha_cambio=None):
+        self.cambio_id = cambio_id
+        self.tabla = tabla
+        self.operacion = operacion
+        self.clave = clave
+        self.fecha_cambio = fecha_cambio
+
+    def __str__(self):
+        return f"#{self.cambio_id} {self.operacion} {self.tabla}({self.clave})"
+
+
+class Evento(Modelo):
+    """Fila de log_eventos; las repeticiones agrupadas por clave y ventana suman `ocurrencias`"""
+    CAMPOS = ('evento_id', 'tipo', 'clave', 'mensaje', 'ocurrencias', 'ventana_inicio',
+              'fecha_evento', 'ultima_fecha')
+    __slots__ = CAMPOS
+
+    def __init__(self, evento_id=None, tipo=None, clave=None, mensaje=None, ocurrencias=1,
+                 ventana_inicio=None, fecha_evento=None, ultima_fecha=None):
+        self.evento_id = evento_id
+        self.tipo = tipo
+        self.clave = clave
+        self.mensaje = mensaje
+        self.ocurrencias = ocurrencias
+        self.ventana_inicio = ventana_inicio
+        self.fecha_evento = fecha_evento
+        self.ultima_fecha = ultima_fecha
+
+    def __str__(self):
+        repeticiones = f" (x{self.ocurrencias})" if self.ocurrencias and self.ocurrencias > 1 else ""
+        return f"[{self.fecha_evento}] {self.tipo}: {self.mensaje}{repeticiones}"
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+recomendaciones.py – "Quien compró este libro también compró…" a partir de detalles_venta.
+
+Cada venta es una cesta de libros distintos. La reconstrucción cuenta, para
+cada par de libros, en cuántas cestas aparecen juntos y guarda el resultado
+como una matriz dispersa simétrica en formato CSR sobre array.array:
+  indptr[i]..indptr[i+1]  tramo de la fila i en indices/conteos
+  indices                 posición (densa) del libro vecino
+  conteos                 cestas en las que coinciden
+junto con la frecuencia de cada libro y el número de cestas. Los vecinos de
+un libro son un tramo contiguo de los arrays y se puntúan al vuelo con lift
+(c·N / (fa·fb)) o coseno (c / √(fa·fb)).
+
+La reconstrucción reparte las ventas en rangos de venta_id entre procesos
+(uno por núcleo por defecto), cada uno con su conexión y su cursor sin
+buffer, y fusiona los conteos. Las ventas nuevas se añaden con actualizar():
+van a un delta en memoria que se suma a la matriz al consultar y se compacta
+en una matriz nueva al superar `umbral_compactar` pares. La marca de agua es
+el venta_id hasta el que todo está contado: las ventas ya contadas por
+encima de un hueco se recuerdan aparte, y el hueco (una venta cuyo commit
+llega tarde) solo se salta tras `espera_huecos` segundos sin rellenarse.
+
+Uso:
+  python recomendaciones.py --reconstruir --salida recomendaciones.bin --procesos 8
+  python recomendaciones.py --entrada recomendaciones.bin --libro 42 --metrica coseno
+"""
+
+import argparse
+import heapq
+import logging
+import math
+import os
+import pickle
+import sys
+import threading
+import time
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import mysql.connector
+
+from config import DB_CONFIG
+
+METRICAS = ('lift', 'coseno', 'conteo')
+
+SQL_CESTAS = """
+SELECT d.venta_id, d.libro_id
+FROM detalles_venta d
+WHERE d.venta_id >= %s AND d.venta_id < %s AND d.libro_id IS NOT NULL
+ORDER BY d.venta_id
+"""
+
+# Ventas nuevas con un margen de `retraso` segundos: app.crear_venta inserta la
+# venta y sus detalles en sentencias separadas
+SQL_VENTAS_NUEVAS = """
+SELECT venta_id
+FROM ventas
+WHERE venta_id > %s AND fecha_venta <= NOW() - INTERVAL %s SECOND
+ORDER BY venta_id
+LIMIT %s
+"""
+
+SQL_CESTAS_IDS = """
+SELECT d.venta_id, d.libro_id
+FROM detalles_venta d
+WHERE d.venta_id IN ({marcadores}) AND d.libro_id IS NOT NULL
+ORDER BY d.venta_id
+"""
+
+
+def _clave(a: int, b: int) -> int:
+    return (a << 32) | b if a < b else (b << 32) | a
+
+
+class Contador:
+    """Conteos de cestas, frecuencia por libro y coincidencias por par (clave a<<32|b)"""
+
+    def __init__(self, max_cesta: int = 50):
+        self.max_cesta = max_cesta
+        self.cestas = 0
+        self.marca = 0
+        self.frecuencia: Dict[int, int] = defaultdict(int)
+        self.pares: Dict[int, int] = defaultdict(int)
+
+    def agregar(self, venta_id: int, cesta: Iterable[int]):
+        """Suma una cesta; las de más de `max_cesta` libros cuentan frecuencia pero no pares"""
+        cesta = sorted(set(cesta))
+        self.cestas += 1
+        self.marca = max(self.marca, venta_id)
+        for libro_id in cesta:
+            self.frecuencia[libro_id] += 1
+        if 2 <= len(cesta) <= self.max_cesta:
+            for a, b in combinations(cesta, 2):
+                self.pares[(a << 32) | b] += 1
+
+    def fusionar(self, otro: "Contador"):
+        self.cestas += otro.cestas
+        self.marca = max(self.marca, otro.marca)
+        for libro_id, n in otro.frecuencia.items():
+            self.frecuencia[libro_id] += n
+        for clave, n in otro.pares.items():
+            self.pares[clave] += n
+
+    def leer(self, cursor, lote: int = 10_000):
+        """Consume filas (venta_id, libro_id) ordenadas por venta_id ya ejecutadas en `cursor`"""
+        venta_actual, cesta = None, []
+        while True:
+            filas = cursor.fetchmany(lote)
+            if not filas:
+                break
+            for venta_id, libro_id in filas:
+                if venta_id != venta_actual:
+                    if cesta:
+                        self.agregar(venta_actual, cesta)
+                    venta_actual, cesta = venta_id, []
+                cesta.append(libro_id)
+        if cesta:
+            self.agregar(venta_actual, cesta)
+
+    def __getstate__(self):
+        # defaultdict con lambda no se serializa; se envía como dict simple entre procesos
+        return {'max_cesta': self.max_cesta, 'cestas': self.cestas, 'marca': self.marca,
+                'frecuencia': dict(self.frecuencia), 'pares': dict(self.pares)}
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self.frecuencia = defaultdict(int, estado['frecuencia'])
+        self.pares = defaultdict(int, estado['pares'])
+
+
+def contar_fragmento(conexion: Dict[str, Any], desde: int, hasta: int, max_cesta: int) -> Contador:
+    """Cuenta las cestas con venta_id en [desde, hasta) (se ejecuta en un proceso hijo)"""
+    conn = mysql.connector.connect(**conexion)
+    cursor = conn.cursor(buffered=False)
+    contador = Contador(max_cesta)
+    try:
+        cursor.execute(SQL_CESTAS, (desde, hasta))
+        contador.leer(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return contador
+
+
+class MatrizCoocurrencia:
+    """Matriz CSR simétrica e inmutable de coincidencias entre libros"""
+
+    def __init__(self, ids: array, frecuencia: array, cestas: int, marca: int,
+                 indptr: array, indices: array, conteos: array):
+        self.ids = ids
+        self.frecuencia = frecuencia
+        self.cestas = cestas
+        self.marca = marca
+        self.indptr = indptr
+        self.indices = indices
+        self.conteos = conteos
+        self.posicion = {libro_id: i for i, libro_id in enumerate(ids)}
+
+    @classmethod
+    def vacia(cls) -> "MatrizCoocurrencia":
+        return cls(array('l'), array('l'), 0, 0, array('q', [0]), array('l'), array('l'))
+
+    @classmethod
+    def desde_contador(cls, contador: Contador, base: Optional["MatrizCoocurrencia"] = None) -> "MatrizCoocurrencia":
+        """Construye la matriz con los conteos de `contador`, sumados a los de `base` si se indica"""
+        frecuencia = defaultdict(int, contador.frecuencia)
+        filas: Dict[int, Dict[int, int]] = defaultdict(dict)
+        if base is not None:
+            for i, libro_id in enumerate(base.ids):
+                frecuencia[libro_id] += base.frecuencia[i]
+                fila = filas[libro_id]
+                for k in range(base.indptr[i], base.indptr[i + 1]):
+                    fila[base.ids[base.indices[k]]] = base.conteos[k]
+        for clave, n in contador.pares.items():
+            a, b = clave >> 32, clave & 0xFFFFFFFF
+            filas[a][b] = filas[a].get(b, 0) + n
+            filas[b][a] = filas[b].get(a, 0) + n
+
+        ids = array('l', sorted(frecuencia))
+        posicion = {libro_id: i for i, libro_id in enumerate(ids)}
+        indptr, indices, conteos = array('q', [0]), array('l'), array('l')
+        for libro_id in ids:
+            fila = filas.get(libro_id)
+            if fila:
+                vecinos = sorted((posicion[vecino], n) for vecino, n in fila.items())
+                indices.extend(j for j, _ in vecinos)
+                conteos.extend(n for _, n in vecinos)
+            indptr.append(len(indices))
+        cestas = contador.cestas + (base.cestas if base is not None else 0)
+        marca = max(contador.marca, base.marca if base is not None else 0)
+        return cls(ids, array('l', (frecuencia[libro_id] for libro_id in ids)), cestas, marca,
+                   indptr, indices, conteos)
+
+    def fila(self, libro_id: int) -> Dict[int, int]:
+        """{libro vecino: cestas en común}"""
+        i = self.posicion.get(libro_id)
+        if i is None:
+            return {}
+        ids, indices, conteos = self.ids, self.indices, self.conteos
+        return {ids[indices[k]]: conteos[k] for k in range(self.indptr[i], self.indptr[i + 1])}
+
+    def frecuencia_de(self, libro_id: int) -> int:
+        i = self.posicion.get(libro_id)
+        return self.frecuencia[i] if i is not None else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def pares(self) -> int:
+        return len(self.indices) // 2
+
+
+class Recomendador:
+    """Matriz de coincidencias en memoria con actualización incremental y consultas top-N"""
+
+    def __init__(self, conexion: Optional[Dict[str, Any]] = None, max_cesta: int = 50,
+                 umbral_compactar: int = 100_000, retraso: int = 5, espera_huecos: float = 300.0):
+        self.conexion = conexion or DB_CONFIG
+        self.max_cesta = max_cesta
+        self.umbral_compactar = umbral_compactar
+        self.retraso = retraso
+        self.espera_huecos = espera_huecos
+        self.matriz = MatrizCoocurrencia.vacia()
+        self.delta = Contador(max_cesta)
+        # Todo venta_id <= marca está contado (o se dio por perdido); las ventas
+        # contadas por encima de un hueco esperan en `_contadas`
+        self.marca = 0
+        self._contadas: set = set()
+        self._huecos: Dict[int, float] = {}
+        # Vecinos del delta por libro, para sumarlos a la fila de la matriz al consultar
+        self._delta_filas: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self._bloqueo = threading.Lock()
+
+    # ------------------------------------------------------------------ construcción
+
+    def reconstruir(self, procesos: Optional[int] = None, fragmentos_por_proceso: int = 4) -> "Recomendador":
+        """Recuenta todas las ventas repartiendo rangos de venta_id entre procesos"""
+        inicio = time.perf_counter()
+        procesos = procesos or os.cpu_count() or 1
+        conn = mysql.connector.connect(**self.conexion)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MIN(venta_id), MAX(venta_id) FROM ventas")
+            minimo, maximo = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+        total = Contador(self.max_cesta)
+        if minimo is not None:
+            partes = max(1, min(procesos * fragmentos_por_proceso, maximo - minimo + 1))
+            paso = (maximo - minimo + partes) // partes
+            rangos = [(desde, min(desde + paso, maximo + 1)) for desde in range(minimo, maximo + 1, paso)]
+            if procesos > 1 and len(rangos) > 1:
+                with ProcessPoolExecutor(max_workers=procesos) as pool:
+                    futuros = [pool.submit(contar_fragmento, self.conexion, desde, hasta, self.max_cesta)
+                               for desde, hasta in rangos]
+                    for futuro in futuros:
+                        total.fusionar(futuro.result())
+            else:
+                for desde, hasta in rangos:
+                    total.fusionar(contar_fragmento(self.conexion, desde, hasta, self.max_cesta))
+
+        matriz = MatrizCoocurrencia.desde_contador(total)
+        with self._bloqueo:
+            self.matriz = matriz
+            self.delta = Contador(self.max_cesta)
+            self._delta_filas.clear()
+            self.marca = matriz.marca
+            self._contadas.clear()
+            self._huecos.clear()
+        logging.info(f"Recomendaciones reconstruidas: {total.cestas} cestas, {len(matriz)} libros, "
+                     f"{matriz.pares} pares en {time.perf_counter() - inicio:.1f} s con {procesos} procesos")
+        return self
+
+    def actualizar(self, limite: int = 5000) -> int:
+        """Añade las ventas posteriores a la marca aún no contadas; devuelve cuántas se procesaron"""
+        with self._bloqueo:
+            marca, contadas = self.marca, set(self._contadas)
+        conn = mysql.connector.connect(**self.conexion)
+        cursor = conn.cursor()
+        nuevas = Contador(self.max_cesta)
+        try:
+            cursor.execute(SQL_VENTAS_NUEVAS, (marca, self.retraso, limite + len(contadas)))
+            ventas = [fila[0] for fila in cursor.fetchall() if fila[0] not in contadas]
+            if ventas:
+                cursor.execute(SQL_CESTAS_IDS.format(marcadores=','.join(['%s'] * len(ventas))),
+                               tuple(ventas))
+                nuevas.leer(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+        with self._bloqueo:
+            self.delta.fusionar(nuevas)
+            for clave, n in nuevas.pares.items():
+                a, b = clave >> 32, clave & 0xFFFFFFFF
+                self._delta_filas[a][b] = self._delta_filas[a].get(b, 0) + n
+                self._delta_filas[b][a] = self._delta_filas[b].get(a, 0) + n
+            self._contadas.update(ventas)
+            self._avanzar_marca()
+            if len(self.delta.pares) >= self.umbral_compactar:
+                self._compactar()
+        return len(ventas)
+
+    def _avanzar_marca(self):
+        """Avanza la marca sobre las ventas contadas; un hueco solo se salta cuando caduca su espera"""
+        ahora = time.monotonic()
+        while self._contadas:
+            siguiente = self.marca + 1
+            if siguiente in self._contadas:
+                self._contadas.remove(siguiente)
+                self._huecos.pop(siguiente, None)
+                self.marca = siguiente
+                continue
+            if ahora - self._huecos.setdefault(siguiente, ahora) < self.espera_huecos:
+                return
+            # Venta anulada o borrada: se da por perdida hasta la siguiente contada
+            hasta = min(self._contadas) - 1
+            logging.warning(f"Recomendaciones: se saltan las ventas {siguiente}..{hasta}")
+            del self._huecos[siguiente]
+            self.marca = hasta
+
+    def compactar(self):
+        """Suma el delta a una matriz nueva"""
+        with self._bloqueo:
+            self._compactar()
+
+    def _compactar(self):
+        self.matriz = MatrizCoocurrencia.desde_contador(self.delta, base=self.matriz)
+        self.delta = Contador(self.max_cesta)
+        self._delta_filas.clear()
+
+    # ------------------------------------------------------------------ consultas
+
+    def vecinos(self, libro_id: int, n: int = 10, metrica: str = 'lift',
+                min_conteo: int = 2) -> List[Tuple[int, float, int]]:
+        """Los `n` libros más comprados junto a `libro_id`: (libro_id, puntuación, cestas en común)"""
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica} (disponibles: {', '.join(METRICAS)})")
+        with self._bloqueo:
+            matriz, delta = self.matriz, self.delta
+            fila = matriz.fila(libro_id)
+            for vecino, c in self._delta_filas.get(libro_id, {}).items():
+                fila[vecino] = fila.get(vecino, 0) + c
+            cestas = matriz.cestas + delta.cestas
+            fa = matriz.frecuencia_de(libro_id) + delta.frecuencia.get(libro_id, 0)
+            candidatos = [(vecino, c, matriz.frecuencia_de(vecino) + delta.frecuencia.get(vecino, 0))
+                          for vecino, c in fila.items() if c >= min_conteo]
+        if not candidatos or not fa:
+            return []
+
+        if metrica == 'lift':
+            puntuar = lambda c, fb: c * cestas / (fa * fb)
+        elif metrica == 'coseno':
+            puntuar = lambda c, fb: c / math.sqrt(fa * fb)
+        else:
+            puntuar = lambda c, fb: float(c)
+        mejores = heapq.nlargest(n, ((puntuar(c, fb), c, vecino) for vecino, c, fb in candidatos))
+        return [(vecino, round(puntuacion, 6), c) for puntuacion, c, vecino in mejores]
+
+    # ------------------------------------------------------------------ persistencia
+
+    def guardar(self, ruta: str):
+        """Guarda la matriz (con el delta compactado) de forma atómica"""
+        with self._bloqueo:
+            self._compactar()
+            matriz = self.matriz
+            datos = {campo: getattr(matriz, campo) for campo in
+                     ('ids', 'frecuencia', 'cestas', 'indptr', 'indices', 'conteos')}
+            datos['marca'] = self.marca
+            datos['contadas'] = sorted(self._contadas)
+        temporal = ruta + ".tmp"
+        with open(temporal, 'wb') as f:
+            pickle.dump(datos, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, ruta)
+
+    def cargar(self, ruta: str) -> "Recomendador":
+        with open(ruta, 'rb') as f:
+            datos = pickle.load(f)
+        contadas = datos.pop('contadas', ())
+        matriz = MatrizCoocurrencia(**datos)
+        with self._bloqueo:
+            self.matriz = matriz
+            self.delta = Contador(self.max_cesta)
+            self._delta_filas.clear()
+            self.marca = matriz.marca
+            self._contadas = set(contadas)
+            self._huecos.clear()
+        return self
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Recomendaciones por compras conjuntas')
+    parser.add_argument("--reconstruir", action='store_true', help="Recuenta todas las ventas")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de la reconstrucción (por defecto, uno por núcleo)")
+    parser.add_argument("--entrada", help="Matriz guardada a cargar")
+    parser.add_argument("--salida", help="Fichero donde guardar la matriz")
+    parser.add_argument("--actualizar", action='store_true', help="Añade las ventas nuevas desde la última marca")
+    parser.add_argument("--libro", type=int, action='append', default=[], help="Muestra los vecinos de este libro")
+    parser.add_argument("--metrica", choices=METRICAS, default='lift', help="Puntuación de los vecinos")
+    parser.add_argument("-n", type=int, default=10, help="Vecinos por libro")
+    parser.add_argument("--max-cesta", type=int, default=50, help="Cestas más grandes no generan pares")
+    parser.add_argument("--host", default=DB_CONFIG.get('host', 'localhost'), help="Host de la base de datos")
+    parser.add_argument("--port", type=int, default=DB_CONFIG.get('port', 3306), help="Puerto de MySQL")
+    parser.add_argument("--user", default=DB_CONFIG.get('user'), help="Usuario de la base de datos")
+    parser.add_argument("--password", default=DB_CONFIG.get('password'), help="Contraseña de la base de datos")
+    parser.add_argument("--database", default=DB_CONFIG.get('database', 'libreria'), help="Nombre de la base de datos")
+    args = parser.parse_args()
+
+    conexion = {'host': args.host, 'port': args.port, 'user': args.user,
+                'password': args.password, 'database': args.database}
+    recomendador = Recomendador(conexion, max_cesta=args.max_cesta)
+    try:
+        if args.entrada:
+            recomendador.cargar(args.entrada)
+        if args.reconstruir:
+            recomendador.reconstruir(args.procesos)
+        if args.actualizar:
+            while recomendador.actualizar():
+                pass
+    except mysql.connector.Error as err:
+        logging.error(f"Error de MySQL: {err}")
+        sys.exit(1)
+    if args.salida:
+        recomendador.guardar(args.salida)
+    for libro_id in args.libro:
+        print(f"\nLibro {libro_id}:")
+        for vecino, puntuacion, comunes in recomendador.vecinos(libro_id, args.n, args.metrica):
+            print(f"  {vecino:>10}  {args.metrica} {puntuacion:>10.4f}  ({comunes} cestas en común)")
+
+
+if __name__ == "__main__":
+    main()
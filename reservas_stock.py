@@ -0,0 +1,275 @@
+"""
+reservas_stock.py – Reservas de stock para el cobro en caja.
+
+Una caja aparta unidades con `reservar(carrito, lineas)` en cuanto el libro
+entra en el carrito; la venta se confirma más tarde con `confirmar` (o con
+`confirmar_lote` para muchas cajas a la vez) o se libera con `liberar`. Las
+reservas que nadie confirma vencen a los `duracion` segundos y el barrido
+(`liberar_caducadas` / `iniciar_barrido`) devuelve sus unidades.
+
+Garantía de stock: las unidades apartadas se suman a libros.stock_reservado
+con un UPDATE condicional (`stock - stock_reservado >= cantidad`), que InnoDB
+evalúa con la fila bloqueada; dos cajas nunca obtienen la misma unidad. El
+trigger after_venta_insert aplica la misma condición a las ventas sin
+reserva, y la tabla libros tiene CHECK (stock >= 0) como última defensa.
+
+Para evitar interbloqueos las filas de libros se actualizan en orden de
+libro_id; si aun así MySQL elige la transacción como víctima (1213) o vence
+la espera de bloqueo (1205), la operación se reintenta.
+
+Ejemplo:
+    motor = MotorReservas(duracion=300)
+    motor.reservar("caja1-0042", [(10, 2), (15, 1)])
+    venta_id = motor.confirmar("caja1-0042", {'cliente_id': 3, 'detalles': [...]})
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import mysql.connector
+import mysql.connector.pooling
+
+from config import DB_CONFIG
+from ingesta_ventas import SQL_DETALLE, SQL_VENTA, validar_venta
+
+# Interbloqueo y espera de bloqueo agotada: se puede reintentar la transacción
+ERRORES_REINTENTABLES = (1213, 1205)
+
+
+class StockInsuficiente(ValueError):
+    """No quedan unidades libres (stock - stock_reservado) para una línea del carrito"""
+
+    def __init__(self, libro_id: int, cantidad: int):
+        super().__init__(f"Stock insuficiente para el libro {libro_id} (solicitadas {cantidad})")
+        self.libro_id = libro_id
+        self.cantidad = cantidad
+
+
+class ReservaInsuficiente(ValueError):
+    """La venta pide más unidades de las que el carrito tiene reservadas"""
+
+
+def _agrupar(lineas: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    cantidades: Dict[int, int] = defaultdict(int)
+    for libro_id, cantidad in lineas:
+        cantidades[int(libro_id)] += int(cantidad)
+    return cantidades
+
+
+class MotorReservas:
+    """Reservas con caducidad sobre libros.stock_reservado y confirmación por lotes"""
+
+    def __init__(self, conexion: Optional[Dict[str, Any]] = None, duracion: float = 600,
+                 tam_pool: int = 8, reintentos: int = 5):
+        self.conexion = conexion or DB_CONFIG
+        self.duracion = duracion
+        self.reintentos = reintentos
+        self.pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=f"reservas_{id(self)}", pool_size=tam_pool, **self.conexion)
+        # El pool de mysql.connector no espera: falla si se agota
+        self._huecos = threading.BoundedSemaphore(tam_pool)
+        self._barrido: Optional[threading.Thread] = None
+        self._detener_barrido = threading.Event()
+
+    # ------------------------------------------------------------------ transacciones
+
+    @contextmanager
+    def _conexion(self):
+        with self._huecos:
+            conn = self.pool.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    def _en_transaccion(self, funcion: Callable, *args):
+        """Ejecuta funcion(cursor, *args) en una transacción READ COMMITTED con reintentos"""
+        for intento in range(self.reintentos + 1):
+            with self._conexion() as conn:
+                cursor = conn.cursor()
+                try:
+                    conn.start_transaction(isolation_level='READ COMMITTED')
+                    resultado = funcion(cursor, *args)
+                    conn.commit()
+                    return resultado
+                except mysql.connector.Error as e:
+                    conn.rollback()
+                    if e.errno not in ERRORES_REINTENTABLES or intento == self.reintentos:
+                        raise
+                    logging.warning(f"Transacción de reservas reintentada ({e.errno}): intento {intento + 1}")
+                except BaseException:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            time.sleep(0.01 * (2 ** intento))
+
+    # ------------------------------------------------------------------ reservas
+
+    def reservar(self, carrito: str, lineas: Iterable[Tuple[int, int]], duracion: Optional[float] = None):
+        """
+        Aparta todas las líneas (libro_id, cantidad) o ninguna.
+
+        Renueva además el vencimiento de lo que el carrito ya tenía reservado.
+        Lanza StockInsuficiente si alguna línea no cabe.
+        """
+        cantidades = _agrupar(lineas)
+        if any(cantidad <= 0 for cantidad in cantidades.values()):
+            raise ValueError("Las cantidades a reservar deben ser positivas")
+        segundos = self.duracion if duracion is None else duracion
+        self._en_transaccion(self._reservar, carrito, cantidades, segundos)
+
+    @staticmethod
+    def _reservar(cursor, carrito: str, cantidades: Dict[int, int], segundos: float):
+        for libro_id in sorted(cantidades):
+            cursor.execute(
+                "UPDATE libros SET stock_reservado = stock_reservado + %s "
+                "WHERE libro_id = %s AND stock - stock_reservado >= %s",
+                (cantidades[libro_id], libro_id, cantidades[libro_id]))
+            if cursor.rowcount == 0:
+                raise StockInsuficiente(libro_id, cantidades[libro_id])
+        cursor.execute("UPDATE reservas_stock SET expira_en = NOW(3) + INTERVAL %s SECOND WHERE carrito = %s",
+                       (segundos, carrito))
+        cursor.executemany(
+            "INSERT INTO reservas_stock (carrito, libro_id, cantidad, expira_en) "
+            "VALUES (%s, %s, %s, NOW(3) + INTERVAL %s SECOND)",
+            [(carrito, libro_id, cantidad, segundos) for libro_id, cantidad in cantidades.items()])
+
+    def liberar(self, carrito: str) -> int:
+        """Devuelve al stock libre todo lo reservado por el carrito; devuelve las unidades liberadas"""
+        return self._en_transaccion(self._liberar_carrito, carrito)
+
+    def _liberar_carrito(self, cursor, carrito: str) -> int:
+        cursor.execute("SELECT reserva_id, libro_id, cantidad FROM reservas_stock WHERE carrito = %s FOR UPDATE",
+                       (carrito,))
+        return self._devolver(cursor, cursor.fetchall())
+
+    def liberar_caducadas(self, limite: int = 1000) -> int:
+        """Libera hasta `limite` reservas vencidas; devuelve las unidades liberadas"""
+        return self._en_transaccion(self._liberar_caducadas, limite)
+
+    def _liberar_caducadas(self, cursor, limite: int) -> int:
+        # SKIP LOCKED: las que está confirmando otra caja no se tocan
+        cursor.execute(
+            "SELECT reserva_id, libro_id, cantidad FROM reservas_stock "
+            "WHERE expira_en <= NOW(3) ORDER BY expira_en LIMIT %s FOR UPDATE SKIP LOCKED", (limite,))
+        return self._devolver(cursor, cursor.fetchall())
+
+    @staticmethod
+    def _devolver(cursor, reservas: List[tuple]) -> int:
+        """Resta las reservas bloqueadas de stock_reservado y las borra"""
+        if not reservas:
+            return 0
+        cantidades = _agrupar((libro_id, cantidad) for _, libro_id, cantidad in reservas)
+        cursor.executemany("UPDATE libros SET stock_reservado = stock_reservado - %s WHERE libro_id = %s",
+                           [(cantidades[libro_id], libro_id) for libro_id in sorted(cantidades)])
+        ids = [reserva_id for reserva_id, _, _ in reservas]
+        cursor.execute(f"DELETE FROM reservas_stock WHERE reserva_id IN ({', '.join(['%s'] * len(ids))})", ids)
+        return sum(cantidades.values())
+
+    def disponible(self, libro_ids: Iterable[int]) -> Dict[int, int]:
+        """Unidades libres (stock - stock_reservado) por libro"""
+        ids = list(libro_ids)
+        if not ids:
+            return {}
+        with self._conexion() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT libro_id, stock - stock_reservado FROM libros "
+                               f"WHERE libro_id IN ({', '.join(['%s'] * len(ids))})", ids)
+                return dict(cursor.fetchall())
+            finally:
+                cursor.close()
+
+    # ------------------------------------------------------------------ confirmación
+
+    def confirmar(self, carrito: str, datos_venta: Dict[str, Any]) -> int:
+        """Convierte la reserva del carrito en una venta y devuelve su venta_id"""
+        resultado = self.confirmar_lote([(carrito, datos_venta)])[0]
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+    def confirmar_lote(self, pedidos: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """
+        Confirma varios carritos en una sola transacción (un commit para todos).
+
+        Cada carrito va tras su SAVEPOINT: si uno falla solo se deshace ese. El
+        resultado tiene, en el orden de `pedidos`, el venta_id o la excepción.
+        Las unidades reservadas que la venta no usa se liberan.
+        """
+        validados = []
+        for carrito, datos in pedidos:
+            try:
+                validados.append((carrito, validar_venta(datos)))
+            except ValueError as e:
+                validados.append((carrito, e))
+        return self._en_transaccion(self._confirmar_lote, validados)
+
+    def _confirmar_lote(self, cursor, validados: List[tuple]) -> List[Any]:
+        resultados = []
+        for carrito, venta in validados:
+            if isinstance(venta, Exception):
+                resultados.append(venta)
+                continue
+            cursor.execute("SAVEPOINT carrito")
+            try:
+                resultados.append(self._confirmar_carrito(cursor, carrito, *venta))
+            except mysql.connector.Error as e:
+                if e.errno in ERRORES_REINTENTABLES:
+                    raise
+                cursor.execute("ROLLBACK TO SAVEPOINT carrito")
+                resultados.append(e)
+            except ReservaInsuficiente as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT carrito")
+                resultados.append(e)
+        return resultados
+
+    def _confirmar_carrito(self, cursor, carrito: str, venta: tuple, detalles: List[tuple]) -> int:
+        cursor.execute("SELECT reserva_id, libro_id, cantidad FROM reservas_stock WHERE carrito = %s FOR UPDATE",
+                       (carrito,))
+        reservas = cursor.fetchall()
+        reservado = _agrupar((libro_id, cantidad) for _, libro_id, cantidad in reservas)
+        pedido = _agrupar((libro_id, cantidad) for libro_id, cantidad, _, _ in detalles)
+        for libro_id, cantidad in pedido.items():
+            if cantidad > reservado.get(libro_id, 0):
+                raise ReservaInsuficiente(
+                    f"El carrito {carrito} reservó {reservado.get(libro_id, 0)} unidades del libro "
+                    f"{libro_id} y la venta pide {cantidad}")
+        # Soltar la reserva primero: el trigger after_venta_insert descuenta el stock
+        # con la misma condición que las ventas sin reserva, y la fila sigue bloqueada
+        self._devolver(cursor, reservas)
+        cursor.execute(SQL_VENTA, venta)
+        venta_id = cursor.lastrowid
+        cursor.executemany(SQL_DETALLE, [(venta_id,) + detalle for detalle in detalles])
+        return venta_id
+
+    # ------------------------------------------------------------------ barrido
+
+    def iniciar_barrido(self, intervalo: float = 5.0):
+        """Libera las reservas vencidas cada `intervalo` segundos en un hilo de fondo"""
+        if self._barrido is not None:
+            return
+        self._detener_barrido.clear()
+
+        def barrer():
+            while not self._detener_barrido.wait(intervalo):
+                try:
+                    liberadas = self.liberar_caducadas()
+                    if liberadas:
+                        logging.info(f"Reservas vencidas liberadas: {liberadas} unidades")
+                except mysql.connector.Error as e:
+                    logging.error(f"Error al liberar reservas vencidas: {e}")
+
+        self._barrido = threading.Thread(target=barrer, name="barrido_reservas", daemon=True)
+        self._barrido.start()
+
+    def detener_barrido(self):
+        if self._barrido is not None:
+            self._detener_barrido.set()
+            self._barrido.join()
+            self._barrido = None
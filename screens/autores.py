@@ -1,6 +1,22 @@
 from textual.screen import Screen
-from textual.widgets import Static
+from textual.widgets import DataTable, Static
+from controllers import AutorController
+from widgets.carga_datos import CargaDatos
 
-class AutoresScreen(Screen):
+class AutoresScreen(CargaDatos, Screen):
     def compose(self):
         yield Static("Gestión de Autores")
+        yield DataTable(id="tabla_autores")
+
+    def on_mount(self):
+        tabla = self.query_one("#tabla_autores", DataTable)
+        tabla.add_columns("ID", "Nombre", "Apellido", "Nacionalidad")
+        self.cargar_datos("autores", AutorController().obtener_todos,
+                          al_cargar=self._mostrar, destino=tabla)
+
+    def _mostrar(self, autores):
+        tabla = self.query_one("#tabla_autores", DataTable)
+        tabla.clear()
+        for autor in autores:
+            tabla.add_row(str(autor['autor_id']), autor['nombre'], autor['apellido'] or "",
+                          autor['nacionalidad'] or "", key=str(autor['autor_id']))
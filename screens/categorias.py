@@ -1,6 +1,49 @@
+from textual.containers import Horizontal
 from textual.screen import Screen
-from textual.widgets import Static
+from textual.widgets import Static, Tree
+from arbol_categorias import ARBOL
+from widgets.carga_datos import CargaDatos
 
-class CategoriasScreen(Screen):
+class CategoriasScreen(CargaDatos, Screen):
     def compose(self):
         yield Static("Gestión de Categorías")
+        with Horizontal():
+            yield Tree("Categorías", id="arbol_categorias")
+            yield Static("", id="detalle_categoria")
+
+    def on_mount(self):
+        arbol = self.query_one("#arbol_categorias", Tree)
+        self.jerarquia = None
+        self.cargar_datos(("categorias", "arbol"), ARBOL.obtener, al_cargar=self._mostrar, destino=arbol)
+
+    def _mostrar(self, jerarquia):
+        self.jerarquia = jerarquia
+        arbol = self.query_one("#arbol_categorias", Tree)
+        arbol.clear()
+        # Recorrido con pila: la profundidad del árbol no está acotada
+        pila = [(arbol.root, categoria_id) for categoria_id in reversed(jerarquia.raices())]
+        while pila:
+            padre, categoria_id = pila.pop()
+            etiqueta = f"{jerarquia.nombres[categoria_id]} ({jerarquia.libros_en_subarbol(categoria_id)})"
+            hijos = jerarquia.hijos(categoria_id)
+            if hijos:
+                nodo = padre.add(etiqueta, data=categoria_id)
+                pila.extend((nodo, hijo) for hijo in reversed(hijos))
+            else:
+                padre.add_leaf(etiqueta, data=categoria_id)
+        arbol.root.expand()
+
+    def on_tree_node_highlighted(self, event: Tree.NodeHighlighted):
+        categoria_id = event.node.data
+        detalle = self.query_one("#detalle_categoria", Static)
+        if self.jerarquia is None or categoria_id not in self.jerarquia:
+            detalle.update("")
+            return
+        jerarquia = self.jerarquia
+        ruta = " › ".join(jerarquia.nombres[c] for c in jerarquia.ruta(categoria_id))
+        subcategorias = len(jerarquia.subarbol(categoria_id)) - 1
+        detalle.update(
+            f"{ruta}\n\n"
+            f"Subcategorías: {subcategorias}\n"
+            f"Libros (con subcategorías): {jerarquia.libros_en_subarbol(categoria_id)}"
+        )
@@ -1,6 +1,8 @@
 from textual.screen import Screen
 from textual.widgets import Static
+from widgets.tabla_clientes import TablaClientes
 
 class ClientesScreen(Screen):
     def compose(self):
         yield Static("Gestión de Clientes")
+        yield TablaClientes()
@@ -1,6 +1,73 @@
+import shlex
+
+from textual.binding import Binding
 from textual.screen import Screen
-from textual.widgets import Static
+from textual.widgets import Input, Static
+from widgets.tabla_libros import TablaLibros
+
+# Filtros del catálogo en memoria (CatalogoColumnar.filtrar) -> conversión del valor
+FILTROS = {
+    'precio_min': float, 'precio_max': float, 'stock_min': int, 'calificacion_min': float,
+    'idioma': str, 'formato': str, 'editorial': str,
+}
+ORDENES = ('libro_id', 'titulo', 'autores', 'editorial', 'precio', 'stock', 'calificacion')
+
+
+def leer_filtro(texto: str):
+    """
+    Convierte 'clave=valor ...' en (orden, descendente, filtros) para TablaLibros.filtrar.
+
+    orden=-precio ordena de forma descendente; los valores con espacios van
+    entre comillas (editorial="Alianza Editorial").
+    """
+    try:
+        terminos = shlex.split(texto)
+    except ValueError:
+        raise ValueError("Comillas sin cerrar en el filtro")
+    orden, descendente, filtros = None, False, {}
+    for termino in terminos:
+        clave, igual, valor = termino.partition('=')
+        if not igual:
+            raise ValueError(f"Falta el valor en «{termino}» (clave=valor)")
+        if clave == 'orden':
+            descendente = valor.startswith('-')
+            orden = valor.lstrip('-')
+            if orden not in ORDENES:
+                raise ValueError(f"No se puede ordenar por «{orden}» (disponibles: {', '.join(ORDENES)})")
+        elif clave in FILTROS:
+            try:
+                filtros[clave] = FILTROS[clave](valor)
+            except ValueError:
+                raise ValueError(f"Valor no válido para {clave}: «{valor}»")
+        else:
+            raise ValueError(f"Filtro desconocido: «{clave}» (disponibles: {', '.join(FILTROS)}, orden)")
+    return orden, descendente, filtros
+
 
 class LibrosScreen(Screen):
+    BINDINGS = [Binding("f", "filtrar", "Filtrar")]
+
     def compose(self):
         yield Static("Gestión de Libros")
+        yield Input(placeholder="Filtrar: precio_max=20 idioma=es orden=-precio (vacío: catálogo completo)")
+        yield TablaLibros()
+
+    def on_mount(self):
+        # La tabla conserva el foco para que las teclas de la aplicación sigan activas
+        self.query_one(TablaLibros).focus()
+
+    def action_filtrar(self):
+        self.query_one(Input).focus()
+
+    def on_input_submitted(self, event: Input.Submitted):
+        try:
+            orden, descendente, filtros = leer_filtro(event.value)
+        except ValueError as e:
+            self.notify(str(e), severity="error")
+            return
+        tabla = self.query_one(TablaLibros)
+        if orden is None and not filtros:
+            tabla.cargar()
+        else:
+            tabla.filtrar(orden, descendente, **filtros)
+        tabla.focus()
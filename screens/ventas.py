@@ -1,6 +1,8 @@
 from textual.screen import Screen
 from textual.widgets import Static
+from widgets.tabla_ventas import TablaVentas
 
 class VentasScreen(Screen):
     def compose(self):
         yield Static("Registro de Ventas")
+        yield TablaVentas()
@@ -0,0 +1,395 @@
+"""
+similitud.py – Índice de similitud de contenido entre libros ("libros parecidos").
+
+Cada libro se representa con un vector TF-IDF sobre rasgos con hash: las
+palabras de titulo, subtitulo y descripcion (normalizadas sin acentos y sin
+palabras vacías) y cada autor y categoría como un rasgo propio. El término
+se convierte en columna con crc32 módulo `dimension`, así que no hay
+vocabulario que mantener y un libro nuevo se vectoriza sin tocar el resto.
+Los campos pesan distinto (PESOS_CAMPO), la frecuencia es sublineal
+(1 + log tf) y cada vector conserva sus `max_terminos` rasgos más pesados y
+se normaliza (la similitud es el coseno).
+
+Los vectores viven en matrices dispersas de NumPy (Segmento): CSR por libro
+y, a la vez, listas invertidas por rasgo. Buscar los parecidos a un libro
+solo recorre las listas de sus rasgos más pesados, no el catálogo entero, y
+las listas de rasgos comunes (más de `max_postings` libros) se saltan: su
+IDF apenas aporta y son las que más cuestan.
+
+Como CatalogoColumnar, se alimenta con un `consultar(query, params)` que
+devuelve FilasCrudas: reconstruir() lee todo el catálogo por lotes y fija
+el IDF; refrescar() añade los libros nuevos y recargar_ids() los
+modificados o borrados (p. ej. desde feed_cambios). Los cambios van a un
+segmento reciente pequeño que se rehace en cada lote y se compacta con el
+principal al superar `umbral_compactar` libros. El IDF se congela en cada
+reconstrucción: los libros añadidos después usan el de la última.
+
+Requiere NumPy.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from db_manager import FilasCrudas
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional para el resto de la aplicación
+    np = None
+
+SQL_TEXTOS = """
+SELECT l.libro_id, l.titulo, l.subtitulo, l.descripcion,
+       GROUP_CONCAT(DISTINCT CONCAT(a.nombre, ' ', a.apellido) SEPARATOR '|') AS autores,
+       GROUP_CONCAT(DISTINCT c.nombre SEPARATOR '|') AS categorias
+FROM libros l
+LEFT JOIN libro_autor la ON l.libro_id = la.libro_id
+LEFT JOIN autores a ON la.autor_id = a.autor_id
+LEFT JOIN libro_categoria lc ON l.libro_id = lc.libro_id
+LEFT JOIN categorias c ON lc.categoria_id = c.categoria_id
+WHERE {condicion}
+GROUP BY l.libro_id
+ORDER BY l.libro_id
+LIMIT %s
+"""
+
+COLUMNAS = ('libro_id', 'titulo', 'subtitulo', 'descripcion', 'autores', 'categorias')
+
+PESOS_CAMPO = {'titulo': 3.0, 'subtitulo': 2.0, 'descripcion': 1.0, 'autores': 2.5, 'categorias': 2.0}
+
+PALABRAS_VACIAS = frozenset("""
+a al algo como con de del desde el ella en entre era es esta este esto fue ha la las le lo los mas
+muy no nos o para pero por que se sin sobre su sus un una uno unos y ya
+an and are as at be by for from in into is it its of on or that the this to was with
+""".split())
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas y sin acentos ('Canción' -> 'cancion')"""
+    if not texto:
+        return ""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def palabras(texto: Optional[str]) -> List[str]:
+    return [p for p in _PALABRA.findall(normalizar(texto)) if len(p) > 1 and p not in PALABRAS_VACIAS]
+
+
+def rasgos(titulo: Optional[str], subtitulo: Optional[str], descripcion: Optional[str],
+           autores: Optional[str], categorias: Optional[str]) -> Dict[str, float]:
+    """Peso bruto de cada rasgo del libro; autores y categorías separados por '|'"""
+    pesos: Dict[str, float] = defaultdict(float)
+    for campo, texto in (('titulo', titulo), ('subtitulo', subtitulo), ('descripcion', descripcion)):
+        for palabra in palabras(texto):
+            pesos[palabra] += PESOS_CAMPO[campo]
+    for campo, prefijo, valores in (('autores', 'autor:', autores), ('categorias', 'categoria:', categorias)):
+        for valor in (valores or "").split('|'):
+            valor = " ".join(palabras(valor))
+            if valor:
+                pesos[prefijo + valor] += PESOS_CAMPO[campo]
+    return pesos
+
+
+class Segmento:
+    """
+    Vectores de un conjunto de libros en dos formas: CSR por libro
+    (indptr/indices/pesos) y listas invertidas por rasgo
+    (post_ptr/post_filas/post_pesos). Inmutable salvo `vivo`, que marca las
+    filas reemplazadas o borradas.
+    """
+
+    def __init__(self, ids, indptr, indices, pesos, dimension: int):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.pesos = pesos
+        filas = np.repeat(np.arange(len(ids), dtype=np.int32), np.diff(indptr))
+        orden = np.argsort(indices, kind='stable')
+        self.post_filas = filas[orden]
+        self.post_pesos = pesos[orden]
+        self.post_ptr = np.zeros(dimension + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=dimension), out=self.post_ptr[1:])
+        self.vivo = np.ones(len(ids), dtype=bool)
+
+    @classmethod
+    def construir(cls, vectores: List[Tuple[int, "np.ndarray", "np.ndarray"]], dimension: int) -> "Segmento":
+        """Segmento a partir de (libro_id, indices, pesos)"""
+        ids = np.fromiter((v[0] for v in vectores), dtype=np.int64, count=len(vectores))
+        indptr = np.zeros(len(vectores) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(v[1]) for v in vectores), dtype=np.int64, count=len(vectores)),
+                  out=indptr[1:])
+        if vectores:
+            indices = np.concatenate([v[1] for v in vectores])
+            pesos = np.concatenate([v[2] for v in vectores])
+        else:
+            indices, pesos = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return cls(ids, indptr, indices, pesos, dimension)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vector(self, fila: int):
+        inicio, fin = self.indptr[fila], self.indptr[fila + 1]
+        return self.indices[inicio:fin], self.pesos[inicio:fin]
+
+    def vectores_vivos(self) -> List[Tuple[int, "np.ndarray", "np.ndarray"]]:
+        return [(int(self.ids[fila]), *self.vector(fila)) for fila in np.flatnonzero(self.vivo)]
+
+    def puntuar(self, indices, pesos, max_postings: int):
+        """(filas, puntuaciones) de los libros vivos que comparten algún rasgo con el vector"""
+        trozos_filas, trozos_puntos = [], []
+        for termino, peso in zip(indices.tolist(), pesos.tolist()):
+            inicio, fin = self.post_ptr[termino], self.post_ptr[termino + 1]
+            if inicio == fin or fin - inicio > max_postings:
+                continue
+            trozos_filas.append(self.post_filas[inicio:fin])
+            trozos_puntos.append(self.post_pesos[inicio:fin] * peso)
+        if not trozos_filas:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+        # Suma por fila sobre los candidatos, sin un array del tamaño del segmento
+        filas, inversa = np.unique(np.concatenate(trozos_filas), return_inverse=True)
+        puntos = np.bincount(inversa, weights=np.concatenate(trozos_puntos))
+        vivas = self.vivo[filas]
+        return filas[vivas], puntos[vivas]
+
+
+class IndiceSimilitud:
+    """
+    Índice de libros parecidos por contenido.
+
+    `consultar(query, params)` debe devolver FilasCrudas (por ejemplo
+    SistemaLibreria.ejecutar_consulta con crudo=True).
+    """
+
+    def __init__(self, consultar: Callable[[str, tuple], FilasCrudas], lote: int = 20_000,
+                 dimension: int = 1 << 20, max_terminos: int = 48, terminos_consulta: int = 24,
+                 max_postings: int = 200_000, umbral_compactar: int = 20_000):
+        if np is None:
+            raise RuntimeError("El índice de similitud requiere NumPy")
+        self.consultar = consultar
+        self.lote = lote
+        self.dimension = dimension
+        self.max_terminos = max_terminos
+        self.terminos_consulta = terminos_consulta
+        self.max_postings = max_postings
+        self.umbral_compactar = umbral_compactar
+        self.marca_libro_id = 0
+        self.idf = np.ones(dimension, dtype=np.float32)
+        self.principal = Segmento.construir([], dimension)
+        self.reciente = Segmento.construir([], dimension)
+        self._pendientes: Dict[int, Tuple["np.ndarray", "np.ndarray"]] = {}
+        self._posicion: Dict[int, Tuple[Segmento, int]] = {}
+        self._bloqueo = threading.Lock()
+
+    def __len__(self):
+        return len(self._posicion)
+
+    def __contains__(self, libro_id):
+        return libro_id in self._posicion
+
+    # ------------------------------------------------------------------ vectorización
+
+    def _terminos(self, fila: tuple):
+        """(indices, frecuencias sublineales) de una fila de SQL_TEXTOS, sin IDF"""
+        brutos = rasgos(*fila[1:])
+        if not brutos:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        acumulados: Dict[int, float] = defaultdict(float)
+        for rasgo, peso in brutos.items():
+            acumulados[zlib.crc32(rasgo.encode()) % self.dimension] += peso
+        indices = np.fromiter(acumulados.keys(), dtype=np.int32, count=len(acumulados))
+        frecuencias = np.fromiter(acumulados.values(), dtype=np.float32, count=len(acumulados))
+        return indices, 1 + np.log(frecuencias)
+
+    def _vectorizar(self, indices, frecuencias):
+        """Aplica el IDF, recorta a los `max_terminos` rasgos más pesados y normaliza"""
+        pesos = frecuencias * self.idf[indices]
+        if len(pesos) > self.max_terminos:
+            mejores = np.argpartition(-pesos, self.max_terminos)[:self.max_terminos]
+            indices, pesos = indices[mejores], pesos[mejores]
+        norma = float(np.sqrt(np.dot(pesos, pesos)))
+        if norma:
+            pesos = pesos / norma
+        orden = np.argsort(indices)
+        return indices[orden], pesos[orden].astype(np.float32)
+
+    def _leer(self, condicion: str, params: tuple) -> FilasCrudas:
+        return self.consultar(SQL_TEXTOS.format(condicion=condicion), params)
+
+    # ------------------------------------------------------------------ construcción
+
+    def reconstruir(self) -> "IndiceSimilitud":
+        """Lee todo el catálogo por lotes, recalcula el IDF y rehace el índice"""
+        inicio = time.perf_counter()
+        terminos: List[Tuple[int, "np.ndarray", "np.ndarray"]] = []
+        documentos = np.zeros(self.dimension, dtype=np.int64)
+        marca = 0
+        while True:
+            filas = self._leer("l.libro_id > %s", (marca, self.lote))
+            if not filas:
+                break
+            obtener = filas.columnas.getter(*COLUMNAS)
+            for fila in map(obtener, filas):
+                indices, frecuencias = self._terminos(fila)
+                terminos.append((fila[0], indices, frecuencias))
+            documentos += np.bincount(np.concatenate([t[1] for t in terminos[-len(filas):]]),
+                                      minlength=self.dimension)
+            marca = max(marca, terminos[-1][0])
+            if len(filas) < self.lote:
+                break
+
+        idf = (np.log((1 + len(terminos)) / (1 + documentos)) + 1).astype(np.float32)
+        with self._bloqueo:
+            self.idf = idf
+            vectores = [(libro_id, *self._vectorizar(indices, frecuencias))
+                        for libro_id, indices, frecuencias in terminos]
+            self._instalar(Segmento.construir(vectores, self.dimension))
+            self.marca_libro_id = max(marca, self.marca_libro_id)
+        logging.info(f"Índice de similitud: {len(terminos)} libros, {len(self.principal.indices)} rasgos "
+                     f"en {time.perf_counter() - inicio:.1f} s")
+        return self
+
+    def refrescar(self) -> int:
+        """Añade los libros nuevos (libro_id > marca de agua) y devuelve cuántos se añadieron"""
+        nuevos = 0
+        while True:
+            filas = self._leer("l.libro_id > %s", (self.marca_libro_id, self.lote))
+            if not filas:
+                break
+            self._aplicar(filas, ())
+            nuevos += len(filas)
+            if len(filas) < self.lote:
+                break
+        return nuevos
+
+    def recargar_ids(self, ids: Iterable[int]):
+        """Vuelve a vectorizar los libros indicados; los que ya no existen salen del índice"""
+        ids = list(ids)
+        if not ids:
+            return
+        marcadores = ','.join(['%s'] * len(ids))
+        filas = self._leer(f"l.libro_id IN ({marcadores})", tuple(ids) + (len(ids),))
+        self._aplicar(filas, ids)
+
+    def _aplicar(self, filas: FilasCrudas, ids: Iterable[int]):
+        """Lleva las filas leídas al segmento reciente y da de baja las versiones anteriores"""
+        vectores = []
+        if filas:
+            obtener = filas.columnas.getter(*COLUMNAS)
+            for fila in map(obtener, filas):
+                vectores.append((fila[0], *self._vectorizar(*self._terminos(fila))))
+        encontrados = {libro_id for libro_id, _, _ in vectores}
+        with self._bloqueo:
+            for libro_id, indices, pesos in vectores:
+                self._retirar(libro_id)
+                self._pendientes[libro_id] = (indices, pesos)
+                if libro_id > self.marca_libro_id:
+                    self.marca_libro_id = libro_id
+            for libro_id in ids:
+                if libro_id not in encontrados:
+                    self._retirar(libro_id)
+                    self._pendientes.pop(libro_id, None)
+            if len(self._pendientes) >= self.umbral_compactar:
+                self._compactar()
+            else:
+                self._rehacer_reciente()
+
+    def _retirar(self, libro_id: int):
+        posicion = self._posicion.pop(libro_id, None)
+        if posicion is not None:
+            segmento, fila = posicion
+            segmento.vivo[fila] = False
+
+    def _rehacer_reciente(self):
+        self.reciente = Segmento.construir(
+            [(libro_id, indices, pesos) for libro_id, (indices, pesos) in self._pendientes.items()],
+            self.dimension
+        )
+        for fila, libro_id in enumerate(self.reciente.ids.tolist()):
+            self._posicion[libro_id] = (self.reciente, fila)
+
+    def compactar(self):
+        """Une el segmento reciente con el principal"""
+        with self._bloqueo:
+            self._compactar()
+
+    def _compactar(self):
+        vivos = self.principal.vectores_vivos()
+        vivos.extend((libro_id, indices, pesos) for libro_id, (indices, pesos) in self._pendientes.items())
+        vivos.sort(key=lambda v: v[0])
+        self._instalar(Segmento.construir(vivos, self.dimension))
+
+    def _instalar(self, principal: Segmento):
+        self.principal = principal
+        self.reciente = Segmento.construir([], self.dimension)
+        self._pendientes = {}
+        self._posicion = {libro_id: (principal, fila) for fila, libro_id in enumerate(principal.ids.tolist())}
+
+    # ------------------------------------------------------------------ consultas
+
+    def similares(self, libro_id: int, n: int = 10) -> List[Tuple[int, float]]:
+        """Los `n` libros más parecidos a `libro_id`: (libro_id, coseno)"""
+        with self._bloqueo:
+            posicion = self._posicion.get(libro_id)
+            if posicion is None:
+                return []
+            segmento, fila = posicion
+            indices, pesos = segmento.vector(fila)
+        return self._vecinos(indices, pesos, n, excluir=libro_id)
+
+    def buscar(self, texto: str, n: int = 10) -> List[Tuple[int, float]]:
+        """Los `n` libros más parecidos a un texto libre"""
+        indices, frecuencias = self._terminos((None, texto, None, None, None, None))
+        if not len(indices):
+            return []
+        return self._vecinos(*self._vectorizar(indices, frecuencias), n)
+
+    def _vecinos(self, indices, pesos, n: int, excluir: Optional[int] = None) -> List[Tuple[int, float]]:
+        if len(pesos) > self.terminos_consulta:
+            mejores = np.argpartition(-pesos, self.terminos_consulta)[:self.terminos_consulta]
+            indices, pesos = indices[mejores], pesos[mejores]
+        with self._bloqueo:
+            segmentos = (self.principal, self.reciente)
+        ids, puntos = [], []
+        for segmento in segmentos:
+            filas, puntuaciones = segmento.puntuar(indices, pesos, self.max_postings)
+            ids.append(segmento.ids[filas])
+            puntos.append(puntuaciones)
+        ids, puntos = np.concatenate(ids), np.concatenate(puntos)
+        if excluir is not None:
+            otros = ids != excluir
+            ids, puntos = ids[otros], puntos[otros]
+        if len(puntos) > n:
+            mejores = np.argpartition(-puntos, n)[:n]
+            ids, puntos = ids[mejores], puntos[mejores]
+        orden = np.argsort(-puntos, kind='stable')
+        return [(int(libro_id), round(float(p), 6)) for libro_id, p in zip(ids[orden], puntos[orden])]
+
+    # ------------------------------------------------------------------ persistencia
+
+    def guardar(self, ruta: str):
+        """Guarda el índice (compactado) e IDF en un .npz"""
+        with self._bloqueo:
+            self._compactar()
+            principal = self.principal
+            np.savez(ruta, ids=principal.ids, indptr=principal.indptr, indices=principal.indices,
+                     pesos=principal.pesos, idf=self.idf, marca=np.int64(self.marca_libro_id))
+
+    def cargar(self, ruta: str) -> "IndiceSimilitud":
+        with np.load(ruta) as datos:
+            if len(datos['idf']) != self.dimension:
+                raise ValueError(f"El índice guardado usa dimensión {len(datos['idf'])}, no {self.dimension}")
+            principal = Segmento(datos['ids'], datos['indptr'], datos['indices'], datos['pesos'], self.dimension)
+            with self._bloqueo:
+                self.idf = datos['idf']
+                self.marca_libro_id = int(datos['marca'])
+                self._instalar(principal)
+        return self
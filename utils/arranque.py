@@ -0,0 +1,113 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+class ModuloPerezoso:
+    """
+    Módulo que se importa en el primer acceso a uno de sus atributos.
+
+    `mysql = ModuloPerezoso("mysql")` permite seguir escribiendo
+    `mysql.connector.connect(...)` o `except mysql.connector.Error` sin pagar
+    la importación hasta que se usa: si un atributo no existe en el módulo se
+    intenta importar como submódulo. importlib.import_module toma el cerrojo
+    de importación, así que es seguro usarlo a la vez que el precalentado.
+    """
+    __slots__ = ('_nombre', '_modulo')
+
+    def __init__(self, nombre: str):
+        self._nombre = nombre
+        self._modulo = None
+
+    def _cargar(self):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nombre)
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        modulo = self._cargar()
+        try:
+            return getattr(modulo, atributo)
+        except AttributeError:
+            try:
+                return importlib.import_module(f"{self._nombre}.{atributo}")
+            except ModuleNotFoundError:
+                raise AttributeError(f"módulo '{self._nombre}' no tiene el atributo '{atributo}'") from None
+
+    def __repr__(self):
+        estado = "cargado" if self._modulo is not None else "pendiente"
+        return f"<ModuloPerezoso {self._nombre} ({estado})>"
+
+
+class PerfilArranque:
+    """
+    Marcas de tiempo del arranque desde `inicio` (perf_counter tomado en la
+    primera línea del punto de entrada): fin de las importaciones, primer
+    pintado y, si se piden, la duración del trabajo diferido (importaciones
+    perezosas, conexión) medido después.
+    """
+
+    def __init__(self, inicio: Optional[float] = None):
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self.marcas: List[Tuple[str, float]] = []
+        self.diferidos: List[Tuple[str, float]] = []
+
+    def marcar(self, nombre: str, instante: Optional[float] = None):
+        """Registra el tiempo desde el inicio hasta `instante` (por defecto, ahora)"""
+        instante = instante if instante is not None else time.perf_counter()
+        self.marcas.append((nombre, instante - self.inicio))
+
+    @contextmanager
+    def medir(self, nombre: str):
+        """Mide la duración de un trabajo diferido"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.diferidos.append((nombre, time.perf_counter() - inicio))
+
+    def informe(self, salida=None):
+        """Escribe las marcas y el trabajo diferido medido"""
+        salida = salida or sys.stderr
+        salida.write("\n=== Perfil de arranque ===\n")
+        for nombre, segundos in self.marcas:
+            salida.write(f"{nombre:<40}{segundos * 1000:>10.1f} ms\n")
+        if self.diferidos:
+            salida.write("--- Trabajo diferido (fuera del arranque) ---\n")
+            for nombre, segundos in self.diferidos:
+                salida.write(f"{nombre:<40}{segundos * 1000:>10.1f} ms\n")
+        salida.write(f"{'módulos cargados':<40}{len(sys.modules):>10}\n")
+        salida.flush()
+
+
+def importar(modulos: Iterable[str], perfil: Optional[PerfilArranque] = None):
+    """Importa los módulos indicados, midiendo cada uno si se pasa un perfil"""
+    for modulo in modulos:
+        if modulo in sys.modules:
+            continue
+        try:
+            if perfil is None:
+                importlib.import_module(modulo)
+            else:
+                with perfil.medir(f"import {modulo}"):
+                    importlib.import_module(modulo)
+        except ImportError as e:
+            logging.warning(f"No se pudo precargar {modulo}: {e}")
+
+
+def precalentar(modulos: Iterable[str], al_terminar: Optional[Callable[[], None]] = None) -> threading.Thread:
+    """Importa los módulos en un hilo de fondo y devuelve el hilo (daemon)"""
+    modulos = list(modulos)
+
+    def tarea():
+        importar(modulos)
+        if al_terminar is not None:
+            al_terminar()
+
+    hilo = threading.Thread(target=tarea, name="precalentado", daemon=True)
+    hilo.start()
+    return hilo
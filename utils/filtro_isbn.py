@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import math
+import os
+import struct
+from typing import Callable, Iterable, Optional, Set
+
+
+class FiltroISBN:
+    """
+    Conjunto de pertenencia de ISBN: filtro de Bloom con verificación exacta.
+
+    El filtro responde en O(1) "seguro que no está" para la inmensa mayoría
+    de ISBN nuevos. Solo cuando el filtro dice "quizá" se confirma con el
+    conjunto exacto de la sesión, el conjunto completo (si se activó) o una
+    consulta puntual a la base de datos.
+    """
+
+    MAGIC = b'BLMISBN1'
+    CABECERA = struct.Struct('<8sQIQQ')  # magic, bits, hashes, elementos, marca libro_id
+
+    def __init__(self, capacidad: int = 1_000_000, tasa_error: float = 0.001,
+                 consultar: Optional[Callable[[str], bool]] = None):
+        capacidad = max(capacidad, 1)
+        self.num_bits = max(8, int(-capacidad * math.log(tasa_error) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.capacidad = capacidad
+        self.elementos = 0
+        self.marca_libro_id = 0
+        # Función que confirma contra la base de datos un "quizá" del filtro
+        self.consultar = consultar
+        self.consultas_bd = 0
+        self._sesion: Set[str] = set()
+        self._exacto: Optional[Set[str]] = None
+
+    def _posiciones(self, isbn: str):
+        """Posiciones de bit por doble hashing a partir de un único digest"""
+        digest = hashlib.blake2b(isbn.encode('ascii', 'ignore'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def agregar(self, isbn: str, en_sesion: bool = True):
+        """Añade un ISBN al filtro (y al conjunto exacto de la sesión)"""
+        for pos in self._posiciones(isbn):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.elementos += 1
+        if en_sesion:
+            self._sesion.add(isbn)
+        if self._exacto is not None:
+            self._exacto.add(isbn)
+
+    def quiza_contiene(self, isbn: str) -> bool:
+        """Consulta solo el filtro de Bloom: False es definitivo, True puede ser falso positivo"""
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(isbn))
+
+    def contiene(self, isbn: str) -> bool:
+        """Pertenencia exacta: filtro primero y verificación solo ante un posible positivo"""
+        if not self.quiza_contiene(isbn):
+            return False
+        if isbn in self._sesion:
+            return True
+        if self._exacto is not None:
+            return isbn in self._exacto
+        if self.consultar is None:
+            return True
+        self.consultas_bd += 1
+        return self.consultar(isbn)
+
+    __contains__ = contiene
+
+    def activar_exacto(self, isbns: Iterable[str]):
+        """Carga el conjunto exacto completo (para lotes con muchos positivos)"""
+        self._exacto = set(isbns) | self._sesion
+
+    def generar_unico(self, generador: Callable[[], str], intentos: int = 100) -> str:
+        """Genera ISBN con `generador` hasta encontrar uno que no exista y lo reserva"""
+        for _ in range(intentos):
+            isbn = generador()
+            if not self.contiene(isbn):
+                self.agregar(isbn)
+                return isbn
+        raise RuntimeError(f"No se pudo generar un ISBN único tras {intentos} intentos")
+
+    @property
+    def saturado(self) -> bool:
+        """True si el filtro supera su capacidad y la tasa de error ya no es la prevista"""
+        return self.elementos > self.capacidad
+
+    def guardar(self, ruta: str):
+        """Persiste el filtro (sin los conjuntos exactos) para la siguiente ejecución"""
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(self.CABECERA.pack(self.MAGIC, self.num_bits, self.num_hashes,
+                                       self.elementos, self.marca_libro_id))
+            f.write(self.bits)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str, consultar: Optional[Callable[[str], bool]] = None) -> Optional["FiltroISBN"]:
+        """Carga un filtro persistido; devuelve None si no existe o no es válido"""
+        try:
+            with open(ruta, 'rb') as f:
+                cabecera = f.read(cls.CABECERA.size)
+                magic, num_bits, num_hashes, elementos, marca = cls.CABECERA.unpack(cabecera)
+                if magic != cls.MAGIC:
+                    return None
+                bits = bytearray(f.read())
+        except (OSError, struct.error):
+            return None
+        if len(bits) != (num_bits + 7) // 8:
+            return None
+
+        filtro = cls.__new__(cls)
+        filtro.num_bits = num_bits
+        filtro.num_hashes = num_hashes
+        filtro.bits = bits
+        filtro.capacidad = max(1, round(num_bits * (math.log(2) ** 2) / -math.log(0.001)))
+        filtro.elementos = elementos
+        filtro.marca_libro_id = marca
+        filtro.consultar = consultar
+        filtro.consultas_bd = 0
+        filtro._sesion = set()
+        filtro._exacto = None
+        return filtro
+
+    @classmethod
+    def desde_bd(cls, conn, ruta: Optional[str] = None, tasa_error: float = 0.001) -> "FiltroISBN":
+        """
+        Construye el filtro a partir de libros.isbn.
+
+        Si hay un filtro persistido en `ruta` solo se añaden los libros con
+        libro_id posterior a su marca; si está saturado se reconstruye.
+        """
+        def consultar(isbn: str) -> bool:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM libros WHERE isbn = %s LIMIT 1", (isbn,))
+                return cursor.fetchone() is not None
+            finally:
+                cursor.close()
+
+        cursor = conn.cursor()
+        try:
+            filtro = cls.cargar(ruta, consultar) if ruta else None
+            if filtro is None or filtro.saturado:
+                cursor.execute("SELECT COUNT(*) FROM libros")
+                total = cursor.fetchone()[0]
+                filtro = cls(capacidad=max(2 * total, 100_000), tasa_error=tasa_error, consultar=consultar)
+        finally:
+            cursor.close()
+        filtro.sincronizar(conn)
+        return filtro
+
+    def sincronizar(self, conn) -> int:
+        """
+        Añade los libros con libro_id posterior a la marca y la avanza.
+
+        Tras insertar un lote, los ISBN que ya se añadieron en la sesión no
+        se vuelven a contar en `elementos`. Devuelve cuántos ISBN se añadieron.
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT libro_id, isbn FROM libros WHERE libro_id > %s AND isbn IS NOT NULL",
+                           (self.marca_libro_id,))
+            nuevos = 0
+            for libro_id, isbn in cursor:
+                if isbn not in self._sesion:
+                    self.agregar(isbn, en_sesion=False)
+                    nuevos += 1
+                self.marca_libro_id = max(self.marca_libro_id, libro_id)
+            logging.info(f"Filtro ISBN: {nuevos} ISBN añadidos desde libros "
+                         f"({self.elementos} en total, {self.num_bits // 8:,} bytes)")
+            return nuevos
+        finally:
+            cursor.close()
+
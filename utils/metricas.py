@@ -0,0 +1,99 @@
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+class MetricasImportacion:
+    """
+    Temporizadores por etapa, contadores y progreso en vivo de una importación.
+
+    Los tiempos se acumulan por nombre de etapa (http, parseo, insercion,
+    commit...) y los contadores son enteros libres (peticiones, bytes,
+    filas_insertadas...). Al terminar, `guardar` añade un resumen JSON por
+    ejecución a un fichero JSONL para poder comparar importaciones.
+    """
+
+    def __init__(self, salida=None, intervalo: float = 0.5):
+        self.salida = salida or sys.stderr
+        self.intervalo = intervalo
+        self.inicio = time.perf_counter()
+        self.fecha_inicio = datetime.now().isoformat(timespec='seconds')
+        self.tiempos: Dict[str, float] = defaultdict(float)
+        self.contadores: Dict[str, int] = defaultdict(int)
+        self.etapas: Dict[str, Dict[str, Any]] = {}
+        self._ultimo_progreso = 0.0
+        self._progreso_activo = False
+
+    @contextmanager
+    def medir(self, etapa: str):
+        """Acumula el tiempo del bloque en la etapa indicada"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[etapa] += time.perf_counter() - inicio
+
+    def sumar(self, contador: str, cantidad: int = 1):
+        """Incrementa un contador"""
+        self.contadores[contador] += cantidad
+
+    def registrar_etapa(self, etapa: str, filas: int, segundos: float):
+        """Registra la duración y el rendimiento (filas/s) de una etapa completa"""
+        velocidad = filas / segundos if segundos > 0 else float('inf')
+        self.tiempos[etapa] += segundos
+        self.etapas[etapa] = {'filas': filas, 'segundos': round(segundos, 4),
+                              'filas_por_segundo': round(velocidad, 1) if segundos > 0 else None}
+        logging.info(f"Etapa {etapa}: {filas} filas en {segundos:.3f} s ({velocidad:,.0f} filas/s)")
+
+    def progreso(self, etapa: str, hecho: int, total: int, forzar: bool = False):
+        """Muestra una línea de progreso con velocidad y ETA (limitada a un refresco por intervalo)"""
+        ahora = time.perf_counter()
+        if not forzar and ahora - self._ultimo_progreso < self.intervalo:
+            return
+        if not self.salida.isatty():
+            return
+        self._ultimo_progreso = ahora
+
+        inicio = self.etapas.setdefault(f"_progreso_{etapa}", {'inicio': ahora})['inicio']
+        transcurrido = ahora - inicio
+        velocidad = hecho / transcurrido if transcurrido > 0 else 0
+        porcentaje = 100 * hecho / total if total else 100
+        eta = (total - hecho) / velocidad if velocidad > 0 else 0
+        self.salida.write(f"\r[{etapa}] {hecho}/{total} ({porcentaje:5.1f}%) "
+                          f"{velocidad:,.0f}/s ETA {int(eta) // 60:02d}:{int(eta) % 60:02d}   ")
+        self.salida.flush()
+        self._progreso_activo = True
+
+    def terminar_progreso(self):
+        """Cierra la línea de progreso en curso"""
+        if self._progreso_activo:
+            self.salida.write("\n")
+            self.salida.flush()
+            self._progreso_activo = False
+
+    def resumen(self, **extra) -> Dict[str, Any]:
+        """Resumen serializable de la ejecución"""
+        return {
+            'inicio': self.fecha_inicio,
+            'duracion_s': round(time.perf_counter() - self.inicio, 4),
+            'tiempos_s': {etapa: round(t, 4) for etapa, t in self.tiempos.items()},
+            'contadores': dict(self.contadores),
+            'etapas': {etapa: datos for etapa, datos in self.etapas.items()
+                       if not etapa.startswith('_progreso_')},
+            **extra
+        }
+
+    def guardar(self, ruta: Optional[str], **extra) -> Dict[str, Any]:
+        """Registra el resumen en el log y lo añade como una línea JSON a `ruta`"""
+        self.terminar_progreso()
+        resumen = self.resumen(**extra)
+        logging.info(f"Resumen de importación: {json.dumps(resumen, ensure_ascii=False)}")
+        if ruta:
+            with open(ruta, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(resumen, ensure_ascii=False) + "\n")
+        return resumen
@@ -0,0 +1,116 @@
+import shutil
+import sys
+from decimal import Decimal
+from itertools import chain, islice
+from typing import Callable, Iterable, List, Optional, Sequence
+
+NUMERICOS = (int, float, Decimal)
+
+
+class TablaPaginada:
+    """
+    Tabla de texto que se imprime a medida que llegan las filas.
+
+    Los anchos de columna salen de las primeras `muestra` filas (con tope
+    `ancho_max`; lo que no cabe se recorta con "…"), así que la primera
+    página aparece sin esperar al resto del resultado y la memoria no
+    depende del número de filas. Con una terminal interactiva se detiene
+    cada `filas_por_pagina` filas y espera Enter (o "q" para terminar).
+    """
+
+    def __init__(self, encabezados: Sequence[str], muestra: int = 200, ancho_max: int = 40,
+                 filas_por_pagina: Optional[int] = None, salida=None,
+                 entrada: Callable[[str], str] = input, interactivo: Optional[bool] = None):
+        self.encabezados = [str(e) for e in encabezados]
+        self.muestra = muestra
+        self.ancho_max = ancho_max
+        self.salida = salida or sys.stdout
+        self.entrada = entrada
+        if interactivo is None:
+            interactivo = sys.stdin.isatty() and self.salida.isatty()
+        self.interactivo = interactivo
+        if filas_por_pagina is None:
+            # Alto de la terminal menos cabecera, separador y línea de aviso
+            filas_por_pagina = max(5, shutil.get_terminal_size().lines - 6)
+        self.filas_por_pagina = filas_por_pagina
+
+    def mostrar(self, filas: Iterable[Sequence], titulo: str = None) -> int:
+        """Imprime las filas página a página y devuelve cuántas se mostraron"""
+        filas = iter(filas)
+        muestra = list(islice(filas, self.muestra))
+        if not muestra:
+            self.salida.write("No hay datos para mostrar.\n")
+            return 0
+
+        self._medir(muestra)
+        if titulo:
+            self.salida.write(f"\n=== {titulo} ===\n")
+        self.salida.write(self._cabecera())
+
+        mostradas = 0
+        pagina: List[str] = []
+        for fila in chain(muestra, filas):
+            pagina.append(self._linea(fila))
+            mostradas += 1
+            if len(pagina) == self.filas_por_pagina:
+                self.salida.write("\n".join(pagina) + "\n")
+                self.salida.flush()
+                pagina.clear()
+                if self.interactivo and not self._continuar(mostradas):
+                    break
+        if pagina:
+            self.salida.write("\n".join(pagina) + "\n")
+        self.salida.write(self._separador + "\n")
+        self.salida.write(f"{mostradas} filas mostradas\n")
+        self.salida.flush()
+        return mostradas
+
+    def _medir(self, muestra: List[Sequence]):
+        anchos = [len(e) for e in self.encabezados]
+        alinear_derecha = [True] * len(self.encabezados)
+        for fila in muestra:
+            for i, valor in enumerate(fila):
+                anchos[i] = max(anchos[i], len(self._texto(valor)))
+                if valor is not None and not isinstance(valor, NUMERICOS):
+                    alinear_derecha[i] = False
+        self.anchos = [min(ancho, self.ancho_max) for ancho in anchos]
+        self._formateadores = [self._formateador(ancho, derecha)
+                               for ancho, derecha in zip(self.anchos, alinear_derecha)]
+        self._separador = "+" + "+".join("-" * (ancho + 2) for ancho in self.anchos) + "+"
+
+    def _cabecera(self) -> str:
+        celdas = [self._recortar(e, ancho).ljust(ancho) for e, ancho in zip(self.encabezados, self.anchos)]
+        doble = self._separador.replace("-", "=")
+        return f"{self._separador}\n| " + " | ".join(celdas) + f" |\n{doble}\n"
+
+    def _formateador(self, ancho: int, derecha: bool) -> Callable[[object], str]:
+        """Función que convierte un valor en la celda ya recortada y alineada de su columna"""
+        ajustar = str.rjust if derecha else str.ljust
+        texto_de = self._texto
+
+        def formatear(valor) -> str:
+            texto = texto_de(valor)
+            if len(texto) > ancho:
+                texto = texto[:ancho - 1] + "…"
+            return ajustar(texto, ancho)
+        return formatear
+
+    def _linea(self, fila: Sequence) -> str:
+        return "| " + " | ".join([formatear(valor) for formatear, valor in zip(self._formateadores, fila)]) + " |"
+
+    def _continuar(self, mostradas: int) -> bool:
+        respuesta = self.entrada(f"-- {mostradas} filas. Enter: siguiente página, q: salir -- ")
+        return respuesta.strip().lower() != "q"
+
+    @staticmethod
+    def _texto(valor) -> str:
+        if valor is None:
+            return ""
+        if type(valor) is str:
+            return valor.replace("\n", " ") if "\n" in valor else valor
+        # str() de date/datetime ya da el formato ISO ("2024-01-31 10:00:00")
+        return str(valor)
+
+    @staticmethod
+    def _recortar(texto: str, ancho: int) -> str:
+        return texto if len(texto) <= ancho else texto[:ancho - 1] + "…"
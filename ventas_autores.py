@@ -0,0 +1,180 @@
+"""
+ventas_autores.py – Ventas de todos los autores en una sola pasada.
+
+total_ventas_autor calcula un autor por llamada; una clasificación de
+autores necesitaría una llamada (y un recorrido de detalles_venta) por
+cada uno. SQL_AGREGADO recorre detalles_venta una vez: agrega primero por
+(libro, periodo), de modo que la unión con libro_autor se hace sobre esos
+totales y no sobre cada línea, y después por (autor, periodo). El coste
+crece linealmente con detalles_venta.
+
+InformeVentasAutores guarda el resultado en memoria (totales por autor y
+por periodo) y lo mantiene al día con actualizar(), que solo agrega los
+detalles con detalle_id posterior a la marca de agua. Como en
+total_ventas_autor, un libro con varios autores suma su importe completo a
+cada uno. Cambios de autoría o ventas borradas no se reflejan hasta el
+siguiente reconstruir().
+
+Ejemplo:
+    informe = InformeVentasAutores(periodo='mes').reconstruir()
+    informe.actualizar()
+    mostrar_tabla(informe.ranking(por='unidades', limite=20, desplazamiento=20))
+"""
+
+import logging
+import threading
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from db_manager import DatabaseManager, FilasCrudas
+
+PERIODOS = {'dia': '%Y-%m-%d', 'mes': '%Y-%m', 'anio': '%Y'}
+
+# Criterio de orden -> posición en [unidades, importe, importe_neto]
+CRITERIOS = {'unidades': 0, 'importe': 1, 'importe_neto': 2}
+
+# (formato de periodo, detalle_id desde (excluido), detalle_id hasta (incluido))
+SQL_AGREGADO = """
+SELECT la.autor_id, d.periodo, SUM(d.unidades), SUM(d.importe), SUM(d.importe_neto)
+FROM (
+    SELECT dv.libro_id, DATE_FORMAT(v.fecha_venta, %s) AS periodo,
+           SUM(dv.cantidad) AS unidades,
+           SUM(dv.cantidad * dv.precio_unitario) AS importe,
+           SUM(dv.cantidad * dv.precio_unitario * (1 - dv.descuento / 100)) AS importe_neto
+    FROM detalles_venta dv
+    JOIN ventas v ON v.venta_id = dv.venta_id
+    WHERE dv.detalle_id > %s AND dv.detalle_id <= %s AND dv.libro_id IS NOT NULL
+    GROUP BY dv.libro_id, periodo
+) AS d
+JOIN libro_autor la ON la.libro_id = d.libro_id
+GROUP BY la.autor_id, d.periodo
+"""
+
+# Último detalle con `retraso` segundos de antigüedad: app.crear_venta inserta la
+# venta y sus detalles en sentencias separadas
+SQL_HASTA = """
+SELECT MAX(detalle_id)
+FROM detalles_venta
+WHERE detalle_id > %s AND created_at <= NOW() - INTERVAL %s SECOND
+"""
+
+COLUMNAS_RANKING = ('posicion', 'autor_id', 'autor', 'unidades', 'importe', 'importe_neto')
+COLUMNAS_AUTOR = ('periodo', 'unidades', 'importe', 'importe_neto')
+
+_CERO = Decimal('0.00')
+
+
+class InformeVentasAutores:
+    """Totales de unidades e importe por autor y por periodo, en memoria"""
+
+    def __init__(self, periodo: str = 'mes', retraso: int = 5):
+        if periodo not in PERIODOS:
+            raise ValueError(f"Periodo desconocido: {periodo} (disponibles: {', '.join(PERIODOS)})")
+        self.db = DatabaseManager()
+        self.periodo = periodo
+        self.retraso = retraso
+        self.marca = 0
+        # autor_id -> [unidades, importe, importe_neto]
+        self.totales: Dict[int, list] = {}
+        # periodo -> autor_id -> [unidades, importe, importe_neto]
+        self.por_periodo: Dict[str, Dict[int, list]] = {}
+        self.nombres: Dict[int, str] = {}
+        self._ordenados: Dict[Tuple[Optional[str], str], List[int]] = {}
+        self._bloqueo = threading.Lock()
+
+    # ------------------------------------------------------------------ carga
+
+    def reconstruir(self) -> "InformeVentasAutores":
+        """Recalcula todo desde detalles_venta"""
+        with self._bloqueo:
+            self.marca = 0
+            self.totales = {}
+            self.por_periodo = {}
+            self._ordenados.clear()
+        self.actualizar()
+        return self
+
+    def actualizar(self) -> int:
+        """Suma los detalles posteriores a la marca; devuelve cuántas filas (autor, periodo) llegaron"""
+        self.db.connect()
+        try:
+            hasta = self.db.fetch_all(SQL_HASTA, (self.marca, self.retraso), crudo=True)
+            hasta = hasta[0][0] if hasta else None
+            if hasta is None:
+                return 0
+            filas = self.db.fetch_all(SQL_AGREGADO, (PERIODOS[self.periodo], self.marca, hasta), crudo=True)
+            nuevos = {autor_id for autor_id, *_ in filas if autor_id not in self.nombres}
+            if nuevos:
+                self._cargar_nombres(nuevos)
+        finally:
+            self.db.disconnect()
+
+        with self._bloqueo:
+            for autor_id, periodo, unidades, importe, importe_neto in filas:
+                valores = (int(unidades or 0), importe or _CERO, importe_neto or _CERO)
+                total = self.totales.setdefault(autor_id, [0, _CERO, _CERO])
+                del_periodo = self.por_periodo.setdefault(periodo, {}).setdefault(autor_id, [0, _CERO, _CERO])
+                for i, valor in enumerate(valores):
+                    total[i] += valor
+                    del_periodo[i] += valor
+            self.marca = hasta
+            if filas:
+                self._ordenados.clear()
+        logging.info(f"Ventas por autor: {len(filas)} filas hasta detalle {hasta}")
+        return len(filas)
+
+    def _cargar_nombres(self, autores):
+        marcadores = ','.join(['%s'] * len(autores))
+        filas = self.db.fetch_all(
+            f"SELECT autor_id, CONCAT(nombre, ' ', apellido) FROM autores WHERE autor_id IN ({marcadores})",
+            tuple(autores), crudo=True
+        )
+        self.nombres.update(filas)
+
+    # ------------------------------------------------------------------ consultas
+
+    def _orden(self, por: str, periodo: Optional[str]) -> List[int]:
+        """Autores ordenados por `por` (descendente), calculado una vez por actualización"""
+        clave = (periodo, por)
+        orden = self._ordenados.get(clave)
+        if orden is None:
+            totales = self.totales if periodo is None else self.por_periodo.get(periodo, {})
+            columna = CRITERIOS[por]
+            orden = sorted(totales, key=lambda autor_id: (-totales[autor_id][columna], autor_id))
+            self._ordenados[clave] = orden
+        return orden
+
+    def ranking(self, por: str = 'importe', limite: Optional[int] = 20, desplazamiento: int = 0,
+                periodo: Optional[str] = None) -> FilasCrudas:
+        """
+        Clasificación de autores por `por` (importe, importe_neto o unidades).
+
+        Sin `periodo` se usa el total acumulado; con él, solo ese periodo
+        (p. ej. '2024-05' con periodo='mes'). `limite` y `desplazamiento`
+        paginan sobre el orden ya calculado.
+        """
+        if por not in CRITERIOS:
+            raise ValueError(f"Criterio desconocido: {por} (disponibles: {', '.join(CRITERIOS)})")
+        with self._bloqueo:
+            orden = self._orden(por, periodo)
+            totales = self.totales if periodo is None else self.por_periodo.get(periodo, {})
+            fin = None if limite is None else desplazamiento + limite
+            filas = [(posicion, autor_id, self.nombres.get(autor_id), *totales[autor_id])
+                     for posicion, autor_id in enumerate(orden[desplazamiento:fin], desplazamiento + 1)]
+        return FilasCrudas(filas, COLUMNAS_RANKING)
+
+    def contar(self, periodo: Optional[str] = None) -> int:
+        """Autores con ventas (en total o en `periodo`), para calcular páginas"""
+        with self._bloqueo:
+            return len(self.totales if periodo is None else self.por_periodo.get(periodo, {}))
+
+    def periodos(self) -> List[str]:
+        with self._bloqueo:
+            return sorted(self.por_periodo)
+
+    def autor(self, autor_id: int) -> FilasCrudas:
+        """Desglose por periodo de un autor, del más antiguo al más reciente"""
+        with self._bloqueo:
+            filas = [(periodo, *autores[autor_id]) for periodo, autores in sorted(self.por_periodo.items())
+                     if autor_id in autores]
+        return FilasCrudas(filas, COLUMNAS_AUTOR)
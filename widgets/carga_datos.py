@@ -0,0 +1,135 @@
+import asyncio
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Hilos para las consultas bloqueantes (mysql.connector) de todas las pantallas
+_ejecutor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="carga_datos")
+
+
+class CacheConsultas:
+    """
+    Resultados por clave y consultas en curso, compartidos por todas las pantallas.
+
+    Si una clave ya se está consultando, `solicitar` devuelve el mismo futuro
+    en lugar de lanzar otra consulta. Cada pantalla que espera una clave
+    cuenta como interesada; cuando la última la abandona (por ejemplo al
+    cerrarse) se cancela la consulta si aún no había empezado.
+    """
+
+    def __init__(self):
+        self.resultados: Dict[Hashable, Tuple[Any, float]] = {}
+        self.en_curso: Dict[Hashable, asyncio.Future] = {}
+        self._interesados: Dict[Hashable, int] = {}
+
+    def obtener(self, clave) -> Optional[Tuple[Any, float]]:
+        """(valor, edad en segundos) del último resultado de `clave`, o None"""
+        entrada = self.resultados.get(clave)
+        if entrada is None:
+            return None
+        valor, instante = entrada
+        return valor, time.monotonic() - instante
+
+    def invalidar(self, prefijo=None):
+        """Olvida los resultados cuyo primer elemento de clave es `prefijo` (todos si es None)"""
+        if prefijo is None:
+            self.resultados.clear()
+            return
+        for clave in [c for c in self.resultados if c == prefijo or (isinstance(c, tuple) and c[0] == prefijo)]:
+            del self.resultados[clave]
+
+    def solicitar(self, clave, funcion: Callable, args: tuple) -> asyncio.Future:
+        """Futuro con el resultado de `funcion(*args)`, reutilizando la consulta en curso"""
+        futuro = self.en_curso.get(clave)
+        if futuro is None:
+            if inspect.iscoroutinefunction(funcion):
+                futuro = asyncio.ensure_future(funcion(*args))
+            else:
+                futuro = asyncio.get_running_loop().run_in_executor(_ejecutor, partial(funcion, *args))
+            futuro.add_done_callback(partial(self._terminar, clave))
+            self.en_curso[clave] = futuro
+        self._interesados[clave] = self._interesados.get(clave, 0) + 1
+        return futuro
+
+    def abandonar(self, clave):
+        """Retira un interesado; sin interesados, la consulta pendiente se cancela"""
+        restantes = self._interesados.get(clave, 0) - 1
+        if restantes > 0:
+            self._interesados[clave] = restantes
+            return
+        self._interesados.pop(clave, None)
+        futuro = self.en_curso.get(clave)
+        if futuro is not None and not futuro.done():
+            futuro.cancel()
+
+    def _terminar(self, clave, futuro: asyncio.Future):
+        if self.en_curso.get(clave) is futuro:
+            del self.en_curso[clave]
+        if futuro.cancelled():
+            return
+        # Recupera la excepción aunque nadie espere ya el resultado
+        if futuro.exception() is None:
+            self.resultados[clave] = (futuro.result(), time.monotonic())
+
+
+CACHE = CacheConsultas()
+
+
+class CargaDatos:
+    """
+    Mixin para pantallas y widgets de Textual que cargan datos fuera del hilo de la UI.
+
+    `cargar_datos(clave, funcion, *args, al_cargar=...)` ejecuta `funcion` en
+    un hilo (o como corrutina si es async) y llama a `al_cargar(valor)` en el
+    hilo de la UI. Si hay un resultado en caché se muestra enseguida y, si
+    tiene más de MAX_EDAD segundos, se revalida en segundo plano
+    (stale-while-revalidate). Mientras no hay datos el destino muestra el
+    indicador de carga; durante una revalidación lleva la clase CSS
+    "-actualizando". Los workers pertenecen al nodo, así que se cancelan al
+    cerrar la pantalla.
+    """
+
+    MAX_EDAD = 30.0
+
+    def cargar_datos(self, clave, funcion: Callable, *args, al_cargar: Callable[[Any], None],
+                     destino=None, max_edad: Optional[float] = None):
+        destino = destino if destino is not None else self
+        max_edad = self.MAX_EDAD if max_edad is None else max_edad
+
+        en_cache = CACHE.obtener(clave)
+        if en_cache is not None:
+            valor, edad = en_cache
+            al_cargar(valor)
+            if edad <= max_edad:
+                return None
+            destino.add_class("-actualizando")
+        else:
+            destino.loading = True
+
+        return self.run_worker(
+            self._esperar_datos(clave, funcion, args, al_cargar, destino),
+            name=f"carga {clave}", group=f"carga {clave}", exclusive=True, exit_on_error=False
+        )
+
+    async def _esperar_datos(self, clave, funcion, args, al_cargar, destino):
+        futuro = CACHE.solicitar(clave, funcion, args)
+        try:
+            # shield: cancelar este worker no cancela la consulta compartida
+            valor = await asyncio.shield(futuro)
+        except Exception as e:
+            logging.error(f"Error al cargar {clave}: {e}")
+            self.notify(f"No se pudieron cargar los datos ({e})", severity="error")
+            return
+        finally:
+            CACHE.abandonar(clave)
+            if destino.is_mounted:
+                destino.loading = False
+                destino.remove_class("-actualizando")
+        al_cargar(valor)
+
+    def on_unmount(self) -> None:
+        # Al cerrar la pantalla no se espera ninguna carga pendiente
+        self.workers.cancel_node(self)
@@ -0,0 +1,116 @@
+import logging
+
+from textual import work
+from feed_cambios import ConsumidorCambios
+
+
+class RefrescoIncremental:
+    """
+    Mixin para DataTable que aplica cambios por parches en lugar de recargar.
+
+    Cada INTERVALO_REFRESCO segundos lee de log_cambios los cambios
+    posteriores a la marca de agua (cambio_id), pide al controlador
+    (ConsultaCambios.obtener_cambios) las filas que afectan y toma las
+    borradas de los DELETE del propio feed, así que el coste de cada ciclo
+    depende de los cambios y no del tamaño de la tabla. Luego actualiza
+    celdas, inserta filas nuevas y elimina las borradas por clave, sin
+    clear(), por lo que la posición del cursor y del scroll se conserva.
+
+    La clase que lo usa guarda las claves de columna en `self.claves_columnas`,
+    usa la clave primaria como clave de fila y puede redefinir `celdas(fila)`.
+    El worker crea su propio controlador: el DatabaseManager de
+    `self.controller` sustituye y cierra su conexión en cada llamada y no
+    puede compartirse con otros hilos.
+    """
+
+    INTERVALO_REFRESCO = 5.0
+
+    def iniciar_refresco(self, marca):
+        """Activa el refresco periódico a partir de la marca de agua de la carga inicial"""
+        self._feed_cambios = ConsumidorCambios(marca=marca) if marca is not None else None
+        if getattr(self, "_temporizador_refresco", None) is None:
+            self._temporizador_refresco = self.set_interval(self.INTERVALO_REFRESCO, self.refrescar_cambios)
+
+    def refrescar_cambios(self):
+        """Busca cambios en segundo plano y los aplica sobre la tabla"""
+        feed = getattr(self, "_feed_cambios", None)
+        if feed is None or getattr(self, "_buscando_cambios", False):
+            return
+        # Un solo ciclo a la vez: el feed y su marca no se comparten entre hilos
+        self._buscando_cambios = True
+        self._buscar_cambios(feed)
+
+    @work(thread=True, exclusive=True, group="refresco")
+    def _buscar_cambios(self, feed):
+        controller = type(self.controller)()
+        filas, borradas = {}, set()
+        try:
+            while True:
+                cambios = feed.leer()
+                if not cambios:
+                    break
+                leidas = controller.obtener_cambios(cambios)
+                if leidas is None:
+                    # Se reintenta desde la misma marca en el siguiente ciclo
+                    break
+                for fila in leidas[0]:
+                    filas[fila[0]] = fila
+                    borradas.discard(fila[0])
+                for clave in leidas[1]:
+                    filas.pop(clave, None)
+                    borradas.add(clave)
+                feed.confirmar(cambios)
+                if len(cambios) < feed.lote:
+                    break
+        except Exception:
+            logging.exception("Error al leer log_cambios para el refresco")
+        finally:
+            feed.cerrar()
+
+        filas, borradas = list(filas.values()), sorted(borradas)
+        if filas or borradas:
+            self.cambios_recibidos(controller, filas, borradas)
+        self.app.call_from_thread(self._aplicar_cambios, filas, borradas)
+
+    def _aplicar_cambios(self, filas, borradas):
+        self._buscando_cambios = False
+        for clave in borradas:
+            # La fila puede no estar en la tabla (otra página o fuera de la ventana)
+            if str(clave) not in self.rows:
+                continue
+            self.remove_row(str(clave))
+            self.fila_eliminada(clave)
+        for fila in filas:
+            clave = str(fila[0])
+            celdas = self.celdas(fila)
+            if clave in self.rows:
+                for columna, valor in zip(self.claves_columnas, celdas):
+                    self.update_cell(clave, columna, valor)
+                self.fila_actualizada(fila)
+            elif self.admite_fila_nueva(fila):
+                self.add_row(*celdas, key=clave)
+                self.fila_agregada(fila)
+
+    def celdas(self, fila):
+        """Convierte una fila cruda en los valores de celda de la tabla (texto de cada columna)"""
+        return tuple("" if valor is None else str(valor) for valor in fila)
+
+    def admite_fila_nueva(self, fila) -> bool:
+        """Indica si una fila nueva debe añadirse a la vista actual"""
+        return True
+
+    def cambios_recibidos(self, controller, filas, borradas):
+        """
+        Se llama en el hilo del worker, con su controlador, antes de aplicar
+        los parches; lo que modifique estado de la interfaz debe pasar por
+        `self.app.call_from_thread`.
+        """
+
+    def fila_agregada(self, fila):
+        """Se llama tras añadir una fila nueva"""
+
+    def fila_actualizada(self, fila):
+        """Se llama tras actualizar las celdas de una fila existente"""
+
+    def fila_eliminada(self, clave):
+        """Se llama tras eliminar una fila borrada en la base de datos"""
@@ -0,0 +1,30 @@
+from textual.widgets import DataTable
+from controllers import ClienteController
+from widgets.carga_datos import CargaDatos
+from widgets.refresco import RefrescoIncremental
+
+
+class TablaClientes(CargaDatos, RefrescoIncremental, DataTable):
+    """Listado de clientes con refresco incremental por marca de agua"""
+
+    def on_mount(self):
+        self.controller = ClienteController()
+        self.claves_columnas = self.add_columns("ID", "Nombre", "Apellido", "Email", "Ciudad")
+        self.cargar()
+
+    def cargar(self):
+        self.cargar_datos(("clientes", "listado"), self.controller.obtener_listado, al_cargar=self._mostrar)
+
+    def _mostrar(self, listado):
+        filas, marca = listado
+        cursor = self.cursor_row
+        self.clear()
+        for fila in filas:
+            self.add_row(*self.celdas(fila), key=str(fila[0]))
+        if 0 <= cursor < len(filas):
+            self.move_cursor(row=cursor)
+        self.iniciar_refresco(marca)
+
+    def celdas(self, fila):
+        cliente_id, nombre, apellido, email, ciudad = fila
+        return str(cliente_id), nombre, apellido, email, ciudad or ""
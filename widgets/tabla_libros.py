@@ -1,18 +1,215 @@
+import threading
+
+from textual import work
 from textual.widgets import DataTable
 from controllers import LibroController
+from widgets.refresco import RefrescoIncremental
+
+COLUMNAS = ("libro_id", "titulo", "autores", "precio", "stock")
+
+
+class TablaLibros(RefrescoIncremental, DataTable):
+    """
+    Tabla de libros virtualizada.
+
+    Solo mantiene en el DataTable una ventana de filas: la página visible más
+    un margen de precarga. Al acercarse a un borde pide la página siguiente
+    o la anterior (por libro_id contra MySQL, o por posición si la tabla
+    muestra un filtro del catálogo en memoria) y descarta las filas que
+    quedan lejos para que la memoria no crezca con el catálogo.
+
+    Los cambios hechos en MySQL después de la carga se aplican como parches
+    sobre las filas de la ventana (RefrescoIncremental).
+
+    filtrar() construye o refresca el catálogo en memoria en un worker; el
+    primer catálogo se carga aparte y solo se publica en `self.catalogo` al
+    terminar. Desde entonces `_bloqueo_catalogo` serializa el refresco del
+    worker con la paginación y los parches que hace la interfaz.
+    """
+
+    TAMANO_PAGINA = 100   # Filas por petición
+    MARGEN = 40           # Filas de precarga antes de llegar a un borde
+    MAX_FILAS = 400       # Filas máximas en la ventana
 
-class TablaLibros(DataTable):
     def on_mount(self):
         self.controller = LibroController()
-        self.add_columns("ID", "Título", "Autor", "Precio", "Stock")
+        self.catalogo = None
+        self._bloqueo_catalogo = threading.Lock()
+        self._filtro = 0          # Número del último filtro pedido (descarta resultados viejos)
+        self.claves_columnas = self.add_columns("ID", "Título", "Autor", "Precio", "Stock")
         self.cargar()
 
     def cargar(self):
-        for libro in self.controller.obtener_todos():
-            self.add_row(
-                str(libro["libro_id"]),
-                libro["titulo"],
-                libro["autores"],
-                f"{libro['precio']:.2f}",
-                str(libro["stock"])
-            )
+        """Muestra el catálogo completo desde MySQL empezando por la primera página"""
+        self._filtro += 1
+        self.loading = False
+        self._posiciones = None
+        self._reiniciar()
+        self._pedir_pagina(hacia_atras=False)
+
+    def filtrar(self, orden=None, descendente=False, **filtros):
+        """Filtra y reordena la tabla desde el catálogo columnar en memoria, en segundo plano"""
+        self._filtro += 1
+        self.loading = True
+        self._calcular_filtro(self._filtro, orden, descendente, filtros)
+
+    @work(thread=True, exclusive=True, group="filtro_libros")
+    def _calcular_filtro(self, filtro, orden, descendente, filtros):
+        # Controlador propio, como en _cargar_pagina
+        controller = LibroController()
+        catalogo = self.catalogo
+        if catalogo is None:
+            from catalogo import CatalogoColumnar
+
+            catalogo = CatalogoColumnar(controller.consultar_crudo)
+        with self._bloqueo_catalogo:
+            catalogo.refrescar(controller.consultar_crudo)
+            posiciones = catalogo.filtrar(**filtros)
+            if orden:
+                posiciones = catalogo.ordenar(posiciones, orden, descendente)
+        self.app.call_from_thread(self._mostrar_filtro, filtro, catalogo, posiciones)
+
+    def _mostrar_filtro(self, filtro, catalogo, posiciones):
+        if filtro != self._filtro:
+            # Llegó después de otro filtro o de volver al catálogo completo
+            return
+        self.loading = False
+        self.catalogo = catalogo
+        self._posiciones = posiciones
+        self._reiniciar()
+        self._pedir_pagina(hacia_atras=False)
+
+    def _reiniciar(self):
+        self._filas = []          # Ventana actual de filas (tuplas COLUMNAS)
+        self._inicio = 0          # Posición global de la primera fila de la ventana
+        self._hay_mas_adelante = True
+        self._hay_mas_atras = False
+        self._cargando = False
+        self.clear()
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        self._comprobar_bordes()
+
+    def _comprobar_bordes(self):
+        """Pide otra página si la zona visible se acerca a un extremo de la ventana"""
+        if getattr(self, "_cargando", True) or not self._filas:
+            return
+        primera_visible = int(self.scroll_y)
+        ultima_visible = primera_visible + self.size.height
+        if self._hay_mas_adelante and ultima_visible + self.MARGEN >= len(self._filas):
+            self._pedir_pagina(hacia_atras=False)
+        elif self._hay_mas_atras and primera_visible < self.MARGEN:
+            self._pedir_pagina(hacia_atras=True)
+
+    def _pedir_pagina(self, hacia_atras: bool):
+        self._cargando = True
+        if self._posiciones is not None:
+            # Filtro del catálogo en memoria: páginas por posición, sin MySQL
+            if hacia_atras:
+                inicio = max(0, self._inicio - self.TAMANO_PAGINA)
+                fin = self._inicio
+            else:
+                inicio = self._inicio + len(self._filas)
+                fin = inicio + self.TAMANO_PAGINA
+            with self._bloqueo_catalogo:
+                filas = self.catalogo.filas(self._posiciones[inicio:fin], COLUMNAS)
+            self._aplicar_pagina(filas, hacia_atras)
+        elif hacia_atras:
+            self._cargar_pagina(antes_de=self._filas[0][0])
+        else:
+            self._cargar_pagina(despues_de=self._filas[-1][0] if self._filas else 0)
+
+    @work(thread=True, exclusive=True, group="paginas_libros")
+    def _cargar_pagina(self, despues_de=None, antes_de=None):
+        # Controlador propio: self.controller es del hilo de la interfaz
+        controller = LibroController()
+        if despues_de == 0:
+            # Primera página: la marca de agua se toma antes de leerla
+            self.app.call_from_thread(self.iniciar_refresco, controller.marca_actual())
+        filas = controller.obtener_pagina(despues_de, antes_de, self.TAMANO_PAGINA)
+        self.app.call_from_thread(self._aplicar_pagina, filas, antes_de is not None)
+
+    def _aplicar_pagina(self, filas, hacia_atras: bool):
+        """Incorpora una página a la ventana y descarta las filas lejanas del otro extremo"""
+        self._cargando = False
+        if filas and hasattr(filas, "columnas"):
+            filas = list(map(filas.columnas.getter(*COLUMNAS), filas))
+        if len(filas) < self.TAMANO_PAGINA:
+            if hacia_atras:
+                self._hay_mas_atras = False
+            else:
+                self._hay_mas_adelante = False
+        if not filas:
+            return
+
+        if hacia_atras:
+            self._filas = list(filas) + self._filas
+            self._inicio -= len(filas)
+            sobrantes = len(self._filas) - self.MAX_FILAS
+            if sobrantes > 0:
+                del self._filas[-sobrantes:]
+                self._hay_mas_adelante = True
+            self._renderizar(desplazamiento=len(filas))
+            return
+
+        self._filas.extend(filas)
+        sobrantes = len(self._filas) - self.MAX_FILAS
+        if sobrantes > 0:
+            del self._filas[:sobrantes]
+            self._inicio += sobrantes
+            self._hay_mas_atras = True
+            self._renderizar(desplazamiento=-sobrantes)
+        else:
+            self._agregar_filas(filas)
+        self._comprobar_bordes()
+
+    def _renderizar(self, desplazamiento: int):
+        """Redibuja la ventana manteniendo a la vista la misma fila que antes"""
+        scroll = self.scroll_y
+        cursor = self.cursor_row
+        # Evita que los cambios de scroll del redibujado pidan más páginas
+        self._cargando = True
+        self.clear()
+        self._agregar_filas(self._filas)
+        self.scroll_to(y=max(0, scroll + desplazamiento), animate=False)
+        if cursor >= 0:
+            self.move_cursor(row=max(0, min(len(self._filas) - 1, cursor + desplazamiento)))
+        self._cargando = False
+
+    def _agregar_filas(self, filas):
+        for fila in filas:
+            self.add_row(*self.celdas(fila), key=str(fila[0]))
+
+    def celdas(self, fila):
+        libro_id, titulo, autores, precio, stock = fila
+        return str(libro_id), titulo, autores, f"{precio:.2f}", str(stock)
+
+    def cambios_recibidos(self, controller, filas, borradas):
+        # Mantiene el catálogo en memoria al día para los próximos filtros: se
+        # lee con la conexión del worker y se escribe en el hilo de la interfaz
+        catalogo = self.catalogo
+        ids = [fila[0] for fila in filas] + borradas
+        if catalogo is not None and ids:
+            leidas = catalogo.leer_ids(ids, controller.consultar_crudo)
+            self.app.call_from_thread(self._aplicar_catalogo, catalogo, ids, leidas)
+
+    def _aplicar_catalogo(self, catalogo, ids, leidas):
+        with self._bloqueo_catalogo:
+            catalogo.aplicar_ids(ids, leidas)
+
+    def admite_fila_nueva(self, fila) -> bool:
+        # Solo si la ventana ya llega al final del listado por libro_id
+        return self._posiciones is None and not self._hay_mas_adelante and not self._cargando
+
+    def fila_agregada(self, fila):
+        self._filas.append(tuple(fila))
+
+    def fila_actualizada(self, fila):
+        for i, actual in enumerate(self._filas):
+            if actual[0] == fila[0]:
+                self._filas[i] = tuple(fila)
+                break
+
+    def fila_eliminada(self, clave):
+        self._filas = [fila for fila in self._filas if fila[0] != clave]
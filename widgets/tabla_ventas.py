@@ -0,0 +1,31 @@
+from textual.widgets import DataTable
+from controllers import VentaController
+from widgets.carga_datos import CargaDatos
+from widgets.refresco import RefrescoIncremental
+
+
+class TablaVentas(CargaDatos, RefrescoIncremental, DataTable):
+    """Listado de ventas con refresco incremental por marca de agua"""
+
+    def on_mount(self):
+        self.controller = VentaController()
+        self.claves_columnas = self.add_columns("ID", "Fecha", "Cliente", "Total", "Estado")
+        self.cargar()
+
+    def cargar(self):
+        self.cargar_datos(("ventas", "listado"), self.controller.obtener_listado, al_cargar=self._mostrar)
+
+    def _mostrar(self, listado):
+        filas, marca = listado
+        cursor = self.cursor_row
+        self.clear()
+        for fila in filas:
+            self.add_row(*self.celdas(fila), key=str(fila[0]))
+        if 0 <= cursor < len(filas):
+            self.move_cursor(row=cursor)
+        self.iniciar_refresco(marca)
+
+    def celdas(self, fila):
+        venta_id, fecha_venta, cliente, total, estado = fila
+        return (str(venta_id), fecha_venta.strftime("%Y-%m-%d %H:%M"),
+                cliente or "", f"{total:.2f}", estado)